@@ -0,0 +1,133 @@
+import csv, json, os, sys, time
+from typing import Any, Callable, Container, Iterator, List, Optional, TextIO, Tuple
+
+# Bulk import of products, customers or suppliers from a CSV file (with a header row) or a JSON Lines file (one object per line)
+# Rows are streamed, checked and added in chunks - one save per chunk rather than one per row - so large catalogues load in seconds
+# Rows that fail their checks, or whose ID already exists, are written with the reason to a rejects file next to the input
+# Run with `python3 bulk_import.py <products|customers|suppliers> <file> [chunk size]` from /COM5043OOP/Backend/
+
+DEFAULT_CHUNK_SIZE = 1000
+
+def read_rows(path: str) -> Iterator[Tuple[int, Any]]: # (line number, row) pairs from a .csv or JSON Lines file - a JSON line that doesn't parse is passed on as a ValueError for the importer to reject
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError as e:
+                        yield line_number, ValueError(f"invalid JSON: {e}")
+
+class ImportResult: # Counts from one import run
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self) -> float: # Rows read per second
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f"{self.read} rows read, {self.imported} imported, {self.rejected} rejected in {self.seconds:.2f}s ({self.rate:.0f} rows/s)"
+
+class BulkImporter: # Feeds rows through parse (row -> object, raising ValueError if invalid) into add_many (a batch add returning what it added), one chunk at a time
+    def __init__(self, parse: Callable[[dict], Any], add_many: Callable[[List[Any]], List[Any]], key: Callable[[Any], str], existing: Container, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[ImportResult], None]] = None):
+        self.parse = parse
+        self.add_many = add_many
+        self.key = key  # The object's ID, used to spot duplicates
+        self.existing = existing  # IDs already held by the manager
+        self.chunk_size = chunk_size
+        self.progress = progress  # Called after every chunk with the running counts
+
+    def run(self, rows: Iterator[Tuple[int, Any]], rejects: Optional[TextIO] = None) -> ImportResult:
+        result = ImportResult()
+        start = time.perf_counter()
+        seen = set()  # IDs earlier in this file
+        chunk: List[Tuple[int, Any, Any]] = []
+
+        def reject(line_number: int, row: Any, reason: str):
+            result.rejected += 1
+            if rejects is not None:
+                rejects.write(json.dumps({"line": line_number, "row": row, "error": reason}) + "\n")
+
+        def flush():
+            added = {id(obj) for obj in self.add_many([obj for _, _, obj in chunk])}
+            for line_number, row, obj in chunk:
+                if id(obj) in added:
+                    result.imported += 1
+                else: # Taken by someone else between the duplicate check and the add
+                    reject(line_number, row, "duplicate ID")
+            chunk.clear()
+            result.seconds = time.perf_counter() - start
+            if self.progress:
+                self.progress(result)
+
+        for line_number, row in rows:
+            result.read += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                if not isinstance(row, dict):
+                    raise ValueError("row must be an object")
+                obj = self.parse(row)
+            except ValueError as e:
+                reject(line_number, row if not isinstance(row, Exception) else None, str(e))
+                continue
+            key = self.key(obj)
+            if key in seen or key in self.existing:
+                reject(line_number, row, "duplicate ID")
+                continue
+            seen.add(key)
+            chunk.append((line_number, row, obj))
+            if len(chunk) >= self.chunk_size:
+                flush()
+        if chunk or not result.read:
+            flush()
+        result.seconds = time.perf_counter() - start
+        return result
+
+def main(args) -> int:
+    if len(args) < 2 or args[0] not in ("products", "customers", "suppliers"):
+        print("Usage: python3 bulk_import.py <products|customers|suppliers> <file> [chunk size]")
+        return 1
+    kind, path = args[0], args[1]
+    chunk_size = int(args[2]) if len(args) > 2 else DEFAULT_CHUNK_SIZE
+    from data_storage import JSONBackend
+    backend = JSONBackend(compact_threshold=sys.maxsize)  # Each chunk is only appended to the journal - folding it into the .json file every chunk would rewrite the whole file each time, so that's done once at the end
+    if kind == "products":
+        from inventory import InventoryManager, Product
+        manager = InventoryManager(backend)
+        importer = BulkImporter(Product.from_row, manager.add_products, lambda p: p.item_ID, manager.products, chunk_size)
+    elif kind == "customers":
+        from inventory import InventoryManager
+        from order_processing import OrderProcessor, Customer
+        manager = OrderProcessor(InventoryManager(backend), backend)
+        importer = BulkImporter(Customer.from_row, manager.add_customers, lambda c: c.customer_id, manager.customers, chunk_size)
+    else:
+        from supplier import SupplierManager, Supplier
+        manager = SupplierManager(backend)
+        importer = BulkImporter(Supplier.from_row, manager.add_suppliers, lambda s: s.supplier_id, manager.suppliers, chunk_size)
+    importer.progress = lambda r: print(f"\r{r.read} rows, {r.imported} imported, {r.rejected} rejected ({r.rate:.0f} rows/s)", end="", flush=True)
+
+    rejects_path = os.path.splitext(path)[0] + ".rejects.jsonl"
+    with open(rejects_path, "w", encoding="utf-8") as rejects:
+        result = importer.run(read_rows(path), rejects)
+    for collection, journal in list(backend.journals.items()):
+        if journal.length:
+            backend.compact(collection)
+    backend.close()
+    print(f"\n{result}")
+    if result.rejected:
+        print(f"Rejected rows written to {rejects_path}")
+    else:
+        os.remove(rejects_path)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
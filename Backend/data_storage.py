@@ -1,24 +1,534 @@
-import os, json
-from typing import List, Type, TypeVar, Callable
+import io, os, json, sqlite3, struct, tempfile, threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from enum import Enum, auto
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Type, TypeVar, Callable
 
 T = TypeVar('T') # Meaning this variable (the data to stre) can be any type - used for nonspecific functions as this used to store all data. While Python is automatically type agnostic, I still define types where I can for code legibility
 
 DATA_DIR = "Data"
 
-def _get_file_path(filename: str) -> str: # Creating a /Data/ directory in the root directory of the project to store the data. If this were a full project, I'd have this connecting to a Google S3 Bucket
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-    return os.path.join(DATA_DIR, filename)
+class Durability(Enum): # How far a write is pushed towards the disk before returning - trading speed against surviving a crash
+    NONE = auto()  # Left in Python's buffer, fastest but lost if the program dies
+    FLUSH = auto()  # Handed to the operating system, survives the program crashing but not a power cut
+    FSYNC = auto()  # Forced onto the disk itself, survives both but is the slowest
 
-def save_data(objects: List[T], filename: str, to_dict_func: Callable[[T], dict]): # Data is saved in a .json file for readability
-    path = _get_file_path(filename)
-    with open(path, "w") as f:
-        json.dump([to_dict_func(obj) for obj in objects], f, indent=4)
+class DataFormat(Enum): # How save_data lays records out in a data file - the loaders work out which one a file uses by themselves, so file names stay .json whatever the format
+    JSON = auto()  # A pretty-printed JSON array, easy to read and edit by hand (the default)
+    JSONL = auto()  # One compact JSON record per line, no indentation
+    BINARY = auto()  # A header, then each record as compact JSON behind a 4-byte length so it can be skipped without decoding
 
-def load_data(filename: str, from_dict_func: Callable[[dict], T]) -> List[T]: # Fetching the data from the identified filepath
-    path = _get_file_path(filename)
+BINARY_MAGIC = b"WMSB\x01"  # First bytes of a BINARY data file
+_RECORD_LENGTH = struct.Struct(">I")
+_COMPACT = (",", ":")
+
+def _get_file_path(filename: str, data_dir: Optional[str] = None) -> str: # Creating a /Data/ directory in the root directory of the project to store the data. If this were a full project, I'd have this connecting to a Google S3 Bucket
+    data_dir = data_dir or DATA_DIR
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    return os.path.join(data_dir, filename)
+
+def _sync(f, durability: Durability): # Push what has been written to f as far as the durability asks for
+    if durability is Durability.NONE:
+        return
+    f.flush()
+    if durability is Durability.FSYNC:
+        os.fsync(f.fileno())
+
+def _write_records(f, records: Iterable[dict], fmt: DataFormat): # Write records to a binary file one at a time, so they never need to be in a list together
+    if fmt is DataFormat.BINARY:
+        f.write(BINARY_MAGIC)
+        for record in records:
+            data = json.dumps(record, separators=_COMPACT).encode("utf-8")
+            f.write(_RECORD_LENGTH.pack(len(data)) + data)
+    elif fmt is DataFormat.JSONL:
+        for record in records:
+            f.write(json.dumps(record, separators=_COMPACT).encode("utf-8") + b"\n")
+    else: # Byte for byte what json.dump(list, f, indent=4) writes
+        separator = b"[\n    "
+        for record in records:
+            f.write(separator + json.dumps(record, indent=4).replace("\n", "\n    ").encode("utf-8"))
+            separator = b",\n    "
+        f.write(b"[]" if separator == b"[\n    " else b"\n]")
+
+def _sync_dir(path: str): # Make a rename inside this directory itself survive a power cut (not possible, or needed, on Windows)
+    if os.name == "nt":
+        return
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _atomic_write(path: str, write_func: Callable[[Any], None], durability: Durability, sync_dir: bool): # Write into a temporary file beside path then rename it over path, so readers (and a crash) only ever see the old file or the whole new one
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        os.chmod(temp_path, os.stat(path).st_mode if os.path.exists(path) else 0o644)  # mkstemp makes the file private, keep the permissions a plain open() would give
+        with os.fdopen(fd, "wb") as f:
+            write_func(f)
+            _sync(f, durability)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if sync_dir:
+        _sync_dir(path)
+
+def save_data(objects: Iterable[T], filename: str, to_dict_func: Callable[[T], dict], data_dir: Optional[str] = None, fmt: DataFormat = DataFormat.JSON, durability: Durability = Durability.FSYNC, sync_dir: bool = False): # Data is saved in a .json file, pretty-printed for readability unless a compact format is asked for. The old file is replaced in one step, never truncated first
+    path = _get_file_path(filename, data_dir)
+    _atomic_write(path, lambda f: _write_records(f, (to_dict_func(obj) for obj in objects), fmt), durability, sync_dir)
+
+def load_data(filename: str, from_dict_func: Callable[[dict], T], data_dir: Optional[str] = None) -> List[T]: # Fetching the data from the identified filepath
+    return list(iter_data(filename, from_dict_func, data_dir))
+
+def _detect_format(f) -> DataFormat: # Peek at the start of a file opened in binary mode, then rewind it
+    head = f.read(len(BINARY_MAGIC))
+    if head == BINARY_MAGIC:
+        return DataFormat.BINARY
+    head += f.read(READ_CHUNK_SIZE)
+    f.seek(0)
+    stripped = head.lstrip()
+    return DataFormat.JSONL if stripped and stripped[:1] != b"[" else DataFormat.JSON
+
+def detect_format(filename: str, data_dir: Optional[str] = None) -> Optional[DataFormat]: # Which format a data file is in, or None if it doesn't exist
+    path = _get_file_path(filename, data_dir)
     if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return _detect_format(f)
+
+def _iter_binary_records(f) -> Iterator[Any]:
+    f.seek(len(BINARY_MAGIC))
+    while True:
+        header = f.read(_RECORD_LENGTH.size)
+        if not header:
+            return
+        length = _RECORD_LENGTH.unpack(header)[0] if len(header) == _RECORD_LENGTH.size else -1
+        data = f.read(length) if length >= 0 else b""
+        if len(data) != length:
+            raise ValueError("Data file ends part way through a record")
+        yield json.loads(data)
+
+def _iter_json_lines(f) -> Iterator[Any]:
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+def _iter_records(f) -> Iterator[Any]: # Stream the records out of a data file (opened in binary mode) whatever format it is in
+    fmt = _detect_format(f)
+    if fmt is DataFormat.BINARY:
+        yield from _iter_binary_records(f)
+        return
+    text = io.TextIOWrapper(f, encoding="utf-8")
+    yield from (_iter_json_lines(text) if fmt is DataFormat.JSONL else _iter_json_array(text))
+
+READ_CHUNK_SIZE = 64 * 1024  # Characters read from a data file at a time when streaming it
+
+def _iter_json_array(f) -> Iterator[Any]: # Decode the elements of a top-level JSON array one at a time, holding only the current chunk and element in memory
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    started = False
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ",")):
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                if started:
+                    raise ValueError("Data file ends before its closing ]")
+                return
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = chunk, 0
+            continue
+        if not started:
+            if buffer[pos] != "[":
+                raise ValueError("Data file is not a JSON array")
+            started, pos = True, pos + 1
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            complete = eof or (end < len(buffer) and not (isinstance(item, (int, float)) and buffer[end] in ".eE+-"))  # A bare number at the very end, or cut off before its fraction or exponent, could still be continuing in the next chunk
+        except json.JSONDecodeError: # The element runs past the end of the buffer
+            if eof:
+                raise
+            complete = False
+        if not complete: # Top up the buffer, dropping what has already been decoded
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        pos = end
+        yield item
+
+def iter_data(filename: str, from_dict_func: Callable[[dict], T], data_dir: Optional[str] = None, limit: Optional[int] = None, where: Optional[Callable[[dict], bool]] = None) -> Iterator[T]: # Stream objects out of a data file one at a time - where filters the raw dicts before they are built, limit stops after that many
+    path = _get_file_path(filename, data_dir)
+    if not os.path.exists(path) or limit == 0:
+        return
+    count = 0
+    with open(path, "rb") as f:
+        for item in _iter_records(f):
+            if where is not None and not where(item):
+                continue
+            yield from_dict_func(item)
+            count += 1
+            if count == limit:
+                return
+
+def migrate_data(filename: str, fmt: DataFormat, data_dir: Optional[str] = None) -> bool: # Rewrite one data file in another format, streaming it through a temporary file. Returns False if there was nothing to change
+    current = detect_format(filename, data_dir)
+    if current is None or current is fmt:
+        return False
+    path = _get_file_path(filename, data_dir)
+
+    def convert(target): # The source is closed again before _atomic_write renames over it, which Windows insists on
+        with open(path, "rb") as source:
+            _write_records(target, _iter_records(source), fmt)
+
+    _atomic_write(path, convert, Durability.FSYNC, True)
+    return True
+
+def migrate_data_dir(fmt: DataFormat, data_dir: Optional[str] = None) -> List[str]: # Migrate every .json data file in the data directory, returning the names of those that changed
+    data_dir = data_dir or DATA_DIR
+    if not os.path.isdir(data_dir):
         return []
-    with open(path, "r") as f:
-        data = json.load(f)
-        return [from_dict_func(item) for item in data]
+    return [name for name in sorted(os.listdir(data_dir)) if name.endswith(".json") and migrate_data(name, fmt, data_dir)]
+
+class Journal: # Append-only log of changes (one compact JSON record per line) replayed on top of a snapshot file, so a change costs a small append instead of a full rewrite
+    def __init__(self, filename: str, durability: Durability = Durability.FLUSH, data_dir: Optional[str] = None):
+        self.filename = filename
+        self.durability = durability
+        self.data_dir = data_dir
+        self.length = 0  # Records written since the journal was last reset
+        self._file = None  # Kept open between appends so each one is a single write call
+
+    def append(self, records: List[dict]): # Write all records in one go, then sync once for the whole batch
+        if not records:
+            return
+        if self._file is None:
+            path = _get_file_path(self.filename, self.data_dir)
+            self._drop_torn_tail(path)
+            self._file = open(path, "a")
+        self._file.write("".join(json.dumps(record, separators=_COMPACT) + "\n" for record in records))
+        _sync(self._file, self.durability)
+        self.length += len(records)
+
+    @staticmethod
+    def _drop_torn_tail(path: str): # Cut off a half-written last line left by a crash, so new records don't get glued onto it
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+        with open(path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b"\n":
+                return
+            position = f.seek(0, os.SEEK_END)
+            while position > 0:
+                step = min(READ_CHUNK_SIZE, position)
+                f.seek(position - step)
+                newline = f.read(step).rfind(b"\n")
+                if newline >= 0:
+                    f.truncate(position - step + newline + 1)
+                    return
+                position -= step
+            f.truncate(0)
+
+    def iter(self) -> Iterator[dict]: # Stream the records back in the order they were written
+        if self._file is not None:
+            self._file.flush()  # So records still sitting in our own buffer are seen too
+        path = _get_file_path(self.filename, self.data_dir)
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError: # A torn final line from a crash mid-append, everything before it is still good
+                    return
+
+    def replay(self) -> List[dict]: # Read every record back in the order it was written
+        records = list(self.iter())
+        self.length = len(records)
+        return records
+
+    def reset(self): # Empty the journal once its records have been folded into a fresh snapshot
+        self.close()
+        with open(_get_file_path(self.filename, self.data_dir), "w"):
+            pass
+        self.length = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class SegmentedLog: # Append-only records split into one journal file per period (e.g. per month), so reading a date range only opens the files for that range
+    def __init__(self, prefix: str, durability: Durability = Durability.FLUSH, data_dir: Optional[str] = None):
+        self.prefix = prefix
+        self.durability = durability
+        self.data_dir = data_dir
+        self._segments: Dict[str, Journal] = {}
+        self._lock = threading.Lock()
+
+    def _segment(self, period: str) -> Journal: # transactions-2025-01.jsonl for prefix "transactions" and period "2025-01"
+        if period not in self._segments:
+            self._segments[period] = Journal(f"{self.prefix}-{period}.jsonl", self.durability, self.data_dir)
+        return self._segments[period]
+
+    def append(self, period: str, records: List[dict]): # Add records to the end of one period's segment
+        with self._lock:
+            self._segment(period).append(records)
+
+    def periods(self) -> List[str]: # Every period with a segment on disk, in order
+        directory = os.path.dirname(_get_file_path(self.prefix, self.data_dir))
+        start, end = self.prefix + "-", ".jsonl"
+        return sorted(name[len(start):-len(end)] for name in os.listdir(directory) if name.startswith(start) and name.endswith(end))
+
+    def iter(self, from_dict_func: Callable[[dict], T], first: Optional[str] = None, last: Optional[str] = None, where: Optional[Callable[[dict], bool]] = None) -> Iterator[T]: # Stream records from the periods first to last inclusive (either can be left open), oldest segment first
+        for period in self.periods():
+            if (first is not None and period < first) or (last is not None and period > last):
+                continue
+            for record in self._segment(period).iter():
+                if where is None or where(record):
+                    yield from_dict_func(record)
+
+    def close(self):
+        for journal in self._segments.values():
+            journal.close()
+
+class StorageBackend(ABC): # Where the managers keep their collections - one collection per data file, each keyed by an ID field
+    KEYED_GET = False  # True when get() looks a record up by its key directly, rather than scanning the collection for it
+
+    def __init__(self):
+        self.key_fields: Dict[str, str] = {}  # collection -> name of the field that uniquely identifies a record
+
+    def register(self, collection: str, key_field: str): # Managers call this once so keyed writes know which field is the key
+        self.key_fields[collection] = key_field
+
+    def _key(self, collection: str, record: dict) -> str:
+        return str(record[self.key_fields[collection]])
+
+    def load(self, collection: str, from_dict_func: Callable[[dict], T]) -> List[T]: # Every record in the collection
+        return list(self.iter(collection, from_dict_func))
+
+    @abstractmethod
+    def iter(self, collection: str, from_dict_func: Callable[[dict], T], limit: Optional[int] = None, where: Optional[Callable[[dict], bool]] = None) -> Iterator[T]: # Stream the collection's records one at a time (same limit/where as iter_data)
+        pass
+
+    @abstractmethod
+    def save(self, collection: str, objects: List[T], to_dict_func: Callable[[T], dict]): # Replace the whole collection
+        pass
+
+    @abstractmethod
+    def upsert(self, collection: str, records: List[dict]): # Insert or overwrite records by key
+        pass
+
+    @abstractmethod
+    def delete(self, collection: str, keys: List[str]): # Remove records by key
+        pass
+
+    @abstractmethod
+    def get(self, collection: str, key: str) -> Optional[dict]: # A single record by key, or None
+        pass
+
+    @abstractmethod
+    def find(self, collection: str, field: str, value: Any) -> List[dict]: # Records whose field equals value
+        pass
+
+    @abstractmethod
+    @contextmanager
+    def transaction(self): # Writes made inside the block are kept all together or not at all
+        yield
+
+    def close(self):
+        pass
+
+class JSONBackend(StorageBackend): # Today's JSON files, with keyed writes journalled next to each file and compacted back into it
+    COMPACT_THRESHOLD = 1000 # How many journal records to allow before folding them into a fresh snapshot of the .json file
+
+    def __init__(self, data_dir: Optional[str] = None, durability: Durability = Durability.FLUSH, compact_threshold: int = COMPACT_THRESHOLD, fmt: Optional[DataFormat] = None):
+        super().__init__()
+        self.data_dir = data_dir
+        self.durability = durability  # Applies to journal appends - snapshot rewrites are always fsynced, as the journal they replace is emptied straight after
+        self.fmt = fmt  # Format snapshots are written in - None keeps whatever format each file is already in (e.g. after migrate_data.py), and JSON for new files. Files in any format are still read
+        self.compact_threshold = compact_threshold
+        self.journals: Dict[str, Journal] = {}
+        self._pending: Optional[Dict[str, List[dict]]] = None  # Journal records held back until the open transaction ends
+        self._depth = 0
+        self._lock = threading.RLock()
+
+    def _journal(self, collection: str) -> Journal: # products.json is journalled to products.journal, and so on
+        if collection not in self.journals:
+            self.journals[collection] = Journal(os.path.splitext(collection)[0] + ".journal", self.durability, self.data_dir)
+        return self.journals[collection]
+
+    def _iter_raw(self, collection: str) -> Iterator[dict]: # Stream the snapshot with the journal replayed over it - only the journal (kept short by compaction) is held in memory
+        with self._lock:
+            overlay: Dict[str, Optional[dict]] = {}  # key -> latest record, or None if it was deleted
+            for entry in self._journal(collection).replay():
+                overlay[entry["key"]] = entry["value"] if entry["op"] == "put" else None
+        for record in iter_data(collection, lambda d: d, self.data_dir): # Changed records keep their place, deleted ones are dropped
+            key = self._key(collection, record)
+            if key in overlay:
+                record = overlay.pop(key)
+                if record is None:
+                    continue
+            yield record
+        for record in overlay.values(): # Then anything new since the snapshot
+            if record is not None:
+                yield record
+
+    def iter(self, collection: str, from_dict_func: Callable[[dict], T], limit: Optional[int] = None, where: Optional[Callable[[dict], bool]] = None) -> Iterator[T]:
+        if limit == 0:
+            return
+        count = 0
+        for record in self._iter_raw(collection):
+            if where is not None and not where(record):
+                continue
+            yield from_dict_func(record)
+            count += 1
+            if count == limit:
+                return
+
+    def save(self, collection: str, objects: List[T], to_dict_func: Callable[[T], dict]):
+        with self._lock:
+            fmt = self.fmt or detect_format(collection, self.data_dir) or DataFormat.JSON
+            save_data(objects, collection, to_dict_func, self.data_dir, fmt, Durability.FSYNC, sync_dir=True) # On disk, rename included, before the journal holding the same changes is emptied
+            self._journal(collection).reset()
+
+    def upsert(self, collection: str, records: List[dict]):
+        self._write(collection, [{"op": "put", "key": self._key(collection, r), "value": r} for r in records])
+
+    def delete(self, collection: str, keys: List[str]):
+        self._write(collection, [{"op": "del", "key": str(k)} for k in keys])
+
+    def _write(self, collection: str, entries: List[dict]):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.setdefault(collection, []).extend(entries)
+                return
+            journal = self._journal(collection)
+            journal.append(entries)
+            if journal.length >= self.compact_threshold:
+                self.compact(collection)
+
+    def compact(self, collection: str): # Fold the journal into a fresh snapshot
+        with self._lock:
+            self.save(collection, list(self._iter_raw(collection)), lambda r: r)
+
+    def get(self, collection: str, key: str) -> Optional[dict]: # JSON files have no index, so this streams the collection until it finds the key
+        key = str(key)
+        return next(self.iter(collection, lambda r: r, limit=1, where=lambda r: self._key(collection, r) == key), None)
+
+    def find(self, collection: str, field: str, value: Any) -> List[dict]:
+        return list(self.iter(collection, lambda r: r, where=lambda r: r.get(field) == value))
+
+    @contextmanager
+    def transaction(self): # The journal records are buffered and appended in one write when the outermost block ends
+        with self._lock:
+            if self._depth == 0:
+                self._pending = {}
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                if self._depth == 1:
+                    self._pending = None
+                raise
+            finally:
+                self._depth -= 1
+            if self._depth == 0:
+                pending, self._pending = self._pending, None
+                for collection, entries in pending.items():
+                    self._write(collection, entries)
+
+    def close(self):
+        for journal in self.journals.values():
+            journal.close()
+
+class SQLiteBackend(StorageBackend): # Every collection in one SQLite database, so keyed writes and lookups touch only the records involved
+    KEYED_GET = True
+    DATABASE_FILENAME = "warehouse.db"
+    SYNCHRONOUS = {Durability.NONE: "OFF", Durability.FLUSH: "NORMAL", Durability.FSYNC: "FULL"}
+
+    def __init__(self, path: Optional[str] = None, durability: Durability = Durability.FLUSH):
+        super().__init__()
+        self.path = path or _get_file_path(self.DATABASE_FILENAME)
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)  # Autocommit - transactions are opened explicitly
+        self._lock = threading.RLock()
+        self._depth = 0
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={self.SYNCHRONOUS[durability]}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS records (collection TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, UNIQUE (collection, key))")
+
+    def create_index(self, collection: str, field: str): # Index a field inside the stored records so find() on it is a lookup rather than a scan
+        name = "idx_" + "".join(c if c.isalnum() else "_" for c in f"{collection}_{field}")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON records (collection, json_extract(data, '$.{field}'))")
+
+    FETCH_SIZE = 500  # Rows pulled from SQLite per batch when streaming
+
+    def iter(self, collection: str, from_dict_func: Callable[[dict], T], limit: Optional[int] = None, where: Optional[Callable[[dict], bool]] = None) -> Iterator[T]:
+        if limit == 0:
+            return
+        count = 0
+        with self._lock:
+            cursor = self._conn.execute("SELECT data FROM records WHERE collection = ? ORDER BY rowid", (collection,))
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                return
+            for (data,) in rows:
+                record = json.loads(data)
+                if where is not None and not where(record):
+                    continue
+                yield from_dict_func(record)
+                count += 1
+                if count == limit:
+                    return
+
+    def save(self, collection: str, objects: List[T], to_dict_func: Callable[[T], dict]):
+        with self.transaction():
+            self._conn.execute("DELETE FROM records WHERE collection = ?", (collection,))
+            self.upsert(collection, [to_dict_func(obj) for obj in objects])
+
+    def upsert(self, collection: str, records: List[dict]):
+        rows = [(collection, self._key(collection, r), json.dumps(r, separators=(",", ":"))) for r in records]
+        with self.transaction():
+            self._conn.executemany("INSERT INTO records (collection, key, data) VALUES (?, ?, ?) ON CONFLICT (collection, key) DO UPDATE SET data = excluded.data", rows)
+
+    def delete(self, collection: str, keys: List[str]):
+        with self.transaction():
+            self._conn.executemany("DELETE FROM records WHERE collection = ? AND key = ?", [(collection, str(k)) for k in keys])
+
+    def get(self, collection: str, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM records WHERE collection = ? AND key = ?", (collection, str(key))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, collection: str, field: str, value: Any) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data FROM records WHERE collection = ? AND json_extract(data, '$.{field}') = ? ORDER BY rowid", (collection, value)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    @contextmanager
+    def transaction(self): # Nested blocks join the outermost one, which commits or rolls back as a whole
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,132 @@
+import math, threading, time
+from array import array
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+from sku import SKUS, SkuRegistry
+
+DEMAND_ALPHA = 0.2  # Weight a new day's sales get in the moving average - higher reacts faster, lower smooths more
+LEAD_TIME_DAYS = 7.0  # Days from ordering stock to it arriving, when nothing better is known
+SERVICE_Z = 1.65  # Standard deviations of demand held as safety stock (1.65 covers about 95% of lead times without running out)
+REVIEW_DAYS = 7.0  # Days of demand each reorder covers beyond the reorder point, so the same SKU isn't reordered every day
+MAX_GAP_DAYS = 366  # Longest run of quiet days folded into a SKU's average - after this long its demand is taken as zero
+
+class ReorderPlan: # What DemandEngine.plan decided should be ordered
+    def __init__(self):
+        self.by_supplier: Dict[str, Dict[str, int]] = {}  # supplier_id -> item_ID -> quantity to order
+        self.unsourced: List[str] = []  # SKUs that need reordering but have no supplier to order from
+        self.checked = 0  # Products looked at
+        self.seconds = 0.0
+
+    @property
+    def lines(self) -> int:
+        return sum(len(items) for items in self.by_supplier.values())
+
+class DemandEngine: # Rolling per-SKU daily demand (an exponentially weighted moving average and variance of units sold per day), turned into reorder points. State is kept in flat arrays indexed by SKU code, so 100k+ SKUs cost a few numbers each
+    def __init__(self, alpha: float = DEMAND_ALPHA, lead_time_days: float = LEAD_TIME_DAYS, service_z: float = SERVICE_Z, review_days: float = REVIEW_DAYS, registry: SkuRegistry = SKUS):
+        self.alpha = alpha
+        self.lead_time_days = lead_time_days
+        self.service_z = service_z
+        self.review_days = review_days
+        self.registry = registry
+        self._rate = array("d")  # Average units sold per day, over the days folded in so far
+        self._var = array("d")  # Variance of units sold per day
+        self._days = array("q")  # Days folded into the average (0 = no history yet)
+        self._bucket = array("q")  # Units sold so far on the day being counted
+        self._day = array("q")  # Ordinal of the day being counted (0 = nothing sold yet)
+        self._lock = threading.Lock()
+
+    def _grow(self): # Make room for every code the registry has handed out (call holding _lock)
+        missing = len(self.registry) - len(self._day)
+        if missing > 0:
+            zeros = bytes(8 * missing)
+            for column in (self._rate, self._var, self._days, self._bucket, self._day):
+                column.frombytes(zeros)
+
+    def _fold(self, i: int, until: int): # Close off SKU i's counted day and any quiet days after it, up to (not including) day ordinal until (call holding _lock)
+        if self._day[i] == 0 or self._day[i] >= until:
+            return
+        alpha, rate, var, days = self.alpha, self._rate[i], self._var[i], self._days[i]
+        gap = until - self._day[i]
+        sold = self._bucket[i]
+        if days == 0:
+            rate, var = float(sold), 0.0
+        else:
+            diff = sold - rate
+            rate += alpha * diff
+            var = (1 - alpha) * (var + alpha * diff * diff)
+        quiet = min(gap, MAX_GAP_DAYS) - 1
+        if quiet > 0: # k days of selling nothing in one step: the rate decays by (1-alpha)^k and the variance to (1-alpha)^k * (var + rate^2 * (1 - (1-alpha)^k)) - the same as folding them one by one
+            decay = (1 - alpha) ** quiet
+            rate, var = rate * decay, decay * (var + rate * rate * (1 - decay))
+        days += min(gap, MAX_GAP_DAYS)
+        if gap > MAX_GAP_DAYS:
+            rate = var = 0.0
+        self._rate[i], self._var[i], self._days[i] = rate, var, days
+        self._bucket[i], self._day[i] = 0, until
+
+    def record(self, items: Mapping[str, int], on: date): # Count an order's lines as sales on the given day - OrderProcessor calls this for every order it completes
+        day = on.toordinal()
+        codes = [(self.registry.code(item_ID), quantity) for item_ID, quantity in items.items()]
+        with self._lock:
+            self._grow()
+            for i, quantity in codes:
+                if self._day[i] == 0:
+                    self._day[i] = day
+                elif day > self._day[i]:
+                    self._fold(i, day)
+                self._bucket[i] += quantity  # Late-arriving sales for an earlier day are counted on the current one rather than rewriting history
+
+    def advance(self, today: date): # Fold every SKU's sales up to the end of yesterday, so rates reflect quiet days too
+        until = today.toordinal()
+        with self._lock:
+            for i in range(len(self._day)):
+                self._fold(i, until)
+
+    def daily_demand(self, item_ID: str) -> float: # Average units per day from the days folded so far (0 if none)
+        i = self.registry.lookup(item_ID)
+        with self._lock:
+            return self._rate[i] if i is not None and i < len(self._rate) else 0.0
+
+    def reorder_point(self, item_ID: str, lead_time_days: Optional[float] = None) -> Optional[float]: # Stock level to reorder at: demand over the lead time plus safety stock. None if the SKU has no sales history yet
+        lead = self.lead_time_days if lead_time_days is None else lead_time_days
+        i = self.registry.lookup(item_ID)
+        with self._lock:
+            if i is None or i >= len(self._days) or self._days[i] == 0:
+                return None
+            return self._rate[i] * lead + self.service_z * math.sqrt(self._var[i] * lead)
+
+    def plan(self, products: Iterable, on_order: Mapping[str, int], supplier_for: Callable[[str], Optional[str]], today: Optional[date] = None, lead_time_for: Optional[Callable[[str], Optional[float]]] = None) -> ReorderPlan: # One pass over the products deciding what to reorder, grouped by supplier. Stock position is available stock plus anything already on order; SKUs with no sales history fall back to their low_stock_threshold (reorder at it, order up to twice it). lead_time_for gives a SKU's own lead time in days (None for the default)
+        today = today or date.today()
+        started = time.perf_counter()
+        self.advance(today)
+        plan = ReorderPlan()
+        lookup, lead, z, review = self.registry.lookup, self.lead_time_days, self.service_z, self.review_days
+        with self._lock:
+            rates, variances, days, known = self._rate, self._var, self._days, len(self._days)
+            for product in products:
+                plan.checked += 1
+                position = product.available + on_order.get(product.item_ID, 0)
+                i = lookup(product.item_ID)
+                if i is not None and i < known and days[i]:
+                    rate = rates[i]
+                    sku_lead = lead
+                    if lead_time_for is not None:
+                        sku_lead = lead_time_for(product.item_ID)
+                        sku_lead = lead if sku_lead is None else sku_lead
+                    point = rate * sku_lead + z * math.sqrt(variances[i] * sku_lead)
+                    target = point + rate * review
+                else:
+                    point = product.low_stock_threshold
+                    target = 2 * point
+                if position > point:
+                    continue
+                quantity = math.ceil(target - position)
+                if quantity <= 0:
+                    continue
+                supplier_id = supplier_for(product.item_ID)
+                if supplier_id is None:
+                    plan.unsourced.append(product.item_ID)
+                else:
+                    plan.by_supplier.setdefault(supplier_id, {})[product.item_ID] = quantity
+        plan.seconds = time.perf_counter() - started
+        return plan
@@ -1,15 +1,25 @@
-from typing import List
-from datetime import datetime
+import heapq, io
+from array import array
+from itertools import compress, islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from datetime import date, datetime, timedelta
+from data_storage import SegmentedLog
+
+try: # NumPy is optional - the columnar ledger uses it to vectorise its sums when it is installed, and falls back to plain Python loops over the same arrays when it isn't
+    import numpy as np
+except ImportError:
+    np = None
 
 class Transaction: # All transactions come through here, defined as either sales or purchases
+    __slots__ = ("date", "transaction_type", "amount", "description")
     def __init__(self, transaction_type: str, amount: float, description: str):
         self.date = datetime.now()
         self.transaction_type = transaction_type  # Being either 'purchase' or 'sale'
         self.amount = amount
         self.description = description
 
-    def __str__(self):
-        return f"[{self.date.strftime('%Y-%m-%d %H:%M')}] {self.transaction_type.upper()} - £{self.amount:.2f} - {self.description}"
+    def __str__(self): # isoformat to the minute gives the same text as strftime('%Y-%m-%d %H:%M') at a fraction of the cost, which adds up over a long report
+        return f"[{self.date.isoformat(' ', 'minutes')}] {self.transaction_type.upper()} - £{self.amount:.2f} - {self.description}"
     
     def to_dict(self):
         return {
@@ -29,35 +39,258 @@ class Transaction: # All transactions come through here, defined as either sales
         obj.date = datetime.fromisoformat(data["date"])
         return obj
 
-class FinancialManager: # Used for generating financial reports and logging purchases
+EPOCH = datetime(1970, 1, 1)  # Transaction dates are stored as whole microseconds since this (naive) datetime, so they round trip exactly
+MICROSECONDS_PER_DAY = 86400 * 1000000
+
+class ColumnarLedger: # Transactions stored column by column in typed arrays instead of one object each - compact, and totals/rollups/top-N run over whole columns at once
     def __init__(self):
+        self.timestamps = array("q")  # Microseconds since EPOCH
+        self.type_codes = array("b")  # Index into type_names
+        self.amounts = array("d")
+        self.description_ids = array("l")  # Index into descriptions
+        self.type_names: List[str] = []
+        self.descriptions: List[str] = []  # Each distinct description stored once
+        self._type_index: Dict[str, int] = {}
+        self._description_index: Dict[str, int] = {}
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction]) -> 'ColumnarLedger':
+        ledger = cls()
+        ledger.extend(transactions)
+        return ledger
+
+    def _intern(self, value: str, values: List[str], index: Dict[str, int]) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(values)
+            values.append(value)
+        return code
+
+    def append(self, transaction: Transaction):
+        self.timestamps.append((transaction.date - EPOCH) // timedelta(microseconds=1))
+        self.type_codes.append(self._intern(transaction.transaction_type, self.type_names, self._type_index))
+        self.amounts.append(transaction.amount)
+        self.description_ids.append(self._intern(transaction.description, self.descriptions, self._description_index))
+
+    def extend(self, transactions: Iterable[Transaction]):
+        for transaction in transactions:
+            self.append(transaction)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __getitem__(self, i: int) -> Transaction: # Rebuild one row as a Transaction
+        transaction = Transaction(self.type_names[self.type_codes[i]], self.amounts[i], self.descriptions[self.description_ids[i]])
+        transaction.date = EPOCH + timedelta(microseconds=self.timestamps[i])
+        return transaction
+
+    def to_transactions(self) -> List[Transaction]:
+        return [self[i] for i in range(len(self))]
+
+    def _row_mask(self, transaction_type: Optional[str], start: Optional[date], end: Optional[date]): # Which rows a query covers - a NumPy boolean array, or a list of bools without NumPy
+        code = self._type_index.get(transaction_type, -1) if transaction_type is not None else None
+        low = (datetime.combine(start, datetime.min.time()) - EPOCH) // timedelta(microseconds=1) if start is not None else None
+        high = (datetime.combine(end + timedelta(days=1), datetime.min.time()) - EPOCH) // timedelta(microseconds=1) if end is not None else None
+        if np is not None:
+            timestamps = np.frombuffer(self.timestamps, dtype=np.int64)  # Views over the arrays, nothing is copied
+            mask = np.ones(len(self), dtype=bool)
+            if code is not None:
+                mask &= np.frombuffer(self.type_codes, dtype=np.int8) == code
+            if low is not None:
+                mask &= timestamps >= low
+            if high is not None:
+                mask &= timestamps < high
+            return mask
+        return [(code is None or c == code) and (low is None or ts >= low) and (high is None or ts < high) for c, ts in zip(self.type_codes, self.timestamps)]
+
+    def total(self, transaction_type: Optional[str] = None, start: Optional[date] = None, end: Optional[date] = None) -> float: # Sum of amounts, optionally for one type and/or the days from start to end inclusive
+        mask = self._row_mask(transaction_type, start, end)
+        if np is not None:
+            return float(np.frombuffer(self.amounts, dtype=np.float64)[mask].sum())  # NumPy sums pairwise, so the last few bits can differ from a plain running sum
+        return sum(compress(self.amounts, mask))
+
+    def rollup(self, by: str = "day", transaction_type: Optional[str] = None) -> Dict[date, float]: # Totals per day (keyed by the date) or per month (keyed by its first day), in date order
+        if by not in ("day", "month"):
+            raise ValueError("Rollups are by 'day' or 'month'.")
+        mask = self._row_mask(transaction_type, None, None)
+        per_day: Dict[int, float] = {}
+        if np is not None:
+            days = np.frombuffer(self.timestamps, dtype=np.int64)[mask] // MICROSECONDS_PER_DAY
+            unique_days, positions = np.unique(days, return_inverse=True)
+            sums = np.bincount(positions, weights=np.frombuffer(self.amounts, dtype=np.float64)[mask], minlength=len(unique_days))
+            per_day = dict(zip(unique_days.tolist(), sums.tolist()))
+        else:
+            for ts, amount in compress(zip(self.timestamps, self.amounts), mask):
+                day = ts // MICROSECONDS_PER_DAY
+                per_day[day] = per_day.get(day, 0.0) + amount
+        totals: Dict[date, float] = {}
+        for day in sorted(per_day): # Only one date conversion per distinct day rather than per transaction
+            key = EPOCH.date() + timedelta(days=day)
+            if by == "month":
+                key = key.replace(day=1)
+            totals[key] = totals.get(key, 0.0) + per_day[day]
+        return totals
+
+    def top(self, n: int, transaction_type: Optional[str] = None) -> List[Transaction]: # The n largest transactions by amount, largest first
+        mask = self._row_mask(transaction_type, None, None)
+        if np is not None:
+            rows = np.flatnonzero(mask)
+            amounts = np.frombuffer(self.amounts, dtype=np.float64)[rows]
+            if n < len(rows):
+                keep = np.argpartition(-amounts, n)[:n]
+                rows, amounts = rows[keep], amounts[keep]
+            rows = rows[np.argsort(-amounts, kind="stable")].tolist()
+        else:
+            rows = heapq.nlargest(n, compress(range(len(self)), mask), key=self.amounts.__getitem__)
+        return [self[i] for i in rows]
+
+class FinancialManager: # Used for generating financial reports and logging purchases, with every transaction kept in monthly files in the /Data/ folder
+    LOG_PREFIX = "transactions"  # Segments are named transactions-YYYY-MM.jsonl
+
+    def __init__(self, verify: bool = False, log: Optional[SegmentedLog] = None, history_from: Optional[date] = None):
         self.transactions: List[Transaction] = []
+        self.verify = verify  # Cross-check every running total against a full scan of the transactions (slow, for testing)
+        self._totals: Dict[str, float] = {"purchase": 0.0, "sale": 0.0}  # Running totals, added to in the same order a full scan would add them
+        self._daily: Dict[date, Dict[str, float]] = {}  # Per-day totals for period queries
+        self._monthly: Dict[Tuple[int, int], Dict[str, float]] = {}  # Per (year, month) totals
+        self.log = log if log is not None else SegmentedLog(self.LOG_PREFIX)
+        self.history_from = history_from  # Transactions before this are only on disk - reports reaching back past it read them from the monthly files
+        self.load_transactions(history_from)
+
+    @staticmethod
+    def _period(day: date) -> str: # The segment a date's transactions are kept in
+        return f"{day.year:04d}-{day.month:02d}"
+
+    def load_transactions(self, since: Optional[date] = None): # Load the saved ledger into memory - everything, or only from since onwards (which skips the older monthly files entirely)
+        first = self._period(since) if since is not None else None
+        where = (lambda d: d["date"] >= since.isoformat()) if since is not None else None
+        for transaction in self.log.iter(Transaction.from_dict, first=first, where=where):
+            self._add(transaction)
+
+    def transactions_between(self, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[Transaction]: # Stream saved transactions dated from start to end inclusive, straight from the monthly files covering that range
+        last_day = (end + timedelta(days=1)).isoformat() if end is not None else None
+        return self.log.iter(Transaction.from_dict,
+                             first=self._period(start) if start is not None else None,
+                             last=self._period(end) if end is not None else None,
+                             where=lambda d: (start is None or d["date"] >= start.isoformat()) and (last_day is None or d["date"] < last_day))
+
+    def _record(self, transaction: Transaction): # Add a new transaction and save it - a single append to this month's file
+        self._add(transaction)
+        self.log.append(self._period(transaction.date), [transaction.to_dict()])
+
+    def _add(self, transaction: Transaction): # Add a transaction and fold it into the running and bucketed totals
+        self.transactions.append(transaction)
+        kind, amount = transaction.transaction_type, transaction.amount
+        self._totals[kind] = self._totals.get(kind, 0.0) + amount
+        day = transaction.date.date()
+        for buckets, key in ((self._daily, day), (self._monthly, (day.year, day.month))):
+            bucket = buckets.setdefault(key, {})
+            bucket[kind] = bucket.get(kind, 0.0) + amount
 
     def record_purchase(self, amount: float, description: str): # Purchasing stock
         if amount <= 0:
             raise ValueError("Purchase amount must be positive.")
-        self.transactions.append(Transaction("purchase", amount, description))
+        self._record(Transaction("purchase", amount, description))
+
+    def record_purchases(self, purchases: Iterable[Tuple[float, str]]): # Record many (amount, description) purchases at once - all are checked first, then saved with one append per month
+        purchases = list(purchases)
+        if any(amount <= 0 for amount, _ in purchases):
+            raise ValueError("Purchase amount must be positive.")
+        by_period: Dict[str, List[dict]] = {}
+        for amount, description in purchases:
+            transaction = Transaction("purchase", amount, description)
+            self._add(transaction)
+            by_period.setdefault(self._period(transaction.date), []).append(transaction.to_dict())
+        for period, records in by_period.items():
+            self.log.append(period, records)
 
     def record_sale(self, amount: float, description: str): # Recording sale
         if amount <= 0:
             raise ValueError("Sale amount must be positive.")
-        self.transactions.append(Transaction("sale", amount, description))
+        self._record(Transaction("sale", amount, description))
+
+    def _total(self, transaction_type: str) -> float:
+        total = self._totals.get(transaction_type, 0.0)
+        if self.verify:
+            scanned = sum(t.amount for t in self.transactions if t.transaction_type == transaction_type)
+            if scanned != total:
+                raise AssertionError(f"Running {transaction_type} total £{total} does not match full scan £{scanned}")
+        return total
 
     def total_purchases(self) -> float: # Financial report total purchases calculated
-        return sum(t.amount for t in self.transactions if t.transaction_type == "purchase")
+        return self._total("purchase")
 
     def total_sales(self) -> float: # Financial report total sales calculated
-        return sum(t.amount for t in self.transactions if t.transaction_type == "sale")
+        return self._total("sale")
 
     def net_income(self) -> float: # Financial report net income calculated (profit vs loss)
         return self.total_sales() - self.total_purchases()
 
-    def generate_report(self) -> str: # Generate a summary report of finances
-        report = "\n--- Financial Report ---\n"
-        report += f"Total Sales: £{self.total_sales():.2f}\n"
-        report += f"Total Purchases: £{self.total_purchases():.2f}\n"
-        report += f"Net Income: £{self.net_income():.2f} {'(Profit)' if self.net_income() >= 0 else '(Loss)'}\n"
-        report += "\nTransactions:\n"
-        for t in self.transactions:
-            report += str(t) + "\n"
-        return report
\ No newline at end of file
+    def period_totals(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, float]: # Purchase and sale totals for the days from start to end inclusive (either can be left open), summed from the daily buckets
+        totals = {"purchase": 0.0, "sale": 0.0}
+        for day in sorted(self._daily):
+            if (start is None or day >= start) and (end is None or day <= end):
+                for kind, amount in self._daily[day].items():
+                    totals[kind] = totals.get(kind, 0.0) + amount
+        if self.verify:
+            for kind, total in totals.items():
+                scanned = sum(t.amount for t in self.transactions if t.transaction_type == kind and (start is None or t.date.date() >= start) and (end is None or t.date.date() <= end))
+                if abs(scanned - total) > 1e-6 * max(1.0, abs(scanned)):
+                    raise AssertionError(f"Bucketed {kind} total £{total} does not match full scan £{scanned}")
+        return totals
+
+    def daily_totals(self, day: date) -> Dict[str, float]: # Purchase and sale totals for one day
+        return {"purchase": 0.0, "sale": 0.0, **self._daily.get(day, {})}
+
+    def monthly_totals(self, year: int, month: int) -> Dict[str, float]: # Purchase and sale totals for one calendar month
+        return {"purchase": 0.0, "sale": 0.0, **self._monthly.get((year, month), {})}
+
+    def to_ledger(self) -> ColumnarLedger: # A columnar copy of the transactions for heavy reporting
+        return ColumnarLedger.from_transactions(self.transactions)
+
+    def _in_memory(self, start: Optional[date]) -> bool: # Whether the transactions held in memory cover everything from start on
+        return self.history_from is None or (start is not None and start >= self.history_from)
+
+    def iter_report(self, start: Optional[date] = None, end: Optional[date] = None, page: int = 1, page_size: Optional[int] = None) -> Iterator[str]: # Yield the report a line at a time (newlines included) - dates filter the totals and transactions to the days from start to end inclusive, page_size splits the transactions into numbered pages. A range reaching back before history_from is read from just the monthly files it covers
+        from_log = not self._in_memory(start)
+        if from_log: # One pass over the matching segments for the totals, another below for the lines, so the history is never held in memory
+            totals = {"purchase": 0.0, "sale": 0.0}
+            for t in self.transactions_between(start, end):
+                totals[t.transaction_type] = totals.get(t.transaction_type, 0.0) + t.amount
+            sales, purchases = totals["sale"], totals["purchase"]
+        elif start is None and end is None:
+            sales, purchases = self.total_sales(), self.total_purchases()
+        else:
+            totals = self.period_totals(start, end)
+            sales, purchases = totals["sale"], totals["purchase"]
+        net = sales - purchases
+        yield "\n"
+        yield "--- Financial Report ---\n"
+        if start is not None or end is not None:
+            yield f"Period: {start.isoformat() if start else 'start'} to {end.isoformat() if end else 'today'}\n"
+        yield f"Total Sales: £{sales:.2f}\n"
+        yield f"Total Purchases: £{purchases:.2f}\n"
+        yield f"Net Income: £{net:.2f} {'(Profit)' if net >= 0 else '(Loss)'}\n"
+        yield "\n"
+        yield "Transactions:\n" if page_size is None else f"Transactions (page {page}):\n"
+        transactions: Iterable[Transaction] = self.transactions
+        if from_log:
+            transactions = self.transactions_between(start, end)
+        elif start is not None or end is not None:
+            transactions = (t for t in transactions if (start is None or t.date.date() >= start) and (end is None or t.date.date() <= end))
+        if page_size is not None:
+            transactions = islice(transactions, (page - 1) * page_size, page * page_size)
+        for t in transactions:
+            yield str(t) + "\n"
+
+    def write_report(self, sink: TextIO, start: Optional[date] = None, end: Optional[date] = None, page: int = 1, page_size: Optional[int] = None) -> int: # Stream the report into any file-like object (a file, sys.stdout, a socket wrapper...), returning the number of lines written
+        lines = 0
+        for line in self.iter_report(start, end, page, page_size):
+            sink.write(line)
+            lines += 1
+        return lines
+
+    def generate_report(self, start: Optional[date] = None, end: Optional[date] = None, page: int = 1, page_size: Optional[int] = None) -> str: # Generate a summary report of finances as one string
+        report = io.StringIO()
+        self.write_report(report, start, end, page, page_size)
+        return report.getvalue()
@@ -1,15 +1,26 @@
 # inventory.py
 
-from typing import Dict, List
-from data_storage import save_data, load_data
+import heapq, threading, time, uuid
+from bisect import bisect_left, bisect_right, insort
+from collections import UserDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from data_storage import StorageBackend, JSONBackend
+from sku import SKUS
 
 class Product: # Representing a product in the WMSBNUIS LTD warehouse
+    __slots__ = ("item_ID", "name", "price", "quantity", "low_stock_threshold", "reserved")  # No per-instance __dict__ - there is one of these per SKU, so the saving adds up
     def __init__(self, item_ID: str, name: str, price: float, quantity: int, low_stock_threshold: int = 10):
-        self.item_ID = item_ID  # Stock Keeping Unit, unique ID
+        self.item_ID = SKUS.intern(item_ID)  # Stock Keeping Unit, unique ID - the registry's copy, shared with every order line for this SKU
         self.name = name
         self.price = price
         self.quantity = quantity
         self.low_stock_threshold = low_stock_threshold
+        self.reserved = 0  # Units held for orders not yet confirmed - part of quantity, but not available to anyone else. Not saved: reservations only last as long as the program
+
+    @property
+    def available(self) -> int: # Units on hand that aren't reserved
+        return self.quantity - self.reserved
 
     def is_low_stock(self) -> bool: # Check if the product is below the low stock threshold
         return self.quantity <= self.low_stock_threshold
@@ -37,44 +48,266 @@ class Product: # Representing a product in the WMSBNUIS LTD warehouse
             low_stock_threshold=data.get("low_stock_threshold", 10)
         )
 
-class InventoryManager: # Manages all product stock in the warehouse, with persistent storage in the /Data/ folder
+    @classmethod
+    def from_row(cls, row: dict) -> 'Product': # Build a product from an imported CSV/JSON row, where values may be strings - raises ValueError if a field is missing or invalid
+        item_ID, name = str(row.get("item_ID") or "").strip(), str(row.get("name") or "").strip()
+        if not item_ID or not name:
+            raise ValueError("item_ID and name are required")
+        try:
+            price, quantity = float(row["price"]), int(row["quantity"])
+            threshold = row.get("low_stock_threshold")
+            threshold = 10 if threshold is None or threshold == "" else int(threshold)  # Only a missing or blank threshold defaults - 0 is a real value
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("price, quantity and low_stock_threshold must be numbers") from None
+        if price < 0 or quantity < 0 or threshold < 0:
+            raise ValueError("price, quantity and low_stock_threshold can't be negative")
+        return cls(item_ID, name, price, quantity, threshold)
+
+class ProductCatalogue(UserDict): # The item_ID -> Product dict, with secondary indexes kept up to date as products are added and removed so queries don't have to scan every product
+    def __init__(self, products: Iterable[Product] = ()):
+        super().__init__()
+        self.low_stock: Set[str] = set()  # item_IDs currently at or below their low stock threshold
+        self._by_price: List[Tuple[float, str]] = []  # (price, item_ID), kept sorted
+        self._by_name: List[Tuple[str, str]] = []  # (lower case name, item_ID), kept sorted
+        for product in products: # Bulk load - sort the indexes once at the end instead of inserting into them one by one
+            if product.item_ID in self.data:
+                self._unindex_stock(self.data[product.item_ID])
+            self.data[product.item_ID] = product
+            self._index_stock(product)
+        self._by_price = sorted((p.price, p.item_ID) for p in self.data.values())
+        self._by_name = sorted((p.name.lower(), p.item_ID) for p in self.data.values())
+
+    def __setitem__(self, item_ID: str, product: Product):
+        if item_ID in self.data:
+            self.__delitem__(item_ID)
+        self.data[item_ID] = product
+        self._index_stock(product)
+        insort(self._by_price, (product.price, item_ID))
+        insort(self._by_name, (product.name.lower(), item_ID))
+
+    def __delitem__(self, item_ID: str):
+        product = self.data.pop(item_ID)
+        self._unindex_stock(product)
+        self._remove_sorted(self._by_price, (product.price, item_ID))
+        self._remove_sorted(self._by_name, (product.name.lower(), item_ID))
+
+    @staticmethod
+    def _remove_sorted(index: List[tuple], entry: tuple):
+        position = bisect_left(index, entry)
+        if position < len(index) and index[position] == entry:
+            del index[position]
+
+    def add_many(self, products: List[Product]): # Add products not already in the catalogue, re-sorting the indexes once rather than inserting into them one by one
+        for product in products:
+            self.data[product.item_ID] = product
+            self._index_stock(product)
+        self._by_price.extend((p.price, p.item_ID) for p in products)
+        self._by_price.sort()
+        self._by_name.extend((p.name.lower(), p.item_ID) for p in products)
+        self._by_name.sort()
+
+    def _index_stock(self, product: Product):
+        if product.is_low_stock():
+            self.low_stock.add(product.item_ID)
+
+    def _unindex_stock(self, product: Product):
+        self.low_stock.discard(product.item_ID)
+
+    def stock_changed(self, product: Product): # Call after changing a product's quantity or threshold so the low stock set stays right
+        self._unindex_stock(product)
+        self._index_stock(product)
+
+    def in_price_range(self, min_price: float, max_price: float) -> List[Product]: # Products priced from min_price to max_price inclusive, cheapest first
+        start = bisect_left(self._by_price, (min_price, ""))
+        end = bisect_right(self._by_price, (max_price, chr(0x10FFFF)))
+        return [self.data[item_ID] for _, item_ID in self._by_price[start:end]]
+
+    def with_name_prefix(self, prefix: str) -> List[Product]: # Products whose name starts with prefix (ignoring case), alphabetically
+        prefix = prefix.lower()
+        start = bisect_left(self._by_name, (prefix, ""))
+        end = bisect_left(self._by_name, (prefix + chr(0x10FFFF), ""))
+        return [self.data[item_ID] for _, item_ID in self._by_name[start:end]]
+
+    def with_name(self, name: str) -> List[Product]: # Products with exactly this name (ignoring case)
+        name = name.lower()
+        start = bisect_left(self._by_name, (name, ""))
+        end = bisect_right(self._by_name, (name, chr(0x10FFFF)))
+        return [self.data[item_ID] for _, item_ID in self._by_name[start:end]]
+
+RESERVATION_TTL = 15 * 60  # Seconds a reservation holds stock before it expires and the stock is released
+
+class Reservation: # Stock held for one pending order until it's committed, released or expires
+    __slots__ = ("reservation_id", "items", "expires_at")
+    def __init__(self, reservation_id: str, items: Dict[str, int], expires_at: float):
+        self.reservation_id = reservation_id
+        self.items = items  # item_ID -> quantity held
+        self.expires_at = expires_at  # On InventoryManager.clock's timeline
+
+class InventoryManager: # Manages all product stock in the warehouse, with persistent storage in the /Data/ folder (or whichever storage backend is passed in)
     DATA_FILENAME = "products.json"
 
-    def __init__(self):
-        self.products: Dict[str, Product] = {}
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.products = ProductCatalogue()
+        self.backend = backend if backend is not None else JSONBackend()
+        self.backend.register(self.DATA_FILENAME, "item_ID")
+        self._lock = threading.Lock()  # Guards adding/removing products and the table of per-product locks
+        self._item_locks: Dict[str, threading.RLock] = {}  # One lock per item_ID, so orders for different products never wait on each other. Re-entrant, so a caller holding locked() can still call apply_stock_deltas
+        self.clock = time.monotonic  # Time source for reservation expiry
+        self._reservations: Dict[str, Reservation] = {}
+        self._expiries: List[Tuple[float, str]] = []  # (expires_at, reservation_id) heap - entries for reservations already committed or released are skipped when popped
+        self._reservation_lock = threading.Lock()  # Guards the two above
+        self._holding = threading.local()  # .depth > 0 while this thread is inside locked(), when releasing expired reservations could take product locks out of order
         self.load_products()
 
-    def load_products(self): # Load products from JSON file into memory
-        loaded_products = load_data(self.DATA_FILENAME, Product.from_dict)
-        self.products = {p.item_ID: p for p in loaded_products}
+    def load_products(self): # Load products from storage into memory, streamed one at a time rather than read in whole first
+        self.products = ProductCatalogue(self.backend.iter(self.DATA_FILENAME, Product.from_dict))
+
+    def save_products(self): # Save every current product to storage in one full rewrite
+        self.backend.save(self.DATA_FILENAME, list(self.products.values()), lambda p: p.to_dict())
 
-    def save_products(self): # Save current products to JSON file
-        save_data(list(self.products.values()), self.DATA_FILENAME, lambda p: p.to_dict())
+    @contextmanager
+    def locked(self, item_IDs: Iterable[str]) -> Iterator[None]: # Hold the locks for these products (always taken in sorted order, so two threads can't deadlock) so a check and the change that follows it happen as one step
+        with self._lock:
+            locks = [self._item_locks.setdefault(item_ID, threading.RLock()) for item_ID in sorted(set(item_IDs))]
+        for lock in locks:
+            lock.acquire()
+        self._holding.depth = getattr(self._holding, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self._holding.depth -= 1
+            for lock in reversed(locks):
+                lock.release()
 
     def add_product(self, product: Product) -> bool: # Adding a product and saving it
-        if product.item_ID in self.products:
-            return False
-        self.products[product.item_ID] = product
-        self.save_products()
+        with self.locked([product.item_ID]):
+            with self._lock:
+                if product.item_ID in self.products:
+                    return False
+                self.products[product.item_ID] = product
+            self.backend.upsert(self.DATA_FILENAME, [product.to_dict()])
         return True
 
+    def add_products(self, products: Iterable[Product]) -> List[Product]: # Add many products with a single save, skipping any whose item_ID is already taken. Returns the ones added
+        products = list(products)
+        with self.locked(p.item_ID for p in products):
+            with self._lock:
+                added = {}
+                for product in products:
+                    if product.item_ID not in self.products and product.item_ID not in added:
+                        added[product.item_ID] = product
+                added = list(added.values())
+                self.products.add_many(added)
+            if added:
+                self.backend.upsert(self.DATA_FILENAME, [product.to_dict() for product in added])
+        return added
+
     def remove_product(self, item_ID: str) -> bool: # Removing a product and saving it
-        if item_ID not in self.products:
-            return False
-        del self.products[item_ID]
-        self.save_products()
+        with self.locked([item_ID]):
+            with self._lock:
+                if item_ID not in self.products:
+                    return False
+                del self.products[item_ID]
+            self.backend.delete(self.DATA_FILENAME, [item_ID])
         return True
 
     def update_stock(self, item_ID: str, quantity_change: int) -> bool: # UPdating a product and saving it
-        product = self.products.get(item_ID)
-        if not product or product.quantity + quantity_change < 0:
+        return self.apply_stock_deltas({item_ID: quantity_change})
+
+    def apply_stock_deltas(self, deltas: Dict[str, int]) -> bool: # Apply several stock changes as one - either every change goes through and is saved in a single write, or none do. Safe to call from many threads at once
+        if not getattr(self._holding, "depth", 0): # Stock held by expired reservations is freed first. A caller already inside locked() should call expire_reservations before taking the locks
+            self.expire_reservations()
+        with self.locked(deltas):
+            changes = []
+            for item_ID, quantity_change in deltas.items():
+                product = self.products.get(item_ID)
+                if not product or product.available + quantity_change < 0: # Reserved stock can't be taken
+                    return False
+                changes.append((product, quantity_change))
+            for product, quantity_change in changes:
+                product.quantity += quantity_change
+                self.products.stock_changed(product)
+            self.backend.upsert(self.DATA_FILENAME, [product.to_dict() for product, _ in changes])
+        return True
+
+    def reserve(self, items: Dict[str, int], ttl: float = RESERVATION_TTL) -> Optional[str]: # Hold stock for an order without taking it yet - all of it or none. Returns the reservation's ID, or None if something isn't available
+        self.expire_reservations()
+        with self.locked(items):
+            products = []
+            for item_ID, quantity in items.items():
+                product = self.products.get(item_ID)
+                if not product or quantity <= 0 or product.available < quantity:
+                    return None
+                products.append((product, quantity))
+            for product, quantity in products:
+                product.reserved += quantity
+        reservation = Reservation(uuid.uuid4().hex, dict(items), self.clock() + ttl)
+        with self._reservation_lock:
+            self._reservations[reservation.reservation_id] = reservation
+            heapq.heappush(self._expiries, (reservation.expires_at, reservation.reservation_id))
+        return reservation.reservation_id
+
+    def _take_reservation(self, reservation_id: str) -> Optional[Reservation]: # Remove a reservation so only one caller can commit or release it
+        with self._reservation_lock:
+            return self._reservations.pop(reservation_id, None)
+
+    def commit(self, reservation_id: str) -> bool: # Turn a reservation into a stock deduction, saved in one write. False if it doesn't exist (already used, released or expired)
+        self.expire_reservations()
+        reservation = self._take_reservation(reservation_id)
+        if reservation is None:
             return False
-        product.quantity += quantity_change
-        self.save_products()
+        with self.locked(reservation.items):
+            changed = []
+            for item_ID, quantity in reservation.items.items():
+                product = self.products.get(item_ID)
+                if product is None: # Removed while reserved
+                    continue
+                product.reserved -= quantity
+                product.quantity -= quantity
+                self.products.stock_changed(product)
+                changed.append(product)
+            self.backend.upsert(self.DATA_FILENAME, [product.to_dict() for product in changed])
         return True
 
+    def release(self, reservation_id: str) -> bool: # Give reserved stock back without taking it. False if the reservation doesn't exist
+        reservation = self._take_reservation(reservation_id)
+        if reservation is None:
+            return False
+        self._unreserve(reservation)
+        return True
+
+    def _unreserve(self, reservation: Reservation):
+        with self.locked(reservation.items):
+            for item_ID, quantity in reservation.items.items():
+                product = self.products.get(item_ID)
+                if product is not None:
+                    product.reserved -= quantity
+
+    def has_reservation(self, reservation_id: str) -> bool: # Whether a reservation is still holding stock
+        with self._reservation_lock:
+            return reservation_id in self._reservations
+
+    def expire_reservations(self) -> int: # Release every reservation past its expiry - cheap when none are due, as only the top of the heap is looked at. Returns how many expired
+        now = self.clock()
+        expired = []
+        with self._reservation_lock:
+            while self._expiries and self._expiries[0][0] <= now:
+                _, reservation_id = heapq.heappop(self._expiries)
+                reservation = self._reservations.pop(reservation_id, None)
+                if reservation is not None:
+                    expired.append(reservation)
+        for reservation in expired:
+            self._unreserve(reservation)
+        return len(expired)
+
     def get_product(self, item_ID: str) -> Product: # Fetching product by ID provided
         return self.products.get(item_ID)
 
-    def list_low_stock_products(self) -> List[Product]: # List low stock products variant on threshhold
-        return [product for product in self.products.values() if product.is_low_stock()]
\ No newline at end of file
+    def list_low_stock_products(self) -> List[Product]: # List low stock products variant on threshhold, straight from the low stock index
+        return [self.products[item_ID] for item_ID in self.products.low_stock]
+
+    def find_by_price(self, min_price: float, max_price: float) -> List[Product]: # Products within a price range (inclusive), cheapest first
+        return self.products.in_price_range(min_price, max_price)
+
+    def find_by_name(self, name: str, prefix: bool = False) -> List[Product]: # Products by name, ignoring case - either an exact match or everything starting with name
+        return self.products.with_name_prefix(name) if prefix else self.products.with_name(name)
\ No newline at end of file
@@ -1,13 +1,15 @@
-import uuid
+import sys, uuid
 from inventory import InventoryManager, Product
 from order_processing import OrderProcessor, Customer
-from supplier import SupplierManager, Supplier, OrderStatus
+from supplier import SupplierManager, Supplier, OrderStatus, CatalogueEntry
 from financial import FinancialManager
+from demand import DemandEngine
 from datetime import date
 
 inventory_manager = InventoryManager() # Initialises the managers
-order_processor = OrderProcessor(inventory_manager)
-supplier_manager = SupplierManager()
+demand_engine = DemandEngine() # Learns each product's sales rate from the orders taken, for reorder planning
+order_processor = OrderProcessor(inventory_manager, demand=demand_engine)
+supplier_manager = SupplierManager(flush_interval=1.0) # Changes to a PO (creating it, adding items, its status) are saved together within a second
 financial_manager = FinancialManager()
 
 def inventory_menu():
@@ -102,7 +104,9 @@ def supplier_menu():
         print("3. Receive Delivery (Mark Delivered + Update Stock)")
         print("4. View Suppliers")
         print("5. View Purchase Orders")
-        print("6. Back")
+        print("6. Set Supplier Item Cost")
+        print("7. Generate Reorder POs")
+        print("8. Back")
         choice = input("Choose option: ")
 
         if choice == "1":
@@ -137,21 +141,18 @@ def supplier_menu():
                 po.add_item(item_ID, qty)
 
             po.update_status(OrderStatus.ORDERED)
-            print(f"PO {po_id} created.")
+            total = supplier_manager.purchase_order_cost(po, inventory_manager) # Supplier's catalogue cost where listed, product price otherwise
+            print(f"PO {po_id} created." if total is None else f"PO {po_id} created, costing £{total:.2f}.")
         elif choice == "3":
             po_id = input("PO ID to mark delivered: ")
-            po = supplier_manager.get_purchase_order(po_id)
-            if not po:
+            if not supplier_manager.get_purchase_order(po_id):
                 print("Not found.")
                 continue
 
-            for item_ID, qty in po.items.items():
-                inventory_manager.update_stock(item_ID, qty)
-            po.update_status(OrderStatus.DELIVERED)
-
-            # Assume we calculate total cost from product price
-            total_cost = sum(inventory_manager.get_product(item_ID).price * qty for item_ID, qty in po.items.items())
-            financial_manager.record_purchase(total_cost, f"PO {po_id} from {po.supplier.name}")
+            # Stock for every line, the DELIVERED status and the purchase (costed from the supplier catalogue, or the product price for items it doesn't list) are booked together, or not at all
+            if supplier_manager.receive_delivery(po_id, inventory_manager, financial_manager) is None:
+                print("Failed. Check the PO hasn't already been delivered or cancelled, and every item on it exists in inventory.")
+                continue
             print(f"PO {po_id} marked as delivered and inventory updated.")
         elif choice == "4":
             print("\nSuppliers:")
@@ -162,12 +163,31 @@ def supplier_menu():
             for po in supplier_manager.list_purchase_orders():
                 print(po)
         elif choice == "6":
+            sid = input("Supplier ID: ")
+            item_ID = input("Item ID: ")
+            try:
+                entry = CatalogueEntry(sid, item_ID, float(input("Unit cost: ")), float(input("Lead time (days): ")))
+            except ValueError:
+                print("Cost and lead time must be numbers, and not negative.")
+                continue
+            print("Saved." if supplier_manager.add_catalogue_entry(entry) else "Failed. Check supplier ID.")
+        elif choice == "7":
+            # Every product is checked against its reorder point in one pass, and each supplier gets one PENDING PO for its cheapest-sourced items
+            catalogue = supplier_manager.catalogue
+            plan = demand_engine.plan(list(inventory_manager.products.values()), supplier_manager.on_order(), catalogue.cheapest_supplier, date.today(), catalogue.cheapest_lead_time)
+            pos = supplier_manager.create_draft_purchase_orders(plan.by_supplier, date.today(), demand_engine.lead_time_days)
+            for po in pos:
+                print(po)
+            print(f"{len(pos)} draft POs created for {plan.lines} products.")
+            if plan.unsourced:
+                print(f"No supplier lists: {', '.join(plan.unsourced)}")
+        elif choice == "8":
             break
 
 
 def finance_menu():
     print("\n--- Financial Report ---")
-    print(financial_manager.generate_report())
+    financial_manager.write_report(sys.stdout) # Streamed straight to the terminal rather than built up as one string first
 
 def main_menu():
     while True:
@@ -194,4 +214,7 @@ def main_menu():
             print("Invalid choice.")
 
 if __name__ == "__main__":
-    main_menu()
+    try:
+        main_menu()
+    finally:
+        supplier_manager.close() # Save any PO changes still waiting to be flushed
@@ -0,0 +1,22 @@
+import sys
+from data_storage import DataFormat, DATA_DIR, migrate_data_dir
+
+# One-shot conversion of every .json file in /Data/ to another on-disk format, e.g. `python3 migrate_data.py jsonl`
+# Files are detected by their content when loaded, so existing files keep working before and after this is run
+
+def main(args) -> int:
+    names = [fmt.name.lower() for fmt in DataFormat]
+    if len(args) not in (1, 2) or args[0].lower() not in names:
+        print(f"Usage: migrate_data.py <{'|'.join(names)}> [data directory]")
+        return 1
+    fmt = DataFormat[args[0].upper()]
+    data_dir = args[1] if len(args) == 2 else DATA_DIR
+    migrated = migrate_data_dir(fmt, data_dir)
+    for name in migrated:
+        print(f"Migrated {name} to {fmt.name}")
+    if not migrated:
+        print(f"Nothing to migrate, every file in {data_dir} is already {fmt.name}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
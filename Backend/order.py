@@ -3,6 +3,7 @@ from datetime import datetime
 from typing import Dict
 
 class Order(ABC): # Abstract base class representing a generic order
+    __slots__ = ("_order_id", "_date", "_items", "_total_cost")  # Subclasses add their own fields in their own __slots__
     def __init__(self, order_id: str, date: datetime, items: Dict[str, int], total_cost: float):
         self._order_id = order_id  # Unique identifier for the order
         self._date = date  # Date the order was created
@@ -33,6 +34,7 @@ class Order(ABC): # Abstract base class representing a generic order
         return f"{self.order_type()} Order | ID: {self.order_id} | Date: {self.date.strftime('%Y-%m-%d')} | Total: ${self.total_cost:.2f}"
 
 class PurchaseOrder(Order): # Class representing a purchase order from a supplier
+    __slots__ = ("_supplier_id",)
     def __init__(self, order_id: str, date: datetime, items: Dict[str, int], total_cost: float, supplier_id: str):
         super().__init__(order_id, date, items, total_cost)
         self._supplier_id = supplier_id  # ID of the supplier the order is from
@@ -48,6 +50,7 @@ class PurchaseOrder(Order): # Class representing a purchase order from a supplie
         return super().__str__() + f" | Supplier ID: {self.supplier_id}"
 
 class SalesOrder(Order): # Class representing a sales order to a customer
+    __slots__ = ("_customer_name",)
     def __init__(self, order_id: str, date: datetime, items: Dict[str, int], total_cost: float, customer_name: str):
         super().__init__(order_id, date, items, total_cost)
         self._customer_name = customer_name  # Name of the customer
@@ -1,10 +1,16 @@
 # order_processing.py
 
-from typing import List, Dict
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from datetime import date
-from inventory import InventoryManager  # Make sure to have inventory.py ready
+from data_storage import StorageBackend, JSONBackend
+from inventory import InventoryManager, RESERVATION_TTL  # Make sure to have inventory.py ready
+from sku import LineItems, total_quantities
+from demand import DemandEngine
 
 class Customer: # Represents a customer who can place orders
+    __slots__ = ("customer_id", "name", "email", "phone")
     def __init__(self, customer_id: str, name: str, email: str, phone: str):
         self.customer_id = customer_id
         self.name = name
@@ -31,19 +37,27 @@ class Customer: # Represents a customer who can place orders
             phone=data["phone"]
         )
 
+    @classmethod
+    def from_row(cls, row: dict) -> 'Customer': # Build a customer from an imported CSV/JSON row - raises ValueError if a field is missing or invalid
+        values = {field: str(row.get(field) or "").strip() for field in ("customer_id", "name", "email", "phone")}
+        missing = [field for field, value in values.items() if not value]
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)}")
+        if "@" not in values["email"]:
+            raise ValueError("email must contain @")
+        return cls(**values)
+
 class CustomerOrder: # Represents a customer order with items and their quantities
+    __slots__ = ("order_id", "customer", "order_date", "items", "total_price")
     def __init__(self, order_id: str, customer: Customer, order_date: date):
         self.order_id = order_id
         self.customer = customer
         self.order_date = order_date
-        self.items: Dict[str, int] = {}  # item_ID -> quantity
+        self.items = LineItems()  # item_ID -> quantity
         self.total_price: float = 0.0
 
     def add_item(self, item_ID: str, quantity: int, price_per_unit: float): # Add item to the order
-        if item_ID in self.items:
-            self.items[item_ID] += quantity
-        else:
-            self.items[item_ID] = quantity
+        self.items.add(item_ID, quantity)
         self.total_price += quantity * price_per_unit
 
     def __str__(self):
@@ -54,7 +68,7 @@ class CustomerOrder: # Represents a customer order with items and their quantiti
             "order_id": self.order_id,
             "customer_id": self.customer.customer_id,
             "order_date": self.order_date.isoformat(),
-            "items": self.items,
+            "items": self.items.to_dict(),
             "total_price": self.total_price
         }
 
@@ -65,44 +79,168 @@ class CustomerOrder: # Represents a customer order with items and their quantiti
             customer=customer,
             order_date=date.fromisoformat(data["order_date"])
         )
-        order.items = data["items"]
+        order.items = LineItems(data["items"])
         order.total_price = data["total_price"]
         return order
 
-class OrderProcessor: #Handles order creation and stock deduction
-    def __init__(self, inventory_manager: InventoryManager):
+class OrderProcessor: #Handles order creation and stock deduction - create_order can be called from many threads at once. Customers and orders are kept in the /Data/ folder (or whichever storage backend is passed in), saved one record at a time
+    CUSTOMERS_FILE = "customers.json"
+    ORDERS_FILE = "orders.json"
+
+    def __init__(self, inventory_manager: InventoryManager, backend: Optional[StorageBackend] = None, demand: Optional[DemandEngine] = None):
         self.inventory_manager = inventory_manager
+        self.demand = demand  # Told about every completed order (and every saved one on load) so it can track each SKU's sales rate
         self.customers: Dict[str, Customer] = {}
         self.orders: Dict[str, CustomerOrder] = {}
+        self._by_customer: Dict[str, List[str]] = {}  # customer_id -> order_ids, in the order they were saved
+        self._by_date: List[Tuple[date, str]] = []  # (order_date, order_id), kept sorted
+        self.backend = backend if backend is not None else JSONBackend()
+        self.backend.register(self.CUSTOMERS_FILE, "customer_id")
+        self.backend.register(self.ORDERS_FILE, "order_id")
+        self._lock = threading.Lock()  # Guards customers, orders and the IDs of orders still being created
+        self._claimed: Set[str] = set()  # Order IDs a thread is part way through creating
+        self.pending: Dict[str, Tuple[str, CustomerOrder]] = {}  # order_id -> (reservation_id, order) for orders reserved but not yet confirmed
+        self._prune_at = 1024  # Size of pending that triggers dropping expired entries - doubles as it grows, so pruning stays cheap on average
+        self.load()
+
+    def load(self): # Load customers then their orders from storage, skipping orders whose customer no longer exists
+        self.customers = {c.customer_id: c for c in self.backend.iter(self.CUSTOMERS_FILE, Customer.from_dict)}
+        self.orders = {}
+        self._by_customer = {}
+        for order in self.backend.iter(self.ORDERS_FILE, lambda d: CustomerOrder.from_dict(d, self.customers[d["customer_id"]]), where=lambda d: d["customer_id"] in self.customers):
+            self.orders[order.order_id] = order
+            self._by_customer.setdefault(order.customer.customer_id, []).append(order.order_id)
+        self._by_date = sorted((order.order_date, order.order_id) for order in self.orders.values())  # Sorted once rather than inserted into one by one
+        if self.demand is not None:
+            for order_date, order_id in self._by_date:
+                self.demand.record(self.orders[order_id].items, order_date)
+
+    def _store_order(self, order: CustomerOrder): # Add a finished order to memory and its indexes, then save it
+        with self._lock:
+            self.orders[order.order_id] = order
+            self._by_customer.setdefault(order.customer.customer_id, []).append(order.order_id)
+            insort(self._by_date, (order.order_date, order.order_id))
+        self.backend.upsert(self.ORDERS_FILE, [order.to_dict()])
+        if self.demand is not None:
+            self.demand.record(order.items, order.order_date)
 
     def add_customer(self, customer: Customer) -> bool: # Adding a new customer (customers can't have the same ID)
-        if customer.customer_id in self.customers:
-            return False
-        self.customers[customer.customer_id] = customer
+        with self._lock:
+            if customer.customer_id in self.customers:
+                return False
+            self.customers[customer.customer_id] = customer
+        self.backend.upsert(self.CUSTOMERS_FILE, [customer.to_dict()])
         return True
 
-    def create_order(self, order_id: str, customer_id: str, order_date: date, items: Dict[str, int]) -> bool: # Attempt to create a customer order with given item_IDs and quantities
-        if order_id in self.orders or customer_id not in self.customers:
-            return False
+    def add_customers(self, customers: Iterable[Customer]) -> List[Customer]: # Add many customers at once, skipping any whose ID is already taken. Returns the ones added
+        added = []
+        with self._lock:
+            for customer in customers:
+                if customer.customer_id not in self.customers:
+                    self.customers[customer.customer_id] = customer
+                    added.append(customer)
+        if added:
+            self.backend.upsert(self.CUSTOMERS_FILE, [customer.to_dict() for customer in added])
+        return added
 
-        for item_ID, quantity in items.items():
-            product = self.inventory_manager.get_product(item_ID)
-            if not product or product.quantity < quantity:
+    def create_order(self, order_id: str, customer_id: str, order_date: date, items: Dict[str, int]) -> bool: # Attempt to create a customer order with given item_IDs and quantities
+        with self._lock: # Claim the order ID up front so two threads can't both create it
+            if order_id in self.orders or order_id in self.pending or order_id in self._claimed or customer_id not in self.customers:
+                return False
+            self._claimed.add(order_id)
+            customer = self.customers[customer_id]
+        try:
+            prices: Dict[str, float] = {}
+            for item_ID, quantity in items.items():
+                product = self.inventory_manager.get_product(item_ID)
+                if not product or product.quantity < quantity:
+                    return False # Stock is insufficient
+                prices[item_ID] = product.price
+
+            # Stock is removed for every line at once, with one save. The inventory re-checks stock under its per-product locks, so the check above going stale can never oversell
+            if not self.inventory_manager.apply_stock_deltas({item_ID: -quantity for item_ID, quantity in items.items()}):
+                return False
+
+            order = CustomerOrder(order_id, customer, order_date)
+            for item_ID, quantity in items.items():
+                order.add_item(item_ID, quantity, prices[item_ID])
+
+            self._store_order(order)
+            return True
+        finally:
+            with self._lock:
+                self._claimed.discard(order_id)
+
+    def reserve_order(self, order_id: str, customer_id: str, order_date: date, items: Dict[str, int], ttl: float = RESERVATION_TTL) -> bool: # First half of a two-phase order: the stock is held but not taken, so checkout can wait on payment. Follow with confirm_order or cancel_order - if neither comes within ttl seconds the stock is released
+        with self._lock:
+            if order_id in self.orders or order_id in self.pending or order_id in self._claimed or customer_id not in self.customers:
+                return False
+            self._claimed.add(order_id)
+            customer = self.customers[customer_id]
+            if len(self.pending) >= self._prune_at:
+                self._prune_pending()
+        try:
+            prices: Dict[str, float] = {}
+            for item_ID in items:
+                product = self.inventory_manager.get_product(item_ID)
+                if not product:
+                    return False
+                prices[item_ID] = product.price
+            reservation_id = self.inventory_manager.reserve(items, ttl)
+            if reservation_id is None:
                 return False # Stock is insufficient
 
-        customer = self.customers[customer_id]
-        order = CustomerOrder(order_id, customer, order_date)
-
-        for item_ID, quantity in items.items():
-            product = self.inventory_manager.get_product(item_ID)
-            order.add_item(item_ID, quantity, product.price)
-            self.inventory_manager.update_stock(item_ID, -quantity) # Stock is being removed
+            order = CustomerOrder(order_id, customer, order_date)
+            for item_ID, quantity in items.items():
+                order.add_item(item_ID, quantity, prices[item_ID])
+            with self._lock:
+                self.pending[order_id] = (reservation_id, order)
+            return True
+        finally:
+            with self._lock:
+                self._claimed.discard(order_id)
+
+    def _prune_pending(self): # Drop pending orders whose reservation has expired (call holding _lock)
+        for order_id, (reservation_id, _) in list(self.pending.items()):
+            if not self.inventory_manager.has_reservation(reservation_id):
+                del self.pending[order_id]
+        self._prune_at = max(1024, 2 * len(self.pending))
+
+    def confirm_order(self, order_id: str) -> bool: # Second half: take the reserved stock and make the order final. False if there's no such pending order or its reservation expired
+        with self._lock:
+            entry = self.pending.pop(order_id, None)
+        if entry is None:
+            return False
+        reservation_id, order = entry
+        if not self.inventory_manager.commit(reservation_id):
+            return False
+        self._store_order(order)
+        return True
 
-        self.orders[order_id] = order
+    def cancel_order(self, order_id: str) -> bool: # Abandon a pending order, giving its stock back straight away
+        with self._lock:
+            entry = self.pending.pop(order_id, None)
+        if entry is None:
+            return False
+        self.inventory_manager.release(entry[0])
         return True
 
     def get_order(self, order_id: str) -> CustomerOrder: # Retrieve an order by ID
         return self.orders.get(order_id)
 
     def list_orders(self) -> List[CustomerOrder]: # View all current orders
-        return list(self.orders.values())
\ No newline at end of file
+        return list(self.orders.values())
+
+    def orders_for_customer(self, customer_id: str) -> List[CustomerOrder]: # A customer's orders in the order they were saved, from the customer index
+        with self._lock:
+            return [self.orders[order_id] for order_id in self._by_customer.get(customer_id, [])]
+
+    def orders_between(self, start: date, end: date) -> List[CustomerOrder]: # Orders dated from start to end inclusive, in date order, from the date index
+        with self._lock:
+            first = bisect_left(self._by_date, (start, ""))
+            last = bisect_right(self._by_date, (end, chr(0x10FFFF)))
+            return [self.orders[order_id] for _, order_id in self._by_date[first:last]]
+
+    def units_sold(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, int]: # item_ID -> units ordered across every order (or those dated start to end inclusive), added up by SKU code
+        orders = self.list_orders() if start is None and end is None else self.orders_between(start or date.min, end or date.max)
+        return total_quantities(order.items for order in orders)
\ No newline at end of file
@@ -0,0 +1,193 @@
+import asyncio, json, sys, threading, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+from data_storage import JSONBackend, SegmentedLog
+from inventory import InventoryManager, Product, RESERVATION_TTL
+from order_processing import OrderProcessor, Customer
+from supplier import SupplierManager, Supplier, OrderStatus, CatalogueEntry
+from financial import FinancialManager
+
+# A local network front end to the same managers main.py drives from its menus, so many clients can use the warehouse at once
+# Protocol: one JSON object per line each way. Request {"id": any, "op": "create_order", "args": {...}} -> response {"id": same, "ok": true, "result": ...} or {"id": same, "ok": false, "error": "..."}
+# Run with `python3 service.py [host] [port]` from /COM5043OOP/Backend/ (defaults 127.0.0.1 8765)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+class WarehouseService: # Wraps the four managers as named operations, run on worker threads so saving to disk never blocks the event loop
+    def __init__(self, inventory_manager: InventoryManager, order_processor: OrderProcessor, supplier_manager: SupplierManager, financial_manager: FinancialManager, workers: int = 8):
+        self.inventory_manager = inventory_manager
+        self.order_processor = order_processor
+        self.supplier_manager = supplier_manager
+        self.financial_manager = financial_manager
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warehouse")
+        self._lock = threading.Lock()  # Inventory and order intake are thread-safe on their own, supplier and finance changes are made one at a time under this
+        self.operations: Dict[str, Callable[..., Any]] = {
+            "add_product": self.add_product,
+            "get_product": self.get_product,
+            "update_stock": self.update_stock,
+            "add_customer": self.add_customer,
+            "create_order": self.create_order,
+            "reserve_order": self.reserve_order,
+            "confirm_order": self.confirm_order,
+            "cancel_order": self.cancel_order,
+            "add_supplier": self.add_supplier,
+            "set_item_cost": self.set_item_cost,
+            "cheapest_supplier": self.cheapest_supplier,
+            "fastest_supplier": self.fastest_supplier,
+            "create_purchase_order": self.create_purchase_order,
+            "receive_delivery": self.receive_delivery,
+            "receive_deliveries": self.receive_deliveries,
+            "report": self.report,
+        }
+
+    @classmethod
+    def create(cls, data_dir: Optional[str] = None, workers: int = 8) -> 'WarehouseService': # Managers sharing one data directory (the usual /Data/ folder if none is given)
+        backend = JSONBackend(data_dir)
+        inventory_manager = InventoryManager(backend)
+        return cls(inventory_manager, OrderProcessor(inventory_manager, backend), SupplierManager(backend), FinancialManager(log=SegmentedLog(FinancialManager.LOG_PREFIX, data_dir=data_dir)), workers)
+
+    # --- Operations, each called with the request's args as keyword arguments ---
+
+    def add_product(self, item_ID: str, name: str, price: float, quantity: int, low_stock_threshold: int = 10) -> bool:
+        return self.inventory_manager.add_product(Product(item_ID, name, float(price), int(quantity), int(low_stock_threshold)))
+
+    def get_product(self, item_ID: str) -> Optional[dict]:
+        product = self.inventory_manager.get_product(item_ID)
+        return product.to_dict() if product else None
+
+    def update_stock(self, item_ID: str, quantity_change: int) -> bool:
+        return self.inventory_manager.update_stock(item_ID, int(quantity_change))
+
+    def add_customer(self, customer_id: str, name: str, email: str, phone: str) -> bool:
+        return self.order_processor.add_customer(Customer(customer_id, name, email, phone))
+
+    def create_order(self, customer_id: str, items: Dict[str, int], order_id: Optional[str] = None) -> Optional[str]: # Returns the new order's ID, or None if the customer or stock check failed
+        order_id = order_id or str(uuid.uuid4())[:8]
+        if not self.order_processor.create_order(order_id, customer_id, date.today(), {item_ID: int(qty) for item_ID, qty in items.items()}):
+            return None
+        total = self.order_processor.get_order(order_id).total_price
+        if total > 0:
+            with self._lock:
+                self.financial_manager.record_sale(total, f"Customer order {order_id}")
+        return order_id
+
+    def reserve_order(self, customer_id: str, items: Dict[str, int], order_id: Optional[str] = None, ttl: float = RESERVATION_TTL) -> Optional[str]: # Hold the stock for an order awaiting payment. Returns the order's ID, or None if the customer or stock check failed
+        order_id = order_id or str(uuid.uuid4())[:8]
+        if not self.order_processor.reserve_order(order_id, customer_id, date.today(), {item_ID: int(qty) for item_ID, qty in items.items()}, float(ttl)):
+            return None
+        return order_id
+
+    def confirm_order(self, order_id: str) -> bool: # Take the reserved stock and record the sale. False if the order isn't pending or its reservation expired
+        if not self.order_processor.confirm_order(order_id):
+            return False
+        total = self.order_processor.get_order(order_id).total_price
+        if total > 0:
+            with self._lock:
+                self.financial_manager.record_sale(total, f"Customer order {order_id}")
+        return True
+
+    def cancel_order(self, order_id: str) -> bool:
+        return self.order_processor.cancel_order(order_id)
+
+    def add_supplier(self, supplier_id: str, name: str, contact_name: str, phone: str, email: str, address: str) -> bool:
+        with self._lock:
+            return self.supplier_manager.add_supplier(Supplier(supplier_id, name, contact_name, phone, email, address))
+
+    def set_item_cost(self, supplier_id: str, item_ID: str, unit_cost: float, lead_time_days: float) -> bool: # Add or update a supplier's catalogue entry for an item. False if the supplier doesn't exist
+        with self._lock:
+            return self.supplier_manager.add_catalogue_entry(CatalogueEntry(supplier_id, item_ID, float(unit_cost), float(lead_time_days)))
+
+    def cheapest_supplier(self, item_ID: str) -> Optional[dict]: # The catalogue entry with the lowest unit cost for an item, or None if no supplier lists it
+        entry = self.supplier_manager.catalogue.cheapest(item_ID)
+        return entry.to_dict() if entry else None
+
+    def fastest_supplier(self, item_ID: str) -> Optional[dict]: # The catalogue entry with the shortest lead time for an item, or None if no supplier lists it
+        entry = self.supplier_manager.catalogue.fastest(item_ID)
+        return entry.to_dict() if entry else None
+
+    def create_purchase_order(self, supplier_id: str, expected_delivery: str, items: Dict[str, int], po_id: Optional[str] = None) -> Optional[str]: # Returns the new PO's ID, or None if the supplier doesn't exist
+        with self._lock:
+            po = self.supplier_manager.create_purchase_order(po_id or str(uuid.uuid4())[:8], supplier_id, date.today(), date.fromisoformat(expected_delivery))
+            if not po:
+                return None
+            for item_ID, qty in items.items():
+                po.add_item(item_ID, int(qty))
+            po.update_status(OrderStatus.ORDERED)
+            return po.po_id
+
+    def receive_delivery(self, po_id: str) -> Optional[float]: # Returns the delivery's cost, or None if the PO is unknown, not open, or names an unknown item
+        with self._lock:
+            return self.supplier_manager.receive_delivery(po_id, self.inventory_manager, self.financial_manager)
+
+    def receive_deliveries(self, po_ids: List[str]) -> Dict[str, Optional[float]]: # po_id -> cost, or None for each PO that couldn't be received
+        with self._lock:
+            return self.supplier_manager.receive_deliveries(po_ids, self.inventory_manager, self.financial_manager)
+
+    def report(self, start: Optional[str] = None, end: Optional[str] = None, page: int = 1, page_size: Optional[int] = None) -> str:
+        with self._lock:
+            return self.financial_manager.generate_report(date.fromisoformat(start) if start else None, date.fromisoformat(end) if end else None, int(page), page_size)
+
+    # --- Networking ---
+
+    def dispatch(self, request: dict) -> dict: # Run one request and wrap its result (or the reason it failed) as a response
+        response: Dict[str, Any] = {"id": request.get("id")}
+        operation = self.operations.get(request.get("op"))
+        if operation is None:
+            response.update(ok=False, error=f"Unknown operation {request.get('op')!r}")
+            return response
+        try:
+            response.update(ok=True, result=operation(**request.get("args", {})))
+        except Exception as e: # Bad or missing arguments, or a failed save - the client still gets a reply and its connection stays open
+            response.update(ok=False, error=f"{type(e).__name__}: {e}")
+        return response
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter): # Serve one connection, a request at a time, until the client hangs up
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    response = {"id": None, "ok": False, "error": f"Bad request: {e}"}
+                else:
+                    response = await loop.run_in_executor(self.executor, self.dispatch, request)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_client, host, port, limit=1 << 20)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.supplier_manager.close()  # Flush first - the managers share one backend
+        self.inventory_manager.backend.close()
+        self.financial_manager.log.close()
+
+def main(args) -> int:
+    host = args[0] if len(args) > 0 else DEFAULT_HOST
+    port = int(args[1]) if len(args) > 1 else DEFAULT_PORT
+    service = WarehouseService.create()
+    print(f"Warehouse service listening on {host}:{port} (Ctrl+C to stop)")
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        print("Stopping.")
+    finally:
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
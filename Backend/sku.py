@@ -0,0 +1,107 @@
+import threading
+from array import array
+from collections.abc import Mapping, MutableMapping
+from typing import Dict, Iterable, Iterator, List, Optional
+
+class SkuRegistry: # Gives every item_ID seen by the program one shared string and a small dense integer code, so orders and POs don't each hold their own copy of the same SKU text
+    def __init__(self):
+        self._codes: Dict[str, int] = {}  # item_ID -> code
+        self._skus: List[str] = []  # code -> item_ID, the one copy of each string everything else shares
+        self._lock = threading.Lock()  # Only taken when a new SKU is added - looking up a known one never waits
+
+    def code(self, item_ID: str) -> int: # The code for item_ID, adding it if it's new
+        code = self._codes.get(item_ID)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(item_ID)
+                if code is None:
+                    code = self._codes[item_ID] = len(self._skus)
+                    self._skus.append(item_ID)
+        return code
+
+    def lookup(self, item_ID: str) -> Optional[int]: # The code for item_ID, or None if it has never been seen (without adding it)
+        return self._codes.get(item_ID)
+
+    def sku(self, code: int) -> str:
+        return self._skus[code]
+
+    def intern(self, item_ID: str) -> str: # The shared copy of item_ID, so equal IDs loaded from different records are one string in memory
+        return self._skus[self.code(item_ID)]
+
+    def __contains__(self, item_ID: str) -> bool:
+        return item_ID in self._codes
+
+    def __len__(self) -> int:
+        return len(self._skus)
+
+SKUS = SkuRegistry()  # The registry products, customer orders and purchase orders all share
+
+class LineItems(MutableMapping): # An order's item_ID -> quantity lines, kept as SKU codes and quantities side by side in one array of machine integers (code, quantity, code, quantity...) instead of a dict of strings. Behaves like the dict it replaces, and equals a dict with the same lines
+    __slots__ = ("_lines", "_registry")
+
+    def __init__(self, items: Optional[Mapping] = None, registry: SkuRegistry = SKUS):
+        self._registry = registry
+        self._lines = array("q", [n for item_ID, quantity in (items or {}).items() for n in (registry.code(item_ID), quantity)])  # Built in one go so it isn't over-allocated
+
+    def _index(self, item_ID: str) -> int: # Position of item_ID's code in _lines, or -1. Orders only have a handful of lines, so a scan beats any index
+        code = self._registry.lookup(item_ID)
+        if code is not None:
+            try:
+                return self._lines[::2].index(code) * 2
+            except ValueError:
+                pass
+        return -1
+
+    def __getitem__(self, item_ID: str) -> int:
+        i = self._index(item_ID)
+        if i < 0:
+            raise KeyError(item_ID)
+        return self._lines[i + 1]
+
+    def __setitem__(self, item_ID: str, quantity: int):
+        i = self._index(item_ID)
+        if i < 0:
+            self._lines.extend((self._registry.code(item_ID), quantity))
+        else:
+            self._lines[i + 1] = quantity
+
+    def __delitem__(self, item_ID: str):
+        i = self._index(item_ID)
+        if i < 0:
+            raise KeyError(item_ID)
+        del self._lines[i:i + 2]
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._registry.sku(code) for code in self._lines[::2])
+
+    def __len__(self) -> int:
+        return len(self._lines) // 2
+
+    def __contains__(self, item_ID) -> bool:
+        return self._index(item_ID) >= 0
+
+    def add(self, item_ID: str, quantity: int): # Add quantity to item_ID's line, starting one if there isn't one yet
+        i = self._index(item_ID)
+        if i < 0:
+            self._lines.extend((self._registry.code(item_ID), quantity))
+        else:
+            self._lines[i + 1] += quantity
+
+    def coded(self) -> Iterator: # (code, quantity) pairs - for adding up many orders without turning codes back into strings
+        lines = iter(self._lines)
+        return zip(lines, lines)
+
+    def to_dict(self) -> Dict[str, int]: # A plain dict, for saving
+        return {self._registry.sku(code): quantity for code, quantity in self.coded()}
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+def total_quantities(line_items: Iterable[LineItems], registry: SkuRegistry = SKUS) -> Dict[str, int]: # item_ID -> total quantity across many orders' lines. Every order's array is joined into one, then summed by code in a flat list, so no strings are hashed until the end. SKUs that total zero are left out
+    lines = array("q")
+    for items in line_items:
+        lines.extend(items._lines)
+    totals = [0] * len(registry)  # Read after joining, so it covers every code in lines
+    for code, quantity in zip(lines[::2], lines[1::2]):
+        totals[code] += quantity
+    return {registry.sku(code): total for code, total in enumerate(totals) if total}
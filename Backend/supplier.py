@@ -1,7 +1,15 @@
-from typing import List, Dict, Optional
+import math, threading, weakref
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from enum import Enum, auto
-from datetime import date
-from data_storage import save_data, load_data
+from datetime import date, timedelta
+from data_storage import StorageBackend, JSONBackend
+from sku import LineItems, total_quantities
+
+PO_CACHE_SIZE = 1000  # Most purchase orders SupplierManager keeps built in memory at once on a backend with keyed gets (ones with unsaved changes don't count towards it)
 
 class OrderStatus(Enum): # Enum to represent the status of a purchase order
     PENDING = auto()
@@ -9,7 +17,10 @@ class OrderStatus(Enum): # Enum to represent the status of a purchase order
     DELIVERED = auto()
     CANCELLED = auto()
 
+OPEN_STATUSES = (OrderStatus.PENDING, OrderStatus.ORDERED)  # Statuses of POs still waiting to be delivered
+
 class Supplier: # Represents a supplier with contact info and order history
+    __slots__ = ("supplier_id", "name", "contact_name", "phone", "email", "address", "order_history")
     def __init__(self, supplier_id: str, name: str, contact_name: str, phone: str, email: str, address: str):
         self.supplier_id = supplier_id
         self.name = name
@@ -17,7 +28,7 @@ class Supplier: # Represents a supplier with contact info and order history
         self.phone = phone
         self.email = email
         self.address = address
-        self.order_history: List['PurchaseOrder'] = []
+        self.order_history = OrderHistory()
 
     def add_order(self, order: 'PurchaseOrder') -> None: # Add a purchase order to the supplier's order history
         self.order_history.append(order)
@@ -46,23 +57,88 @@ class Supplier: # Represents a supplier with contact info and order history
             address=data["address"]
         )
 
+    @classmethod
+    def from_row(cls, row: Dict) -> 'Supplier': # Build a supplier from an imported CSV/JSON row - raises ValueError if a field is missing or invalid
+        values = {field: str(row.get(field) or "").strip() for field in ("supplier_id", "name", "contact_name", "phone", "email", "address")}
+        missing = [field for field, value in values.items() if not value]
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)}")
+        if "@" not in values["email"]:
+            raise ValueError("email must contain @")
+        return cls(**values)
+
+class OrderHistory: # A supplier's purchase orders, keyed by po_id in the order they were added (so membership and append are O(1)). Once a SupplierManager sets resolve, POs are fetched through it (a batch at a time) when read instead of being kept here, so a supplier's old POs don't all sit in memory
+    def __init__(self):
+        self._dates: Dict[str, date] = {}  # po_id -> order date, in the order added
+        self._orders: Dict[str, 'PurchaseOrder'] = {}  # POs added while there's no resolve to fetch them through
+        self._by_date: Optional[List[str]] = []  # po_ids in date order, or None when it needs re-sorting
+        self.resolve: Optional[Callable[[List[str]], List['PurchaseOrder']]] = None  # po_ids -> their POs, in the same order
+
+    def append(self, order: 'PurchaseOrder'): # Adding a PO already in the history does nothing
+        if self.resolve is None:
+            self._orders[order.po_id] = order
+        self.append_id(order.po_id, order.order_date)
+
+    def append_id(self, po_id: str, order_date: date): # Record a PO that will be fetched through resolve
+        if po_id in self._dates:
+            return
+        self._dates[po_id] = order_date
+        if self._by_date is not None: # POs mostly arrive in date order, so the date-ordered list only needs re-sorting when one doesn't
+            if self._by_date and order_date < self._dates[self._by_date[-1]]:
+                self._by_date = None
+            else:
+                self._by_date.append(po_id)
+
+    def ids(self) -> List[str]:
+        return list(self._dates)
+
+    def _get_all(self, po_ids: List[str]) -> List['PurchaseOrder']:
+        missing = [po_id for po_id in po_ids if po_id not in self._orders]
+        fetched = {po.po_id: po for po in self.resolve(missing)} if missing and self.resolve else {}
+        return [self._orders[po_id] if po_id in self._orders else fetched[po_id] for po_id in po_ids if po_id in self._orders or po_id in fetched]
+
+    def by_date(self, newest_first: bool = False) -> Iterator['PurchaseOrder']: # The POs in order date order (ties in the order they were added), for history views
+        if self._by_date is None:
+            self._by_date = sorted(self._dates, key=self._dates.__getitem__)
+        return iter(self._get_all(list(reversed(self._by_date)) if newest_first else self._by_date))
+
+    def __contains__(self, order) -> bool: # Takes a PO or a po_id
+        return getattr(order, "po_id", order) in self._dates
+
+    def __iter__(self) -> Iterator['PurchaseOrder']:
+        return iter(self._get_all(list(self._dates)))
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def __getitem__(self, index):
+        ids = list(self._dates)
+        if isinstance(index, slice):
+            return self._get_all(ids[index])
+        return self._get_all([ids[index]])[0]
+
 class PurchaseOrder: # Represents a purchase order made to a supplier
+    __slots__ = ("po_id", "supplier", "order_date", "expected_delivery", "status", "items", "on_change", "__weakref__")
     def __init__(self, po_id: str, supplier: Supplier, order_date: date, expected_delivery: date):
         self.po_id = po_id
         self.supplier = supplier
         self.order_date = order_date
         self.expected_delivery = expected_delivery
         self.status = OrderStatus.PENDING
-        self.items: Dict[str, int] = {}  # item_ID -> quantity ordered
+        self.items = LineItems()  # item_ID -> quantity ordered
+        self.on_change: Optional[Callable[['PurchaseOrder'], None]] = None  # Called after every add_item/update_status - SupplierManager uses it to know which POs need saving
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
 
     def add_item(self, item_ID: str, quantity: int) -> None: # Ard or update the quantity of a product in this orde
-        if item_ID in self.items:
-            self.items[item_ID] += quantity
-        else:
-            self.items[item_ID] = quantity
+        self.items.add(item_ID, quantity)
+        self._changed()
 
     def update_status(self, new_status: OrderStatus) -> None: # Update the status of the purchase order
         self.status = new_status
+        self._changed()
 
     def __str__(self):
         return f"PO {self.po_id} to {self.supplier.name} on {self.order_date}, Status: {self.status.name}"
@@ -74,7 +150,7 @@ class PurchaseOrder: # Represents a purchase order made to a supplier
             "order_date": self.order_date.isoformat(),
             "expected_delivery": self.expected_delivery.isoformat(),
             "status": self.status.name,
-            "items": self.items
+            "items": self.items.to_dict()
         }
 
     @classmethod
@@ -86,49 +162,398 @@ class PurchaseOrder: # Represents a purchase order made to a supplier
             expected_delivery=date.fromisoformat(data["expected_delivery"])
         )
         order.status = OrderStatus[data["status"]]
-        order.items = data["items"]
+        order.items = LineItems(data["items"])
         return order
 
 
-class SupplierManager:
+class CatalogueEntry: # One item a supplier sells us, at what cost and how many days it takes to arrive
+    __slots__ = ("supplier_id", "item_ID", "unit_cost", "lead_time_days")
+    def __init__(self, supplier_id: str, item_ID: str, unit_cost: float, lead_time_days: float):
+        if unit_cost < 0 or lead_time_days < 0:
+            raise ValueError("unit_cost and lead_time_days can't be negative")
+        self.supplier_id = supplier_id
+        self.item_ID = item_ID
+        self.unit_cost = unit_cost
+        self.lead_time_days = lead_time_days
+
+    @property
+    def entry_id(self) -> str: # Key the entry is saved under
+        return f"{self.supplier_id}/{self.item_ID}"
+
+    def __str__(self):
+        return f"{self.item_ID} from {self.supplier_id}: £{self.unit_cost:.2f} each, {self.lead_time_days:g} days"
+
+    def to_dict(self) -> Dict:
+        return {
+            "entry_id": self.entry_id,
+            "supplier_id": self.supplier_id,
+            "item_ID": self.item_ID,
+            "unit_cost": self.unit_cost,
+            "lead_time_days": self.lead_time_days
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CatalogueEntry':
+        return cls(
+            supplier_id=data["supplier_id"],
+            item_ID=data["item_ID"],
+            unit_cost=data["unit_cost"],
+            lead_time_days=data["lead_time_days"]
+        )
+
+class SupplierCatalogue: # Every CatalogueEntry, indexed both ways (item -> suppliers, supplier -> items), with each item's cheapest and fastest supplier kept up to date so asking for them is one dict lookup
+    def __init__(self, entries: Iterable[CatalogueEntry] = ()):
+        self._by_item: Dict[str, Dict[str, CatalogueEntry]] = {}  # item_ID -> supplier_id -> entry
+        self._by_supplier: Dict[str, Dict[str, CatalogueEntry]] = {}  # supplier_id -> item_ID -> entry
+        self._cheapest: Dict[str, CatalogueEntry] = {}  # item_ID -> lowest unit_cost (then shortest lead time)
+        self._fastest: Dict[str, CatalogueEntry] = {}  # item_ID -> shortest lead time (then lowest unit_cost)
+        for entry in entries:
+            self.add(entry)
+
+    @staticmethod
+    def _cost_rank(entry: CatalogueEntry):
+        return entry.unit_cost, entry.lead_time_days, entry.supplier_id
+
+    @staticmethod
+    def _speed_rank(entry: CatalogueEntry):
+        return entry.lead_time_days, entry.unit_cost, entry.supplier_id
+
+    def _rerank(self, item_ID: str): # Work out an item's cheapest and fastest from scratch - only needed when an entry is removed or gets worse
+        entries = self._by_item.get(item_ID)
+        if entries:
+            self._cheapest[item_ID] = min(entries.values(), key=self._cost_rank)
+            self._fastest[item_ID] = min(entries.values(), key=self._speed_rank)
+        else:
+            self._cheapest.pop(item_ID, None)
+            self._fastest.pop(item_ID, None)
+
+    def add(self, entry: CatalogueEntry): # Add an entry, replacing the supplier's previous one for the same item
+        previous = self._by_item.setdefault(entry.item_ID, {}).get(entry.supplier_id)
+        self._by_item[entry.item_ID][entry.supplier_id] = entry
+        self._by_supplier.setdefault(entry.supplier_id, {})[entry.item_ID] = entry
+        cheapest, fastest = self._cheapest.get(entry.item_ID), self._fastest.get(entry.item_ID)
+        if previous is not None and (previous is cheapest or previous is fastest):
+            self._rerank(entry.item_ID)  # The best entry changed and may now be worse than another
+            return
+        if cheapest is None or self._cost_rank(entry) < self._cost_rank(cheapest):
+            self._cheapest[entry.item_ID] = entry
+        if fastest is None or self._speed_rank(entry) < self._speed_rank(fastest):
+            self._fastest[entry.item_ID] = entry
+
+    def remove(self, supplier_id: str, item_ID: str) -> Optional[CatalogueEntry]:
+        entry = self._by_item.get(item_ID, {}).pop(supplier_id, None)
+        if entry is None:
+            return None
+        del self._by_supplier[supplier_id][item_ID]
+        if not self._by_supplier[supplier_id]:
+            del self._by_supplier[supplier_id]
+        if not self._by_item[item_ID]:
+            del self._by_item[item_ID]
+        if self._cheapest.get(item_ID) is entry or self._fastest.get(item_ID) is entry:
+            self._rerank(item_ID)
+        return entry
+
+    def remove_supplier(self, supplier_id: str) -> List[CatalogueEntry]: # Drop everything a supplier sells, returning the entries removed
+        return [self.remove(supplier_id, item_ID) for item_ID in list(self._by_supplier.get(supplier_id, ()))]
+
+    def get(self, supplier_id: str, item_ID: str) -> Optional[CatalogueEntry]:
+        return self._by_supplier.get(supplier_id, {}).get(item_ID)
+
+    def suppliers_for(self, item_ID: str) -> List[CatalogueEntry]: # Every supplier's entry for an item, cheapest first
+        return sorted(self._by_item.get(item_ID, {}).values(), key=self._cost_rank)
+
+    def items_from(self, supplier_id: str) -> List[CatalogueEntry]: # Everything a supplier sells, in the order it was added
+        return list(self._by_supplier.get(supplier_id, {}).values())
+
+    def cheapest(self, item_ID: str) -> Optional[CatalogueEntry]:
+        return self._cheapest.get(item_ID)
+
+    def fastest(self, item_ID: str) -> Optional[CatalogueEntry]:
+        return self._fastest.get(item_ID)
+
+    def cheapest_supplier(self, item_ID: str) -> Optional[str]: # supplier_id only - the shape DemandEngine.plan's supplier_for wants
+        entry = self._cheapest.get(item_ID)
+        return entry.supplier_id if entry is not None else None
+
+    def cheapest_lead_time(self, item_ID: str) -> Optional[float]: # Lead time from the supplier an item would be ordered from
+        entry = self._cheapest.get(item_ID)
+        return entry.lead_time_days if entry is not None else None
+
+    def unit_costs(self, supplier_id: str, items: Iterable[str]) -> Dict[str, float]: # item_ID -> unit cost for the items this supplier lists, from a single lookup of the supplier's price list
+        listed = self._by_supplier.get(supplier_id, {})
+        return {item_ID: listed[item_ID].unit_cost for item_ID in items if item_ID in listed}
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._by_supplier.values())
+
+class PurchaseOrderStore(MutableMapping): # The po_id -> PurchaseOrder dict, except only the IDs are held for every PO - the POs themselves are built from storage when first used and kept in a bounded least-recently-used cache. With cache_size None nothing is evicted, so it's a plain dict of POs added with add_loaded
+    def __init__(self, backend: StorageBackend, collection: str, build: Callable[[dict], PurchaseOrder], cache_size: Optional[int] = PO_CACHE_SIZE):
+        self.backend = backend
+        self.collection = collection
+        self.build = build  # Saved record -> PurchaseOrder
+        self.cache_size = cache_size
+        self._index: Dict[str, str] = {}  # po_id -> supplier_id, for every PO whether built or not
+        self._cache: OrderedDict = OrderedDict()  # po_id -> PurchaseOrder, least recently used first
+        self._unsaved: Set[str] = set()  # po_ids of cached POs with changes not yet saved - these are never evicted
+        self._evicted = weakref.WeakValueDictionary()  # po_id -> PO dropped from the cache that something else still holds, handed back rather than building a second copy
+
+    def add_index(self, po_id: str, supplier_id: str): # Note a saved PO without building it
+        self._index[po_id] = supplier_id
+
+    def add_loaded(self, po: PurchaseOrder): # A saved PO already built at startup
+        self._index[po.po_id] = po.supplier.supplier_id
+        self._cache[po.po_id] = po
+        self._evict()
+
+    def mark_changed(self, po_id: str): # Call when a PO changes, so it stays cached until saved
+        self._unsaved.add(po_id)
+
+    def mark_saved(self, po_id: str): # Call after saving a PO, so it can be evicted once it's cold
+        self._unsaved.discard(po_id)
+
+    def is_cached(self, po_id: str) -> bool:
+        return po_id in self._cache
+
+    def _cache_put(self, po: PurchaseOrder):
+        self._cache[po.po_id] = po
+        self._evict()
+
+    def _evict(self): # Drop the least recently used POs until back under cache_size, passing over (and keeping) any with unsaved changes
+        if self.cache_size is None:
+            return
+        for _ in range(len(self._cache)):
+            if len(self._cache) <= self.cache_size:
+                return
+            po_id = next(iter(self._cache))
+            if po_id in self._unsaved:
+                self._cache.move_to_end(po_id)
+                continue
+            self._evicted[po_id] = self._cache.pop(po_id)
+
+    def _revive(self, po_id: str) -> Optional[PurchaseOrder]: # An evicted PO still held elsewhere, put back in the cache - so there's only ever one live copy of a PO
+        po = self._evicted.pop(po_id, None)
+        if po is not None:
+            self._cache_put(po)
+        return po
+
+    def __getitem__(self, po_id: str) -> PurchaseOrder:
+        po = self._cache.get(po_id)
+        if po is not None:
+            self._cache.move_to_end(po_id)
+            return po
+        if po_id not in self._index:
+            raise KeyError(po_id)
+        po = self._revive(po_id)
+        if po is not None:
+            return po
+        record = self.backend.get(self.collection, po_id)
+        if record is None:
+            raise KeyError(po_id)
+        po = self.build(record)
+        self._cache_put(po)
+        return po
+
+    def __setitem__(self, po_id: str, po: PurchaseOrder): # A new (not yet saved) PO - held until mark_saved is called
+        self._index[po_id] = po.supplier.supplier_id
+        self._cache[po_id] = po
+        self._cache.move_to_end(po_id)
+        self._unsaved.add(po_id)
+        self._evict()
+
+    def __delitem__(self, po_id: str):
+        del self._index[po_id]
+        self._cache.pop(po_id, None)
+        self._evicted.pop(po_id, None)
+        self._unsaved.discard(po_id)
+
+    def __contains__(self, po_id) -> bool:
+        return po_id in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._index))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_many(self, po_ids: Iterable[str]) -> List[PurchaseOrder]: # These POs, in the order given - cached ones as they are, the rest built in one pass over storage rather than fetched one by one. Unknown IDs are skipped
+        po_ids = [po_id for po_id in po_ids if po_id in self._index]
+        cached = {po_id: self._cache[po_id] for po_id in po_ids if po_id in self._cache}
+        for po_id in po_ids:
+            if po_id not in cached:
+                po = self._revive(po_id)
+                if po is not None:
+                    cached[po_id] = po
+        missing = {po_id for po_id in po_ids if po_id not in cached}
+        built = {}
+        if missing:
+            for po in self.backend.iter(self.collection, self.build, where=lambda d: d["po_id"] in missing):
+                built[po.po_id] = po
+        orders = []
+        for po_id in po_ids:
+            po = cached.get(po_id) or built.get(po_id)
+            if po is None:
+                continue
+            orders.append(po)
+            if po_id in built:
+                self._cache_put(po)
+        return orders
+
+    def values(self) -> List[PurchaseOrder]: # Every PO, in one pass over storage for any not cached
+        return self.get_many(list(self._index))
+
+    def items(self):
+        return [(po.po_id, po) for po in self.values()]
+
+class SupplierManager: # Purchase orders are loaded lazily when the backend can fetch one by key (see PurchaseOrderStore), and saved incrementally - only POs that changed are written, by flush()
     SUPPLIERS_FILE = "suppliers.json"
     PURCHASE_ORDERS_FILE = "purchase_orders.json"
+    CATALOGUE_FILE = "supplier_catalogue.json"
 
-    def __init__(self):
+    def __init__(self, backend: Optional[StorageBackend] = None, cache_size: int = PO_CACHE_SIZE, flush_interval: float = 0.0):
         self.suppliers: Dict[str, Supplier] = {}
-        self.purchase_orders: Dict[str, PurchaseOrder] = {}
+        self.backend = backend if backend is not None else JSONBackend()
+        self.backend.register(self.SUPPLIERS_FILE, "supplier_id")
+        self.backend.register(self.PURCHASE_ORDERS_FILE, "po_id")
+        self.backend.register(self.CATALOGUE_FILE, "entry_id")
+        self.catalogue = SupplierCatalogue()
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval  # Seconds changed POs may wait to be saved, so a burst of changes is written together. 0 saves every change straight away
+        self._dirty: Dict[str, PurchaseOrder] = {}  # POs changed since they were last saved
+        self._flush_lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._by_status: Dict[OrderStatus, Set[str]] = {status: set() for status in OrderStatus}  # status -> po_ids
+        self._by_delivery: List[Tuple[date, str]] = []  # (expected_delivery, po_id) for open POs only, kept sorted - delivered and cancelled ones drop out so date queries never wade through history
+        self._indexed: Dict[str, Tuple[OrderStatus, date]] = {}  # po_id -> the status and delivery date it's indexed under
+        self._batch_depth = 0  # > 0 while inside batched(), when changes wait for its single flush
+        self._receive_lock = threading.RLock()  # One delivery (or batch of them) is received at a time, so a PO can't be received twice
+        self.purchase_orders = PurchaseOrderStore(self.backend, self.PURCHASE_ORDERS_FILE, self._build_purchase_order, cache_size)
         self.load_suppliers()
         self.load_purchase_orders()
+        self.load_catalogue()
+
+    def _build_purchase_order(self, data: Dict) -> PurchaseOrder:
+        po = PurchaseOrder.from_dict(data, self.suppliers[data["supplier_id"]])
+        po.on_change = self._po_changed
+        return po
+
+    def _index_po(self, po_id: str, status: OrderStatus, expected_delivery: date): # Add or move a PO in the status and delivery date indexes
+        current = self._indexed.get(po_id)
+        if current == (status, expected_delivery):
+            return
+        if current is not None:
+            self._unindex_po(po_id)
+        self._by_status[status].add(po_id)
+        if status in OPEN_STATUSES:
+            insort(self._by_delivery, (expected_delivery, po_id))
+        self._indexed[po_id] = (status, expected_delivery)
+
+    def _unindex_po(self, po_id: str):
+        status, expected_delivery = self._indexed.pop(po_id)
+        self._by_status[status].discard(po_id)
+        position = bisect_left(self._by_delivery, (expected_delivery, po_id))
+        if position < len(self._by_delivery) and self._by_delivery[position] == (expected_delivery, po_id):
+            del self._by_delivery[position]
+
+    def _po_changed(self, po: PurchaseOrder): # A PO needs saving - now, or when the flush timer fires
+        with self._flush_lock:
+            self._index_po(po.po_id, po.status, po.expected_delivery)
+            self._dirty[po.po_id] = po
+            self.purchase_orders.mark_changed(po.po_id)
+            if self._batch_depth:
+                return
+            if self.flush_interval <= 0:
+                self.flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> int: # Save every PO changed since the last flush in one write. Returns how many were saved
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            dirty = list(self._dirty.values())
+            if dirty:
+                self.backend.upsert(self.PURCHASE_ORDERS_FILE, [po.to_dict() for po in dirty])
+                self._dirty = {}  # Only once the write has gone through - if it fails, the POs are still waiting for the next flush (or close)
+                for po in dirty:
+                    self.purchase_orders.mark_saved(po.po_id)
+            return len(dirty)
+
+    @contextmanager
+    def batched(self) -> Iterator[None]: # PO changes made inside are saved together by one flush at the end, whatever flush_interval is
+        with self._flush_lock:
+            self._batch_depth += 1
+            try:
+                yield
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    def close(self): # Save anything still waiting to be flushed
+        self.flush()
+
+    def _attach(self, supplier: Supplier): # Have the supplier's order history fetch its POs through the store
+        supplier.order_history.resolve = lambda po_ids: self.purchase_orders.get_many(po_ids)
 
     def save_suppliers(self):
-        save_data(list(self.suppliers.values()), self.SUPPLIERS_FILE, lambda s: s.to_dict())
+        self.backend.save(self.SUPPLIERS_FILE, list(self.suppliers.values()), lambda s: s.to_dict())
 
     def load_suppliers(self):
-        loaded_suppliers = load_data(self.SUPPLIERS_FILE, Supplier.from_dict)
-        self.suppliers = {s.supplier_id: s for s in loaded_suppliers}
-
-    def save_purchase_orders(self):
-        save_data(list(self.purchase_orders.values()), self.PURCHASE_ORDERS_FILE, lambda po: po.to_dict())
-
-    def load_purchase_orders(self):
-        loaded_orders_data = load_data(self.PURCHASE_ORDERS_FILE, lambda d: d)  # just raw dicts
-        for order_data in loaded_orders_data:
-            supplier_id = order_data["supplier_id"]
-            supplier = self.suppliers.get(supplier_id)
-            if supplier:
-                po = PurchaseOrder.from_dict(order_data, supplier)
-                self.purchase_orders[po.po_id] = po
-                # Also add order to supplier's history if not already there
-                if po not in supplier.order_history:
-                    supplier.order_history.append(po)
+        self.suppliers = {s.supplier_id: s for s in self.backend.iter(self.SUPPLIERS_FILE, Supplier.from_dict)}
+        for supplier in self.suppliers.values():
+            self._attach(supplier)
+
+    def load_catalogue(self): # Entries for suppliers that no longer exist are skipped
+        self.catalogue = SupplierCatalogue(self.backend.iter(self.CATALOGUE_FILE, CatalogueEntry.from_dict, where=lambda d: d["supplier_id"] in self.suppliers))
+
+    def save_purchase_orders(self): # A full rewrite of every PO - flush() is usually all that's needed
+        with self._flush_lock:
+            orders = self.purchase_orders.values()
+            self.backend.save(self.PURCHASE_ORDERS_FILE, orders, lambda po: po.to_dict())
+            self._dirty.clear()
+            for po in orders:
+                self.purchase_orders.mark_saved(po.po_id)
+
+    def load_purchase_orders(self): # On a backend with keyed gets (SQLite) only each PO's ID, supplier, status and dates are kept at startup and the POs are built on first use. On one without (JSON files, where fetching one PO means scanning the whole file) every PO is built now and kept. Any whose supplier no longer exists are skipped
+        lazy = self.backend.KEYED_GET
+        self.purchase_orders = PurchaseOrderStore(self.backend, self.PURCHASE_ORDERS_FILE, self._build_purchase_order, self.cache_size if lazy else None)
+        self._by_status = {status: set() for status in OrderStatus}
+        self._indexed = {}
+        for record in self.backend.iter(self.PURCHASE_ORDERS_FILE, lambda d: d, where=lambda d: d["supplier_id"] in self.suppliers):
+            po_id, supplier_id, order_date = record["po_id"], record["supplier_id"], record["order_date"]
+            status, expected_delivery = OrderStatus[record["status"]], date.fromisoformat(record["expected_delivery"])
+            if lazy:
+                self.purchase_orders.add_index(po_id, supplier_id)
+            else:
+                self.purchase_orders.add_loaded(self._build_purchase_order(record))
+            self._by_status[status].add(po_id)
+            self._indexed[po_id] = (status, expected_delivery)
+            self.suppliers[supplier_id].order_history.append_id(po_id, date.fromisoformat(order_date))  # Also add order to supplier's history - a no-op if it's already there
+        self._by_delivery = sorted((expected_delivery, po_id) for po_id, (status, expected_delivery) in self._indexed.items() if status in OPEN_STATUSES)  # Sorted once rather than inserted into one by one
 
     def add_supplier(self, supplier: Supplier) -> bool:
         if supplier.supplier_id in self.suppliers:
             return False
         self.suppliers[supplier.supplier_id] = supplier
-        self.save_suppliers()
+        self._attach(supplier)
+        self.backend.upsert(self.SUPPLIERS_FILE, [supplier.to_dict()])
         return True
 
+    def add_suppliers(self, suppliers: Iterable[Supplier]) -> List[Supplier]: # Add many suppliers with a single save, skipping any whose ID is already taken. Returns the ones added
+        added = {}
+        for supplier in suppliers:
+            if supplier.supplier_id not in self.suppliers and supplier.supplier_id not in added:
+                added[supplier.supplier_id] = supplier
+        self.suppliers.update(added)
+        for supplier in added.values():
+            self._attach(supplier)
+        if added:
+            self.backend.upsert(self.SUPPLIERS_FILE, [supplier.to_dict() for supplier in added.values()])
+        return list(added.values())
+
     def update_supplier(self, supplier_id: str, **kwargs) -> bool:
         supplier = self.suppliers.get(supplier_id)
         if not supplier:
@@ -136,27 +561,70 @@ class SupplierManager:
         for key, value in kwargs.items():
             if hasattr(supplier, key):
                 setattr(supplier, key, value)
-        self.save_suppliers()
+        self.backend.upsert(self.SUPPLIERS_FILE, [supplier.to_dict()])
         return True
 
     def delete_supplier(self, supplier_id: str) -> bool:
         if supplier_id in self.suppliers:
-            del self.suppliers[supplier_id]
-            self.save_suppliers()
+            for po_id in self.suppliers.pop(supplier_id).order_history.ids(): # Its POs stay saved but are dropped from memory, as they would be on the next load
+                if po_id in self.purchase_orders:
+                    del self.purchase_orders[po_id]
+                if po_id in self._indexed:
+                    self._unindex_po(po_id)
+                self._dirty.pop(po_id, None)
+            self.backend.delete(self.SUPPLIERS_FILE, [supplier_id])
+            removed = self.catalogue.remove_supplier(supplier_id)
+            if removed:
+                self.backend.delete(self.CATALOGUE_FILE, [entry.entry_id for entry in removed])
             return True
         return False
 
+    def add_catalogue_entries(self, entries: Iterable[CatalogueEntry]) -> List[CatalogueEntry]: # Add or update what suppliers sell and at what cost, with a single save. Entries for unknown suppliers are skipped. Returns the ones stored
+        stored = [entry for entry in entries if entry.supplier_id in self.suppliers]
+        for entry in stored:
+            self.catalogue.add(entry)
+        if stored:
+            self.backend.upsert(self.CATALOGUE_FILE, [entry.to_dict() for entry in stored])
+        return stored
+
+    def add_catalogue_entry(self, entry: CatalogueEntry) -> bool:
+        return bool(self.add_catalogue_entries([entry]))
+
+    def remove_catalogue_entry(self, supplier_id: str, item_ID: str) -> bool:
+        entry = self.catalogue.remove(supplier_id, item_ID)
+        if entry is None:
+            return False
+        self.backend.delete(self.CATALOGUE_FILE, [entry.entry_id])
+        return True
+
     def create_purchase_order(self, po_id: str, supplier_id: str, order_date: date, expected_delivery: date) -> Optional[PurchaseOrder]:
         if po_id in self.purchase_orders or supplier_id not in self.suppliers:
             return None
         supplier = self.suppliers[supplier_id]
         po = PurchaseOrder(po_id, supplier, order_date, expected_delivery)
+        po.on_change = self._po_changed
         self.purchase_orders[po_id] = po
         supplier.add_order(po)
-        self.save_purchase_orders()
-        self.save_suppliers()  # Save suppliers too because order history changed
+        self._po_changed(po)  # Order history is rebuilt from the POs on load, so suppliers.json doesn't need rewriting
         return po
 
+    def create_draft_purchase_orders(self, by_supplier: Dict[str, Dict[str, int]], order_date: date, lead_time_days: float) -> List[PurchaseOrder]: # One PENDING PO per supplier from supplier_id -> item_ID -> quantity (e.g. a ReorderPlan's by_supplier), all saved by one flush. Each is expected after the longest catalogue lead time among its lines (lead_time_days if none are listed). Suppliers that don't exist are skipped
+        created = []
+        with self.batched():
+            for supplier_id, items in by_supplier.items():
+                if supplier_id not in self.suppliers or not items:
+                    continue
+                po_id, n = f"AUTO-{order_date:%Y%m%d}-{supplier_id}", 1
+                while po_id in self.purchase_orders:
+                    n += 1
+                    po_id = f"AUTO-{order_date:%Y%m%d}-{supplier_id}-{n}"
+                lead_time = max((entry.lead_time_days for entry in (self.catalogue.get(supplier_id, item_ID) for item_ID in items) if entry is not None), default=lead_time_days)
+                po = self.create_purchase_order(po_id, supplier_id, order_date, order_date + timedelta(days=math.ceil(lead_time)))
+                for item_ID, quantity in items.items():
+                    po.add_item(item_ID, quantity)
+                created.append(po)
+        return created
+
     def get_supplier(self, supplier_id: str) -> Optional[Supplier]:  # Get supplier by ID
         return self.suppliers.get(supplier_id)
 
@@ -167,4 +635,109 @@ class SupplierManager:
         return list(self.suppliers.values())
 
     def list_purchase_orders(self) -> List[PurchaseOrder]: # Return all purchase orders
-        return list(self.purchase_orders.values())
\ No newline at end of file
+        return list(self.purchase_orders.values())
+
+    def purchase_orders_with_status(self, *statuses: OrderStatus) -> List[PurchaseOrder]: # POs with any of these statuses, from the status index
+        return self.purchase_orders.get_many(po_id for status in statuses for po_id in self._by_status[status])
+
+    def open_purchase_orders(self) -> List[PurchaseOrder]: # POs still waiting to be delivered (PENDING or ORDERED)
+        return self.purchase_orders_with_status(*OPEN_STATUSES)
+
+    def on_order(self) -> Dict[str, int]: # item_ID -> units on open POs, i.e. stock that's coming but hasn't arrived
+        return total_quantities(po.items for po in self.open_purchase_orders())
+
+    def deliveries_between(self, start: date, end: date) -> List[PurchaseOrder]: # Open POs expected from start to end inclusive, soonest first
+        first = bisect_left(self._by_delivery, (start, ""))
+        last = bisect_right(self._by_delivery, (end, chr(0x10FFFF)))
+        return self.purchase_orders.get_many(po_id for _, po_id in self._by_delivery[first:last])
+
+    def overdue_purchase_orders(self, today: Optional[date] = None) -> List[PurchaseOrder]: # Open POs whose expected delivery date has passed, most overdue first
+        last = bisect_left(self._by_delivery, (today or date.today(), ""))
+        return self.purchase_orders.get_many(po_id for _, po_id in self._by_delivery[:last])
+
+    # --- Receiving deliveries ---
+    # inventory_manager and financial_manager are the InventoryManager and FinancialManager the delivery is booked into
+
+    def purchase_order_cost(self, po: PurchaseOrder, inventory_manager=None) -> Optional[float]: # What a PO's items cost at the supplier's catalogue prices, all looked up at once. Items the supplier doesn't list are costed at the product's price in inventory_manager if one is given; None if any item can't be costed
+        costs = self.catalogue.unit_costs(po.supplier.supplier_id, po.items)
+        total_cost = 0.0
+        for item_ID, quantity in po.items.items():
+            unit_cost = costs.get(item_ID)
+            if unit_cost is None:
+                product = inventory_manager.get_product(item_ID) if inventory_manager is not None else None
+                if product is None:
+                    return None
+                unit_cost = product.price
+            total_cost += unit_cost * quantity
+        return total_cost
+
+    def _delivery_cost(self, po: PurchaseOrder, inventory_manager) -> Optional[float]: # What receiving a PO costs, or None if it isn't open or names an item not in inventory
+        if po.status not in OPEN_STATUSES:
+            return None
+        if any(inventory_manager.get_product(item_ID) is None for item_ID in po.items):
+            return None
+        return self.purchase_order_cost(po, inventory_manager)
+
+    def receive_delivery(self, po_id: str, inventory_manager, financial_manager) -> Optional[float]: # Receive a PO in full: every line is checked first, then stock for all of them is added in one write, the PO marked DELIVERED and its cost posted as a purchase - if a later step fails the earlier ones are undone. Returns the cost, or None if the PO is unknown, not open, or names an unknown item
+        with self._receive_lock:
+            po = self.get_purchase_order(po_id)
+            if po is None:
+                return None
+            inventory_manager.expire_reservations() # Done before taking the locks - apply_stock_deltas can't safely do it while they're held
+            with inventory_manager.locked(po.items): # Held throughout, so undoing the stock change can't fail because someone else used the stock
+                total_cost = self._delivery_cost(po, inventory_manager)
+                if total_cost is None or not inventory_manager.apply_stock_deltas(dict(po.items)):
+                    return None
+                previous_status = po.status
+                try:
+                    with self.batched(): # Saved before returning whatever flush_interval is, so a crash can't leave the stock added but the PO still open to be received again
+                        po.update_status(OrderStatus.DELIVERED)
+                    if total_cost > 0:
+                        financial_manager.record_purchase(total_cost, f"PO {po.po_id} from {po.supplier.name}")
+                except BaseException: # Stock is taken back first, so if saving the old status fails too the PO can't be received again on top of stock it already added
+                    inventory_manager.apply_stock_deltas({item_ID: -quantity for item_ID, quantity in po.items.items()})
+                    if po.status is not previous_status:
+                        with self.batched():
+                            po.update_status(previous_status)
+                    raise
+        return total_cost
+
+    def receive_deliveries(self, po_ids: Iterable[str], inventory_manager, financial_manager) -> Dict[str, Optional[float]]: # Receive many POs at once - stock for all of them in one write, the POs in one save and the purchases in one append. Returns po_id -> cost, with None for POs skipped as unknown, not open, or naming an unknown item
+        results: Dict[str, Optional[float]] = {}
+        with self._receive_lock:
+            accepted: List[Tuple[PurchaseOrder, float]] = []
+            deltas: Dict[str, int] = {}
+            for po_id in po_ids:
+                if po_id in results:
+                    continue
+                po = self.get_purchase_order(po_id)
+                total_cost = self._delivery_cost(po, inventory_manager) if po is not None else None
+                results[po_id] = total_cost
+                if total_cost is not None:
+                    accepted.append((po, total_cost))
+                    for item_ID, quantity in po.items.items():
+                        deltas[item_ID] = deltas.get(item_ID, 0) + quantity
+            if not accepted:
+                return results
+
+            inventory_manager.expire_reservations()
+            with inventory_manager.locked(deltas):
+                stocked = inventory_manager.apply_stock_deltas(deltas)
+                if stocked:
+                    previous = [(po, po.status) for po, _ in accepted]
+                    try:
+                        with self.batched():
+                            for po, _ in accepted:
+                                po.update_status(OrderStatus.DELIVERED)
+                        financial_manager.record_purchases([(total_cost, f"PO {po.po_id} from {po.supplier.name}") for po, total_cost in accepted if total_cost > 0])
+                    except BaseException: # Stock first, as in receive_delivery
+                        inventory_manager.apply_stock_deltas({item_ID: -quantity for item_ID, quantity in deltas.items()})
+                        with self.batched():
+                            for po, status in previous:
+                                if po.status is not status:
+                                    po.update_status(status)
+                        raise
+            if not stocked: # A product was removed since the check - receive them one by one so only the affected POs fail. Done after letting go of the locks, as each receipt expires reservations before taking its own
+                for po, _ in accepted:
+                    results[po.po_id] = self.receive_delivery(po.po_id, inventory_manager, financial_manager)
+        return results
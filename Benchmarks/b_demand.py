@@ -0,0 +1,60 @@
+import os, sys, random, tempfile, time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+from data_storage import JSONBackend
+from inventory import Product
+from supplier import SupplierManager, Supplier
+from demand import DemandEngine
+
+# Feeds a month of orders across a large catalogue into the demand engine, then times one reorder planning pass over every SKU against a time budget, and drafting the resulting POs.
+# A second, sparse case sells every SKU on one day and plans months later, so each SKU has a long run of quiet days to fold
+# Run from /COM5043OOP/ with `python3 Benchmarks/b_demand.py [SKUs] [budget seconds]` - everything is written to a temporary directory
+
+DAYS = 30
+SPARSE_GAP_DAYS = 180
+ORDERS = 200000
+LINES_PER_ORDER = 3
+SUPPLIERS = 200
+
+def main():
+    skus = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    rng = random.Random(1)
+    ids = [f"SKU{i:07d}" for i in range(skus)]
+    weights = [1 / (rank + 1) for rank in range(skus)]  # A few fast sellers and a long tail, like a real catalogue
+    start = date(2024, 1, 1)
+    print(f"Demand benchmark - {skus} SKUs, {ORDERS} orders over {DAYS} days, {SUPPLIERS} suppliers\n")
+
+    engine = DemandEngine()
+    picks = rng.choices(ids, weights, k=ORDERS * LINES_PER_ORDER)
+    began = time.perf_counter()
+    for n in range(ORDERS):
+        lines = picks[n * LINES_PER_ORDER:(n + 1) * LINES_PER_ORDER]
+        engine.record({item_ID: 1 + n % 4 for item_ID in lines}, start + timedelta(days=n * DAYS // ORDERS))
+    recorded = time.perf_counter() - began
+    print(f"record:   {ORDERS / recorded:>10.0f} orders/s ({1e6 * recorded / ORDERS:.1f} us each)")
+
+    products = [Product(item_ID, item_ID, 1.0, rng.randrange(0, 200)) for item_ID in ids]
+    source = {item_ID: f"S{i % SUPPLIERS:03d}" for i, item_ID in enumerate(ids)}
+    on_order = {item_ID: 20 for item_ID in ids[::10]}
+    plan = engine.plan(products, on_order, source.get, start + timedelta(days=DAYS))
+    verdict = "within" if plan.seconds <= budget else "OVER"
+    print(f"plan:     {plan.seconds:>10.3f} s for {plan.checked} SKUs -> {plan.lines} lines for {len(plan.by_supplier)} suppliers ({verdict} the {budget:.1f} s budget)")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = SupplierManager(JSONBackend(data_dir))
+        manager.add_suppliers(Supplier(f"S{i:03d}", f"Supplier {i}", "Buyer", "000", "buyer@example.com", "1 Road") for i in range(SUPPLIERS))
+        began = time.perf_counter()
+        pos = manager.create_draft_purchase_orders(plan.by_supplier, start + timedelta(days=DAYS), engine.lead_time_days)
+        print(f"draft:    {time.perf_counter() - began:>10.3f} s for {len(pos)} POs, saved in one flush")
+
+    sparse = DemandEngine()
+    sparse.record({item_ID: 1 + i % 4 for i, item_ID in enumerate(ids)}, start)
+    sparse_plan = sparse.plan(products, on_order, source.get, start + timedelta(days=SPARSE_GAP_DAYS))
+    sparse_verdict = "within" if sparse_plan.seconds <= budget else "OVER"
+    print(f"sparse:   {sparse_plan.seconds:>10.3f} s for {sparse_plan.checked} SKUs after {SPARSE_GAP_DAYS} quiet days ({sparse_verdict} the {budget:.1f} s budget)")
+    sys.exit(0 if plan.seconds <= budget and sparse_plan.seconds <= budget else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+from data_storage import Durability, DataFormat, Journal, save_data
+
+# Measures how much each durability mode costs, for full-file saves and for journal appends, so a deployment can pick its own trade off
+# Run from /COM5043OOP/ with `python3 Benchmarks/b_durability.py [number of products]` - everything is written to a temporary directory
+
+def product(i: int) -> dict:
+    return {"item_ID": f"SKU{i:06d}", "name": f"Product {i}", "price": round(1 + i * 0.01, 2), "quantity": i % 500, "low_stock_threshold": 10}
+
+def bench_saves(records, data_dir: str, durability: Durability, fmt: DataFormat, repeats: int) -> float: # Full snapshot saves per second
+    start = time.perf_counter()
+    for _ in range(repeats):
+        save_data(records, "products.json", lambda r: r, data_dir, fmt, durability, sync_dir=durability is Durability.FSYNC)
+    return repeats / (time.perf_counter() - start)
+
+def bench_appends(data_dir: str, durability: Durability, count: int) -> float: # Single-record journal appends per second
+    journal = Journal("products.journal", durability, data_dir)
+    start = time.perf_counter()
+    for i in range(count):
+        journal.append([{"op": "put", "key": f"SKU{i % 1000:06d}", "value": product(i % 1000)}])
+    journal.close()
+    return count / (time.perf_counter() - start)
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    records = [product(i) for i in range(size)]
+    print(f"Durability benchmark - {size} products\n")
+    print(f"{'Mode':<8}{'Format':<8}{'Saves/s':>12}{'Save ms':>10}{'Appends/s':>14}{'Append us':>11}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        for durability in Durability:
+            appends = bench_appends(data_dir, durability, 2000)
+            for fmt in DataFormat:
+                saves = bench_saves(records, data_dir, durability, fmt, 5)
+                print(f"{durability.name:<8}{fmt.name:<8}{saves:>12.1f}{1000 / saves:>10.2f}{appends:>14.0f}{1e6 / appends:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os, sys, tracemalloc
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+from inventory import Product
+from financial import Transaction
+from order_processing import Customer, CustomerOrder
+from supplier import Supplier, PurchaseOrder
+import order
+
+# Measures the bytes each domain object costs with __slots__ against the same fields held in an ordinary per-instance __dict__ (how the classes were laid out before)
+# Run from /COM5043OOP/ with `python3 Benchmarks/b_memory.py [objects per class]` - the field values are shared, so only the objects themselves are counted
+
+def samples() -> list: # One fully built instance of every slotted class
+    customer = Customer("C1", "Alice Smith", "alice@example.com", "07700 900000")
+    supplier = Supplier("S1", "Acme", "Bob", "01234 567890", "bob@acme.com", "1 High St")
+    customer_order = CustomerOrder("ORD1", customer, date.today())
+    customer_order.add_item("SKU1", 2, 9.99)
+    purchase_order = PurchaseOrder("PO1", supplier, date.today(), date.today())
+    purchase_order.add_item("SKU1", 10)
+    return [
+        Product("SKU1", "Widget", 9.99, 100), Transaction("sale", 19.98, "Order ORD1"), customer, customer_order, supplier, purchase_order,
+        order.PurchaseOrder("PO1", datetime.now(), {"SKU1": 10}, 99.9, "S1"), order.SalesOrder("ORD1", datetime.now(), {"SKU1": 2}, 19.98, "Alice Smith"),
+    ]
+
+def slot_names(cls) -> list: # Every field slot from the class and its bases (not __weakref__, which can't be set)
+    return [name for klass in cls.__mro__ for name in klass.__dict__.get("__slots__", ()) if name != "__weakref__"]
+
+def bytes_per_object(build, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build() for _ in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return used / count
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"Memory benchmark - {count} objects per class (list overhead included in both columns)\n")
+    print(f"{'Class':<32}{'__dict__ B':>12}{'__slots__ B':>13}{'Saved':>8}")
+    for sample in samples():
+        cls = type(sample)
+        fields = {name: getattr(sample, name) for name in slot_names(cls)}
+        dict_cls = type(cls.__name__, (), {})  # Stand-in for the class without __slots__ - a fresh one each time so instances share keys the way a real class's would
+
+        def slotted():
+            obj = object.__new__(cls)
+            for name, value in fields.items():
+                setattr(obj, name, value)
+            return obj
+
+        def dict_backed():
+            obj = dict_cls()
+            for name, value in fields.items():
+                setattr(obj, name, value)
+            return obj
+
+        old, new = bytes_per_object(dict_backed, count), bytes_per_object(slotted, count)
+        print(f"{cls.__module__ + '.' + cls.__name__:<32}{old:>12.0f}{new:>13.0f}{1 - new / old:>8.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os, sys, random, tempfile, threading, time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+from data_storage import Durability, JSONBackend
+from inventory import InventoryManager, Product
+from order_processing import OrderProcessor, Customer
+
+# Many threads taking orders against the same, deliberately scarce, stock. Checks nothing is oversold and reports orders/second per thread count
+# Run from /COM5043OOP/ with `python3 Benchmarks/b_order_intake.py [orders per thread]` - everything is written to a temporary directory
+
+PRODUCTS = 200
+STOCK_PER_PRODUCT = 500
+LINES_PER_ORDER = 3
+
+def run(threads: int, orders_per_thread: int):
+    with tempfile.TemporaryDirectory() as data_dir:
+        inventory = InventoryManager(JSONBackend(data_dir, Durability.FLUSH, compact_threshold=5000))
+        for i in range(PRODUCTS):
+            inventory.add_product(Product(f"SKU{i:04d}", f"Product {i}", 2.5, STOCK_PER_PRODUCT))
+        processor = OrderProcessor(inventory, inventory.backend)
+        processor.add_customer(Customer("C1", "Load Test", "load@example.com", "000"))
+
+        def worker(n: int):
+            rng = random.Random(n)
+            for k in range(orders_per_thread):
+                items = {f"SKU{rng.randrange(PRODUCTS):04d}": rng.randint(1, 5) for _ in range(LINES_PER_ORDER)}
+                processor.create_order(f"T{n}-{k}", "C1", date.today(), items)
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        sold: dict = {}
+        for order in processor.list_orders():
+            for item_ID, quantity in order.items.items():
+                sold[item_ID] = sold.get(item_ID, 0) + quantity
+        oversold = [item_ID for item_ID, product in inventory.products.items()
+                    if product.quantity < 0 or product.quantity + sold.get(item_ID, 0) != STOCK_PER_PRODUCT]
+        inventory.backend.close()
+        attempted = threads * orders_per_thread
+        return attempted / elapsed, len(processor.orders), attempted, oversold
+
+def main():
+    orders_per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"Order intake benchmark - {PRODUCTS} products x {STOCK_PER_PRODUCT} stock, {orders_per_thread} orders per thread\n")
+    print(f"{'Threads':>8}{'Orders/s':>12}{'Accepted':>10}{'Attempted':>11}  Stock check")
+    for threads in (1, 2, 4, 8, 16):
+        rate, accepted, attempted, oversold = run(threads, orders_per_thread)
+        print(f"{threads:>8}{rate:>12.0f}{accepted:>10}{attempted:>11}  {'OK' if not oversold else f'OVERSOLD {len(oversold)} products'}")
+        if oversold:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
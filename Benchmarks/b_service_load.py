@@ -0,0 +1,96 @@
+import os, sys, asyncio, json, random, tempfile, threading, time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Backend'))
+from service import WarehouseService
+
+# Load generator for service.py - many concurrent clients sending a mix of orders, stock updates and lookups. Reports requests/second and latency percentiles per client count
+# Run from /COM5043OOP/ with `python3 Benchmarks/b_service_load.py [requests per client] [host port]`
+# Without host and port a service is started in-process on a temporary data directory, seeded with products and a customer. With them, an already running service is seeded and loaded instead
+
+PRODUCTS = 200
+CLIENTS = (1, 8, 32)
+
+class Client: # One connection sending one request at a time and timing each round trip
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader, self.writer = reader, writer
+        self.next_id = 0
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> 'Client':
+        return cls(*await asyncio.open_connection(host, port, limit=1 << 20))
+
+    async def call(self, op: str, **args):
+        self.next_id += 1
+        self.writer.write(json.dumps({"id": self.next_id, "op": op, "args": args}).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        response = json.loads(await self.reader.readline())
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+async def seed(host: str, port: int):
+    client = await Client.connect(host, port)
+    for i in range(PRODUCTS):
+        await client.call("add_product", item_ID=f"SKU{i:04d}", name=f"Product {i}", price=2.5, quantity=1_000_000)
+    await client.call("add_customer", customer_id="C1", name="Load Test", email="load@example.com", phone="000")
+    await client.call("add_supplier", supplier_id="S1", name="Load Supplier", contact_name="Load", phone="000", email="s@example.com", address="N/A")
+    await client.close()
+
+async def worker(host: str, port: int, n: int, requests: int, latencies: list):
+    rng = random.Random(n)
+    client = await Client.connect(host, port)
+    for _ in range(requests):
+        roll = rng.random()
+        start = time.perf_counter()
+        if roll < 0.6:
+            await client.call("create_order", customer_id="C1", items={f"SKU{rng.randrange(PRODUCTS):04d}": rng.randint(1, 5) for _ in range(3)})
+        elif roll < 0.9:
+            await client.call("get_product", item_ID=f"SKU{rng.randrange(PRODUCTS):04d}")
+        elif roll < 0.98:
+            await client.call("update_stock", item_ID=f"SKU{rng.randrange(PRODUCTS):04d}", quantity_change=rng.randint(1, 20))
+        else:
+            po_id = await client.call("create_purchase_order", supplier_id="S1", expected_delivery=(date.today() + timedelta(days=7)).isoformat(), items={f"SKU{rng.randrange(PRODUCTS):04d}": 10})
+            await client.call("receive_delivery", po_id=po_id)
+        latencies.append(time.perf_counter() - start)
+    await client.close()
+
+async def load(host: str, port: int, clients: int, requests: int):
+    latencies: list = []
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, n, requests, latencies) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(f"{clients:>3} clients: {len(latencies) / elapsed:>8.0f} req/s  p50 {pct(0.50):6.2f} ms  p99 {pct(0.99):6.2f} ms")
+
+def start_in_process(data_dir: str):
+    service = WarehouseService.create(data_dir)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    async def serve():
+        server = await asyncio.start_server(service.handle_client, "127.0.0.1", 0, limit=1 << 20)
+        service.port = server.sockets[0].getsockname()[1]
+        started.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True).start()
+    started.wait()
+    return service
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as data_dir:
+        if len(sys.argv) > 3:
+            host, port = sys.argv[2], int(sys.argv[3])
+        else:
+            host, port = "127.0.0.1", start_in_process(data_dir).port
+        asyncio.run(seed(host, port))
+        for clients in CLIENTS:
+            asyncio.run(load(host, port, clients, requests))
@@ -0,0 +1,71 @@
+import os, io, json, tempfile
+import unittest
+from Backend.bulk_import import BulkImporter, read_rows
+
+class Item: # Stand-in for a product/customer/supplier so the importer can be tested on its own
+    def __init__(self, item_id: str, size: int):
+        self.item_id = item_id
+        self.size = size
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'Item':
+        if not row.get("id"):
+            raise ValueError("id is required")
+        return cls(row["id"], int(row.get("size", 0)))
+
+class TestReadRows(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_csv_rows_with_line_numbers(self): # CSV rows come back as dicts keyed by the header, numbered by file line
+        path = os.path.join(self.tmp.name, "items.csv")
+        with open(path, "w", newline="") as f:
+            f.write("id,size\na,1\nb,2\n")
+        self.assertEqual(list(read_rows(path)), [(2, {"id": "a", "size": "1"}), (3, {"id": "b", "size": "2"})])
+
+    def test_jsonl_bad_line_passed_on_as_error(self): # Blank lines are skipped, unparseable ones become errors rather than stopping the import
+        path = os.path.join(self.tmp.name, "items.jsonl")
+        with open(path, "w") as f:
+            f.write('{"id": "a"}\n\nnot json\n')
+        rows = list(read_rows(path))
+        self.assertEqual(rows[0], (1, {"id": "a"}))
+        self.assertEqual(rows[1][0], 3)
+        self.assertIsInstance(rows[1][1], ValueError)
+
+class TestBulkImporter(unittest.TestCase):
+    def setUp(self):
+        self.store = {"taken": Item("taken", 0)}
+        self.batches = []
+
+        def add_many(items):
+            self.batches.append([i.item_id for i in items])
+            added = [i for i in items if i.item_id not in self.store]
+            self.store.update((i.item_id, i) for i in added)
+            return added
+        self.importer = BulkImporter(Item.from_row, add_many, lambda i: i.item_id, self.store, chunk_size=2)
+
+    def test_chunks_and_rejects(self): # Valid rows are added two at a time, invalid and duplicate ones are written to rejects with a reason
+        rows = [(1, {"id": "a"}), (2, {"size": "3"}), (3, {"id": "b"}), (4, {"id": "a"}), (5, {"id": "taken"}), (6, {"id": "c"}), (7, ValueError("invalid JSON")), (8, ["not", "a", "dict"])]
+        rejects = io.StringIO()
+        result = self.importer.run(iter(rows), rejects)
+        self.assertEqual(self.batches, [["a", "b"], ["c"]])
+        self.assertEqual((result.read, result.imported, result.rejected), (8, 3, 5))
+        reasons = {r["line"]: r["error"] for r in map(json.loads, rejects.getvalue().splitlines())}
+        self.assertEqual(reasons, {2: "id is required", 4: "duplicate ID", 5: "duplicate ID", 7: "invalid JSON", 8: "row must be an object"})
+
+    def test_lost_race_counts_as_rejected(self): # An ID taken between the duplicate check and the add is rejected, not counted as imported
+        self.importer.existing = set()
+        result = self.importer.run(iter([(1, {"id": "taken"}), (2, {"id": "d"})]))
+        self.assertEqual((result.imported, result.rejected), (1, 1))
+
+    def test_progress_after_each_chunk(self):
+        seen = []
+        self.importer.progress = lambda r: seen.append(r.read)
+        self.importer.run(iter([(n, {"id": str(n)}) for n in range(1, 6)]))
+        self.assertEqual(seen, [2, 4, 5])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,289 @@
+import unittest, os, json, tempfile
+from unittest.mock import patch
+from Backend import data_storage
+from Backend.data_storage import Journal, Durability, DataFormat, JSONBackend, SQLiteBackend, save_data, load_data, iter_data, detect_format, migrate_data, migrate_data_dir
+
+class TestJournal(unittest.TestCase):
+    def setUp(self): # Point the storage at a throwaway directory so the real /Data/ folder is never touched
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.object(data_storage, "DATA_DIR", self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_append_and_replay(self): # Records come back in the order they were appended
+        journal = Journal("test.journal", Durability.FSYNC)
+        journal.append([{"op": "put", "key": "a", "value": 1}])
+        journal.append([{"op": "put", "key": "b", "value": 2}, {"op": "del", "key": "a"}])
+        self.assertEqual(journal.length, 3)
+        journal.close()
+
+        replayed = Journal("test.journal").replay()
+        self.assertEqual([r["key"] for r in replayed], ["a", "b", "a"])
+        self.assertEqual(replayed[2]["op"], "del")
+
+    def test_records_are_compact_lines(self): # One record per line with no indentation
+        journal = Journal("test.journal")
+        journal.append([{"op": "put", "key": "a", "value": {"x": 1}}])
+        journal.close()
+        with open(os.path.join(self.tmp.name, "test.journal")) as f:
+            self.assertEqual(f.read(), '{"op":"put","key":"a","value":{"x":1}}\n')
+
+    def test_torn_last_line_is_ignored(self): # A half-written record from a crash must not stop the rest loading
+        with open(os.path.join(self.tmp.name, "test.journal"), "w") as f:
+            f.write('{"op":"put","key":"a","value":1}\n{"op":"put","ke')
+        replayed = Journal("test.journal").replay()
+        self.assertEqual(len(replayed), 1)
+
+    def test_append_after_torn_line(self): # New records are not glued onto a half-written line, so they are not lost on the next replay
+        with open(os.path.join(self.tmp.name, "test.journal"), "w") as f:
+            f.write('{"op":"put","key":"a","value":1}\n{"op":"put","ke')
+        journal = Journal("test.journal")
+        journal.append([{"op": "put", "key": "b", "value": 2}])
+        journal.close()
+        self.assertEqual([r["key"] for r in Journal("test.journal").replay()], ["a", "b"])
+
+    def test_reset_empties_journal(self):
+        journal = Journal("test.journal")
+        journal.append([{"op": "del", "key": "a"}])
+        journal.reset()
+        self.assertEqual(journal.length, 0)
+        self.assertEqual(Journal("test.journal").replay(), [])
+
+class TestIterData(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.records = [{"id": str(i), "name": "item " * (i % 7), "n": i} for i in range(200)]
+        save_data(self.records, "items.json", lambda r: r, self.tmp.name)
+
+    def test_streams_across_chunk_boundaries(self): # Tiny chunks force elements to be split between reads
+        with patch.object(data_storage, "READ_CHUNK_SIZE", 7):
+            self.assertEqual(list(iter_data("items.json", lambda r: r, self.tmp.name)), self.records)
+
+    def test_matches_load_data(self):
+        self.assertEqual(load_data("items.json", lambda r: r["n"], self.tmp.name), list(range(200)))
+
+    def test_limit_and_where(self): # Partial scans stop early and filter before building objects
+        built = []
+        first_even = list(iter_data("items.json", lambda r: built.append(r) or r["n"], self.tmp.name, limit=3, where=lambda r: r["n"] % 2 == 0))
+        self.assertEqual(first_even, [0, 2, 4])
+        self.assertEqual(len(built), 3)
+
+    def test_compact_and_empty_arrays(self):
+        with open(os.path.join(self.tmp.name, "compact.json"), "w") as f:
+            f.write('[1,2.5,{"a":[1,2]},"x"]')
+        with open(os.path.join(self.tmp.name, "empty.json"), "w") as f:
+            f.write("[ ]")
+        with patch.object(data_storage, "READ_CHUNK_SIZE", 2):
+            self.assertEqual(list(iter_data("compact.json", lambda r: r, self.tmp.name)), [1, 2.5, {"a": [1, 2]}, "x"])
+        self.assertEqual(list(iter_data("empty.json", lambda r: r, self.tmp.name)), [])
+        self.assertEqual(list(iter_data("missing.json", lambda r: r, self.tmp.name)), [])
+
+    def test_numbers_split_at_every_point(self): # A chunk can end just before a number's fraction or exponent, which must wait for the rest
+        text = '[1.5,12.5e-3,-4.25E+2,7]'
+        with open(os.path.join(self.tmp.name, "numbers.json"), "w") as f:
+            f.write(text)
+        for size in range(1, len(text) + 1):
+            with patch.object(data_storage, "READ_CHUNK_SIZE", size):
+                self.assertEqual(list(iter_data("numbers.json", lambda r: r, self.tmp.name)), [1.5, 0.0125, -425.0, 7])
+
+    def test_truncated_file_raises(self):
+        with open(os.path.join(self.tmp.name, "broken.json"), "w") as f:
+            f.write('[{"a": 1}, {"a"')
+        with self.assertRaises(ValueError):
+            list(iter_data("broken.json", lambda r: r, self.tmp.name))
+
+class TestDataFormats(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.records = [{"id": str(i), "name": f"Item \u00e9 {i}", "price": i / 3, "tags": ["a", None]} for i in range(50)]
+
+    def test_default_matches_json_dump(self): # The default format is unchanged, pretty-printed JSON
+        save_data(self.records, "items.json", lambda r: r, self.tmp.name)
+        with open(os.path.join(self.tmp.name, "items.json")) as f:
+            self.assertEqual(f.read(), json.dumps(self.records, indent=4))
+        save_data([], "empty.json", lambda r: r, self.tmp.name)
+        with open(os.path.join(self.tmp.name, "empty.json")) as f:
+            self.assertEqual(f.read(), "[]")
+
+    def test_every_format_round_trips_and_is_detected(self):
+        for fmt in DataFormat:
+            save_data(self.records, "items.json", lambda r: r, self.tmp.name, fmt)
+            self.assertIs(detect_format("items.json", self.tmp.name), fmt)
+            self.assertEqual(load_data("items.json", lambda r: r, self.tmp.name), self.records)
+            self.assertEqual(list(iter_data("items.json", lambda r: r["id"], self.tmp.name, limit=2)), ["0", "1"])
+
+    def test_compact_formats_are_smaller(self):
+        sizes = {}
+        for fmt in DataFormat:
+            save_data(self.records, f"{fmt.name}.json", lambda r: r, self.tmp.name, fmt)
+            sizes[fmt] = os.path.getsize(os.path.join(self.tmp.name, f"{fmt.name}.json"))
+        self.assertLess(sizes[DataFormat.JSONL], sizes[DataFormat.JSON])
+        self.assertLess(sizes[DataFormat.BINARY], sizes[DataFormat.JSON])
+
+    def test_truncated_binary_raises(self):
+        save_data(self.records, "items.json", lambda r: r, self.tmp.name, DataFormat.BINARY)
+        path = os.path.join(self.tmp.name, "items.json")
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 3)
+        with self.assertRaises(ValueError):
+            load_data("items.json", lambda r: r, self.tmp.name)
+
+    def test_migrate(self): # Existing pretty-printed files convert in place and still load the same
+        save_data(self.records, "a.json", lambda r: r, self.tmp.name)
+        save_data(self.records, "b.json", lambda r: r, self.tmp.name, DataFormat.BINARY)
+        self.assertEqual(migrate_data_dir(DataFormat.BINARY, self.tmp.name), ["a.json"])
+        self.assertIs(detect_format("a.json", self.tmp.name), DataFormat.BINARY)
+        self.assertEqual(load_data("a.json", lambda r: r, self.tmp.name), self.records)
+        self.assertTrue(migrate_data("a.json", DataFormat.JSON, self.tmp.name))
+        with open(os.path.join(self.tmp.name, "a.json")) as f:
+            self.assertEqual(f.read(), json.dumps(self.records, indent=4))
+        self.assertFalse(migrate_data("missing.json", DataFormat.JSONL, self.tmp.name))
+
+    def test_migrate_closes_source_before_replacing(self): # Windows won't rename over a file that is still open
+        save_data(self.records, "a.json", lambda r: r, self.tmp.name, DataFormat.BINARY)
+        opened, real_open, real_replace = [], open, os.replace
+        def replace(src, dst):
+            self.assertTrue(all(f.closed for f in opened))
+            real_replace(src, dst)
+        with patch.object(data_storage, "open", lambda *args, **kwargs: opened.append(real_open(*args, **kwargs)) or opened[-1], create=True), \
+             patch.object(data_storage.os, "replace", replace):
+            self.assertTrue(migrate_data("a.json", DataFormat.JSONL, self.tmp.name))
+        self.assertTrue(opened)
+        self.assertEqual(load_data("a.json", lambda r: r, self.tmp.name), self.records)
+
+class TestAtomicSave(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_failed_save_keeps_old_file(self): # A save that dies part way through leaves the previous file whole and no temporary files behind
+        save_data([{"id": "a"}], "items.json", lambda r: r, self.tmp.name)
+        def explode(record):
+            if record["id"] == "c":
+                raise RuntimeError("crash")
+            return record
+        with self.assertRaises(RuntimeError):
+            save_data([{"id": "b"}, {"id": "c"}], "items.json", explode, self.tmp.name)
+        self.assertEqual(load_data("items.json", lambda r: r, self.tmp.name), [{"id": "a"}])
+        self.assertEqual(os.listdir(self.tmp.name), ["items.json"])
+
+    def test_every_durability_writes_the_file(self):
+        for durability in Durability:
+            save_data([{"id": durability.name}], "items.json", lambda r: r, self.tmp.name, durability=durability, sync_dir=True)
+            self.assertEqual(load_data("items.json", lambda r: r["id"], self.tmp.name), [durability.name])
+
+class BackendContract: # Behaviour every storage backend must share - mixed into one TestCase per backend below
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.backend = self.make_backend()
+        self.addCleanup(self.backend.close)
+        self.backend.register("things.json", "id")
+
+    def test_save_and_load(self):
+        self.backend.save("things.json", [{"id": "a", "n": 1}, {"id": "b", "n": 2}], lambda r: r)
+        self.assertEqual(self.backend.load("things.json", lambda r: r["id"]), ["a", "b"])
+
+    def test_upsert_delete_get(self): # Keyed writes overwrite in place and deletes remove only that key
+        self.backend.upsert("things.json", [{"id": "a", "n": 1}, {"id": "b", "n": 2}])
+        self.backend.upsert("things.json", [{"id": "a", "n": 5}])
+        self.backend.delete("things.json", ["b"])
+        self.assertEqual(self.backend.get("things.json", "a"), {"id": "a", "n": 5})
+        self.assertIsNone(self.backend.get("things.json", "b"))
+        self.assertEqual(self.backend.load("things.json", lambda r: r), [{"id": "a", "n": 5}])
+
+    def test_iter_limit_and_where(self):
+        self.backend.upsert("things.json", [{"id": str(i), "n": i} for i in range(10)])
+        self.assertEqual(list(self.backend.iter("things.json", lambda r: r["n"], limit=2, where=lambda r: r["n"] > 4)), [5, 6])
+
+    def test_find(self):
+        self.backend.upsert("things.json", [{"id": "a", "n": 1}, {"id": "b", "n": 2}, {"id": "c", "n": 1}])
+        self.assertEqual([r["id"] for r in self.backend.find("things.json", "n", 1)], ["a", "c"])
+
+    def test_transaction_rolls_back_on_error(self): # Nothing written inside a failed transaction is kept
+        self.backend.upsert("things.json", [{"id": "a", "n": 1}])
+        with self.assertRaises(RuntimeError):
+            with self.backend.transaction():
+                self.backend.upsert("things.json", [{"id": "a", "n": 2}, {"id": "b", "n": 3}])
+                raise RuntimeError("fail")
+        self.assertEqual(self.backend.load("things.json", lambda r: r), [{"id": "a", "n": 1}])
+
+    def test_transaction_commits(self):
+        with self.backend.transaction():
+            self.backend.upsert("things.json", [{"id": "a", "n": 1}])
+            self.backend.upsert("things.json", [{"id": "b", "n": 2}])
+        self.assertEqual(len(self.backend.load("things.json", lambda r: r)), 2)
+
+class TestJSONBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        return JSONBackend(self.tmp.name, compact_threshold=3)
+
+    def test_keyed_writes_are_journalled(self): # The .json snapshot is left alone until the journal is compacted
+        self.backend.save("things.json", [{"id": "a", "n": 1}], lambda r: r)
+        self.backend.upsert("things.json", [{"id": "a", "n": 2}])
+        reopened = JSONBackend(self.tmp.name)
+        reopened.register("things.json", "id")
+        self.assertEqual(reopened.load("things.json", lambda r: r), [{"id": "a", "n": 2}])
+        with open(os.path.join(self.tmp.name, "things.json")) as f:
+            self.assertIn('"n": 1', f.read())
+
+    def test_iter_overlays_journal_on_snapshot(self): # Streaming gives the same view as the journal replayed over the snapshot
+        self.backend.compact_threshold = 100
+        self.backend.save("things.json", [{"id": "a", "n": 1}, {"id": "b", "n": 2}, {"id": "c", "n": 3}], lambda r: r)
+        self.backend.upsert("things.json", [{"id": "b", "n": 20}, {"id": "d", "n": 4}])
+        self.backend.delete("things.json", ["a"])
+        self.assertEqual(self.backend.load("things.json", lambda r: r["n"]), [20, 3, 4])
+
+    def test_compaction_at_threshold(self): # Reaching the threshold folds the journal into the snapshot and empties it
+        self.backend.upsert("things.json", [{"id": "a", "n": 1}, {"id": "b", "n": 2}])
+        self.backend.delete("things.json", ["a"])
+        self.assertEqual(self.backend.journals["things.json"].length, 0)
+        with open(os.path.join(self.tmp.name, "things.journal")) as f:
+            self.assertEqual(f.read(), "")
+        self.assertEqual(self.backend.load("things.json", lambda r: r), [{"id": "b", "n": 2}])
+
+    def test_snapshot_synced_before_journal_emptied(self): # Even with the default FLUSH appends, the snapshot and its rename reach the disk before the journal is reset
+        events = []
+        real_fsync, real_reset = os.fsync, Journal.reset
+        with patch.object(data_storage.os, "fsync", side_effect=lambda fd: events.append("fsync") or real_fsync(fd)), \
+             patch.object(Journal, "reset", lambda journal: events.append("reset") or real_reset(journal)):
+            self.backend.save("things.json", [{"id": "a", "n": 1}], lambda r: r)
+        self.assertEqual(events[-1], "reset")
+        self.assertIn("fsync", events[:-1])
+
+    def test_compaction_keeps_migrated_format(self): # A snapshot converted to JSON Lines stays JSON Lines when the journal is folded back into it
+        self.backend.save("things.json", [{"id": "a", "n": 1}], lambda r: r)
+        migrate_data("things.json", DataFormat.JSONL, self.tmp.name)
+        self.backend.upsert("things.json", [{"id": "b", "n": 2}, {"id": "c", "n": 3}, {"id": "d", "n": 4}])
+        self.assertEqual(self.backend.journals["things.json"].length, 0)
+        self.assertIs(detect_format("things.json", self.tmp.name), DataFormat.JSONL)
+        self.assertEqual(self.backend.load("things.json", lambda r: r["n"]), [1, 2, 3, 4])
+
+class TestCompactJSONBackend(TestJSONBackend):
+    def make_backend(self):
+        return JSONBackend(self.tmp.name, compact_threshold=3, fmt=DataFormat.JSONL)
+
+    def test_keyed_writes_are_journalled(self): # Same as the pretty-printed backend, checked against the compact snapshot
+        self.backend.save("things.json", [{"id": "a", "n": 1}], lambda r: r)
+        self.backend.upsert("things.json", [{"id": "a", "n": 2}])
+        with open(os.path.join(self.tmp.name, "things.json")) as f:
+            self.assertEqual(f.read(), '{"id":"a","n":1}\n')
+        self.assertEqual(self.backend.get("things.json", "a"), {"id": "a", "n": 2})
+
+class TestSQLiteBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        return SQLiteBackend(os.path.join(self.tmp.name, "test.db"))
+
+    def test_indexed_find(self): # An index on a field gives the same answers as the unindexed lookup
+        self.backend.create_index("things.json", "n")
+        self.backend.upsert("things.json", [{"id": "a", "n": 1}, {"id": "b", "n": 2}])
+        self.assertEqual(self.backend.find("things.json", "n", 2), [{"id": "b", "n": 2}])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import sys
+import unittest
+from datetime import date, timedelta
+from Backend import sku
+sys.modules['sku'] = sku
+from Backend.sku import SkuRegistry
+from Backend.demand import DemandEngine
+
+class Stock: # Stand-in for a Product - only the fields the engine reads
+    def __init__(self, item_ID: str, available: int, low_stock_threshold: int = 10):
+        self.item_ID = item_ID
+        self.available = available
+        self.low_stock_threshold = low_stock_threshold
+
+class TestDemandEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = DemandEngine(alpha=0.5, lead_time_days=2, service_z=0, review_days=3, registry=SkuRegistry())
+        self.start = date(2024, 1, 1)
+
+    def sell(self, days: int, items: dict):
+        for k in range(days):
+            self.engine.record(items, self.start + timedelta(days=k))
+
+    def test_steady_demand(self): # Several orders in a day add up, and a steady rate is learnt exactly
+        for k in range(5):
+            self.engine.record({"A": 2}, self.start + timedelta(days=k))
+            self.engine.record({"A": 2}, self.start + timedelta(days=k))
+        self.engine.advance(self.start + timedelta(days=5))
+        self.assertAlmostEqual(self.engine.daily_demand("A"), 4.0)
+        self.assertAlmostEqual(self.engine.reorder_point("A"), 8.0)
+        self.assertIsNone(self.engine.reorder_point("never sold"))
+
+    def test_quiet_days_decay(self): # Days with no sales pull the average down
+        self.sell(3, {"A": 8})
+        self.engine.advance(self.start + timedelta(days=5))
+        self.assertAlmostEqual(self.engine.daily_demand("A"), 2.0)
+
+    def test_long_gap_matches_day_by_day(self): # Folding a run of quiet days in one step gives the same rate and variance as folding them one at a time
+        stepped = DemandEngine(alpha=0.3, service_z=1, registry=SkuRegistry())
+        for engine in (self.engine, stepped):
+            engine.alpha = 0.3
+            engine.record({"A": 6}, self.start)
+            engine.record({"A": 9}, self.start + timedelta(days=1))
+        for k in range(2, 12):
+            stepped.record({"A": 0}, self.start + timedelta(days=k))
+        for engine in (self.engine, stepped):
+            engine.advance(self.start + timedelta(days=12))
+        self.assertAlmostEqual(self.engine.daily_demand("A"), stepped.daily_demand("A"))
+        self.assertAlmostEqual(self.engine._var[0], stepped._var[0])
+        self.assertGreater(self.engine.daily_demand("A"), 0.1)
+        self.engine.advance(self.start + timedelta(days=500))
+        self.assertEqual(self.engine.daily_demand("A"), 0.0)
+
+    def test_variance_adds_safety_stock(self):
+        engine = DemandEngine(alpha=0.5, lead_time_days=4, service_z=2, registry=SkuRegistry())
+        for k in range(10):
+            engine.record({"A": 10 if k % 2 else 0, "B": 5}, self.start + timedelta(days=k))
+        engine.advance(self.start + timedelta(days=10))
+        self.assertGreater(engine.reorder_point("A"), engine.daily_demand("A") * 4)
+        self.assertAlmostEqual(engine.reorder_point("B"), 20.0)
+
+    def test_plan(self): # Reorders below the reorder point, counting stock on order, grouped by supplier; unsold SKUs use their static threshold
+        self.sell(5, {"A": 4, "B": 4, "C": 4})
+        plan = self.engine.plan([Stock("A", 8), Stock("B", 20), Stock("C", 5), Stock("D", 3), Stock("E", 50)], {"C": 1}, {"A": "s1", "C": "s2", "D": "s1"}.get, self.start + timedelta(days=5))
+        self.assertEqual(plan.by_supplier, {"s1": {"A": 12, "D": 17}, "s2": {"C": 14}})  # Up to the reorder point (8) plus 3 days' demand (12), or twice the threshold
+        self.assertEqual(plan.unsourced, [])
+        self.assertEqual((plan.checked, plan.lines), (5, 3))
+        plan = self.engine.plan([Stock("B", 1)], {}, {}.get, self.start + timedelta(days=5))
+        self.assertEqual(plan.unsourced, ["B"])
+
+    def test_plan_per_sku_lead_time(self): # A longer lead time raises the reorder point
+        self.sell(5, {"A": 4})
+        today = self.start + timedelta(days=5)
+        self.assertEqual(self.engine.plan([Stock("A", 10)], {}, lambda item_ID: "s1", today).by_supplier, {})
+        plan = self.engine.plan([Stock("A", 10)], {}, lambda item_ID: "s1", today, {"A": 5}.get)
+        self.assertEqual(plan.by_supplier, {"s1": {"A": 22}})  # Reorder point 20, plus 3 days' demand
+
+if __name__ == '__main__':
+    unittest.main()
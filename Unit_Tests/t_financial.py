@@ -1,6 +1,11 @@
-import unittest, time
-from datetime import datetime
-from Backend.financial import Transaction, FinancialManager
+import sys, io, os, json, tempfile
+import unittest, time, random
+from datetime import date, datetime
+from unittest.mock import patch, MagicMock
+sys.modules['data_storage'] = MagicMock() # Mock data_storage so no real ledger files are written - tests that need real files pass in their own log
+from Backend import financial
+from Backend.data_storage import SegmentedLog
+from Backend.financial import Transaction, FinancialManager, ColumnarLedger
 
 class TestTransaction(unittest.TestCase):
     def test_transaction_creation(self): # Testing the creation of transaction objects
@@ -44,6 +49,17 @@ class TestFinancialManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.fm.record_purchase(-10, "Negative amount")
 
+    def test_record_purchases_batch(self): # Many purchases in one call - one append, and nothing recorded if any amount is invalid
+        self.fm.log = MagicMock()
+        self.fm.record_purchases([(10.0, "PO 1"), (32.5, "PO 2")])
+        self.assertEqual([t.description for t in self.fm.transactions], ["PO 1", "PO 2"])
+        self.assertEqual(self.fm.total_purchases(), 42.5)
+        self.fm.log.append.assert_called_once()
+        self.assertEqual(len(self.fm.log.append.call_args[0][1]), 2)
+        with self.assertRaises(ValueError):
+            self.fm.record_purchases([(5.0, "PO 3"), (0, "PO 4")])
+        self.assertEqual(len(self.fm.transactions), 2)
+
     def test_record_sale_invalid_amount(self): # Testing sale records input/edge cases of non-positive value
         with self.assertRaises(ValueError):
             self.fm.record_sale(0, "Zero sale")
@@ -70,5 +86,179 @@ class TestFinancialManager(unittest.TestCase):
         self.assertIn("Purchase 1", report)
         self.assertIn("Sale 1", report)
 
+    def test_running_totals_match_full_scan(self): # The running totals must be exactly what summing every transaction gives
+        fm = FinancialManager(verify=True)
+        rng = random.Random(5043)
+        for i in range(500):
+            amount = round(rng.uniform(0.01, 999.99), 2)
+            (fm.record_sale if i % 3 else fm.record_purchase)(amount, f"T{i}")
+        self.assertEqual(fm.total_sales(), sum(t.amount for t in fm.transactions if t.transaction_type == "sale"))
+        self.assertEqual(fm.total_purchases(), sum(t.amount for t in fm.transactions if t.transaction_type == "purchase"))
+        fm.period_totals() # Verify mode raises if the buckets disagree with a scan
+
+    def test_verify_detects_drift(self): # Transactions added behind the manager's back are caught in verify mode
+        fm = FinancialManager(verify=True)
+        fm.record_sale(10.0, "Counted")
+        fm.transactions.append(Transaction("sale", 5.0, "Not counted"))
+        with self.assertRaises(AssertionError):
+            fm.total_sales()
+
+    def test_period_totals(self): # Daily and monthly buckets answer period queries
+        for when, kind, amount in [(datetime(2025, 1, 31, 9), "sale", 10.0), (datetime(2025, 2, 1, 9), "sale", 20.0),
+                                   (datetime(2025, 2, 14, 9), "purchase", 5.0), (datetime(2025, 3, 1, 9), "sale", 40.0)]:
+            t = Transaction(kind, amount, "Dated")
+            t.date = when
+            self.fm._record(t)
+        self.assertEqual(self.fm.monthly_totals(2025, 2), {"purchase": 5.0, "sale": 20.0})
+        self.assertEqual(self.fm.daily_totals(date(2025, 1, 31)), {"purchase": 0.0, "sale": 10.0})
+        self.assertEqual(self.fm.period_totals(date(2025, 2, 1), date(2025, 2, 28)), {"purchase": 5.0, "sale": 20.0})
+        self.assertEqual(self.fm.period_totals(start=date(2025, 2, 2)), {"purchase": 5.0, "sale": 40.0})
+        self.assertEqual(self.fm.period_totals(end=date(2025, 1, 31))["sale"], 10.0)
+
+class TestStreamingReport(unittest.TestCase):
+    def setUp(self): # Ten sales, one a day from the 1st of March
+        self.fm = FinancialManager()
+        for day in range(1, 11):
+            t = Transaction("sale", float(day), f"Sale {day}")
+            t.date = datetime(2025, 3, day, 9, 5, 30)
+            self.fm._record(t)
+
+    def test_report_matches_original_format(self): # The string version is exactly what the old concatenation built
+        expected = "\n--- Financial Report ---\n"
+        expected += "Total Sales: £55.00\nTotal Purchases: £0.00\nNet Income: £55.00 (Profit)\n"
+        expected += "\nTransactions:\n"
+        for t in self.fm.transactions:
+            expected += f"[{t.date.strftime('%Y-%m-%d %H:%M')}] SALE - £{t.amount:.2f} - {t.description}\n"
+        self.assertEqual(self.fm.generate_report(), expected)
+
+    def test_write_report_streams_to_sink(self):
+        sink = io.StringIO()
+        lines = self.fm.write_report(sink)
+        self.assertEqual(sink.getvalue(), self.fm.generate_report())
+        self.assertEqual(lines, 7 + 10)
+
+    def test_paging_and_date_filter(self):
+        page = list(self.fm.iter_report(page=2, page_size=3))
+        self.assertIn("Transactions (page 2):\n", page)
+        self.assertEqual([line for line in page if line.startswith("[")], [str(t) + "\n" for t in self.fm.transactions[3:6]])
+
+        report = self.fm.generate_report(start=date(2025, 3, 4), end=date(2025, 3, 6))
+        self.assertIn("Period: 2025-03-04 to 2025-03-06", report)
+        self.assertIn("Total Sales: £15.00", report)
+        self.assertIn("Sale 4", report)
+        self.assertNotIn("Sale 3", report)
+        self.assertNotIn("Sale 7", report)
+
+class TestLedgerPersistence(unittest.TestCase):
+    def setUp(self): # A real segmented log in a throwaway directory
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_manager(self, **kwargs) -> FinancialManager:
+        log = SegmentedLog(FinancialManager.LOG_PREFIX, data_dir=self.tmp.name)
+        self.addCleanup(log.close)
+        return FinancialManager(log=log, **kwargs)
+
+    def record_dated(self, fm: FinancialManager, when: datetime, kind: str, amount: float):
+        t = Transaction(kind, amount, f"{kind} on {when:%Y-%m-%d}")
+        t.date = when
+        fm._record(t)
+
+    def test_ledger_survives_restart(self): # A new manager reads back what the last one recorded, totals included
+        fm = self.make_manager()
+        fm.record_sale(150.0, "Sale 1")
+        fm.record_purchase(100.0, "Purchase 1")
+        fm.log.close()
+        reopened = self.make_manager()
+        self.assertEqual([t.description for t in reopened.transactions], ["Sale 1", "Purchase 1"])
+        self.assertEqual(reopened.net_income(), 50.0)
+
+    def test_one_segment_per_month(self): # Each transaction is one appended line in its month's file
+        fm = self.make_manager()
+        self.record_dated(fm, datetime(2025, 1, 31, 12), "sale", 10.0)
+        self.record_dated(fm, datetime(2025, 2, 1, 12), "sale", 20.0)
+        self.record_dated(fm, datetime(2025, 2, 3, 12), "purchase", 5.0)
+        fm.log.close()
+        self.assertEqual(fm.log.periods(), ["2025-01", "2025-02"])
+        with open(os.path.join(self.tmp.name, "transactions-2025-02.jsonl")) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_range_reads_only_matching_segments(self): # Older months are never opened for a later date range
+        fm = self.make_manager()
+        for month in range(1, 7):
+            self.record_dated(fm, datetime(2025, month, 15, 12), "sale", float(month))
+        fm.log.close()
+        planted = Transaction("sale", 999.0, "Only seen if January's file is read")
+        planted.date = datetime(2025, 4, 1, 12)
+        with open(os.path.join(self.tmp.name, "transactions-2025-01.jsonl"), "a") as f:
+            f.write(json.dumps(planted.to_dict()) + "\n")
+        self.assertEqual([t.amount for t in fm.transactions_between(date(2025, 3, 15), date(2025, 5, 14))], [3.0, 4.0])
+        reopened = self.make_manager(history_from=date(2025, 4, 1))
+        self.assertEqual(reopened.total_sales(), 15.0)
+
+    def test_report_before_history_from_reads_segments(self): # Months not loaded into memory still count in a report reaching back to them
+        fm = self.make_manager()
+        for month in range(1, 7):
+            self.record_dated(fm, datetime(2025, month, 15, 12), "sale", float(month))
+        fm.log.close()
+        reopened = self.make_manager(history_from=date(2025, 5, 1))
+        report = reopened.generate_report(date(2025, 1, 1), date(2025, 12, 31))
+        self.assertIn("Total Sales: £21.00", report)
+        self.assertIn("SALE - £1.00 - sale on 2025-01-15", report)
+        self.assertIn("Total Sales: £21.00", reopened.generate_report())
+        self.assertIn("Total Sales: £11.00", reopened.generate_report(date(2025, 5, 1)))
+
+class TestColumnarLedger(unittest.TestCase):
+    def setUp(self): # Transactions spread over three months, with repeated descriptions
+        rng = random.Random(42)
+        self.transactions = []
+        for i in range(300):
+            t = Transaction("sale" if i % 4 else "purchase", round(rng.uniform(1, 500), 2), f"Order {i % 10}")
+            t.date = datetime(2025, 1, 1, 8, 30, 15, 123456) + (datetime(2025, 3, 31) - datetime(2025, 1, 1)) * (i / 300)
+            self.transactions.append(t)
+        self.ledger = ColumnarLedger.from_transactions(self.transactions)
+
+    def test_round_trip(self): # Every field comes back exactly, and descriptions are only stored once
+        for original, rebuilt in zip(self.transactions, self.ledger.to_transactions()):
+            self.assertEqual(original.to_dict(), rebuilt.to_dict())
+        self.assertEqual(len(self.ledger), 300)
+        self.assertEqual(len(self.ledger.descriptions), 10)
+
+    def check_queries(self):
+        sales = [t for t in self.transactions if t.transaction_type == "sale"]
+        self.assertAlmostEqual(self.ledger.total("sale"), sum(t.amount for t in sales), places=6)
+        self.assertAlmostEqual(self.ledger.total(), sum(t.amount for t in self.transactions), places=6)
+        february = [t.amount for t in self.transactions if date(2025, 2, 1) <= t.date.date() <= date(2025, 2, 28)]
+        self.assertAlmostEqual(self.ledger.total(start=date(2025, 2, 1), end=date(2025, 2, 28)), sum(february), places=6)
+
+        monthly = self.ledger.rollup("month", "purchase")
+        self.assertEqual(list(monthly), [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)])
+        self.assertAlmostEqual(sum(monthly.values()), self.ledger.total("purchase"), places=6)
+        daily = self.ledger.rollup("day")
+        first_day = [t.amount for t in self.transactions if t.date.date() == date(2025, 1, 1)]
+        self.assertAlmostEqual(daily[date(2025, 1, 1)], sum(first_day), places=6)
+
+        top = self.ledger.top(5, "sale")
+        self.assertEqual([t.amount for t in top], sorted((t.amount for t in sales), reverse=True)[:5])
+        self.assertEqual(len(self.ledger.top(1000)), 300)
+        with self.assertRaises(ValueError):
+            self.ledger.rollup("year")
+
+    def test_queries(self): # With NumPy if it's installed
+        self.check_queries()
+
+    def test_queries_without_numpy(self): # The pure Python fallback gives the same answers
+        with patch.object(financial, "np", None):
+            self.check_queries()
+            self.assertEqual(self.ledger.total("sale"), sum(t.amount for t in self.transactions if t.transaction_type == "sale"))
+
+    def test_matches_financial_manager(self):
+        fm = FinancialManager()
+        fm.record_sale(10.5, "A")
+        fm.record_purchase(4.25, "B")
+        ledger = fm.to_ledger()
+        self.assertAlmostEqual(ledger.total("sale") - ledger.total("purchase"), fm.net_income())
+        self.assertEqual(ledger.total("refund"), 0)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
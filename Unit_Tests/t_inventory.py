@@ -1,8 +1,10 @@
-import sys
+import sys, threading
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 sys.modules['data_storage'] = MagicMock() # Mock 'data_storage' module will prevent ImportError during testing, and allows for mock injections
-from Backend.inventory import Product, InventoryManager
+from Backend import sku
+sys.modules['sku'] = sku
+from Backend.inventory import Product, ProductCatalogue, InventoryManager
 
 class TestProduct(unittest.TestCase): 
     def test_is_low_stock_true(self): # Test is_low_stock returns True when quantity <= threshold
@@ -24,20 +26,29 @@ class TestProduct(unittest.TestCase):
         self.assertEqual(original.quantity, recreated.quantity)
         self.assertEqual(original.low_stock_threshold, recreated.low_stock_threshold)
 
+    def test_from_row(self): # Imported rows arrive as strings - they're converted, and the threshold defaults when blank
+        p = Product.from_row({"item_ID": " A1 ", "name": "Widget", "price": "2.50", "quantity": "7", "low_stock_threshold": ""})
+        self.assertEqual((p.item_ID, p.price, p.quantity, p.low_stock_threshold), ("A1", 2.5, 7, 10))
+        self.assertEqual(Product.from_row({"item_ID": "A4", "name": "Widget", "price": 1, "quantity": 1, "low_stock_threshold": 0}).low_stock_threshold, 0)
+        for bad in ({"name": "No ID", "price": "1", "quantity": "1"}, {"item_ID": "A2", "name": "Widget", "price": "abc", "quantity": "1"}, {"item_ID": "A3", "name": "Widget", "price": "1", "quantity": "-1"}):
+            with self.assertRaises(ValueError):
+                Product.from_row(bad)
+
+    def test_slots(self): # Products keep their fields in __slots__, so a mistyped attribute name is an error rather than a silent new attribute
+        p = Product("item_ID4", "Thing", 1.0, 1)
+        self.assertFalse(hasattr(p, "__dict__"))
+        with self.assertRaises(AttributeError):
+            p.quantitiy = 5
+
 class TestInventoryManager(unittest.TestCase):
-    def setUp(self): # Patch load_data and save_data to only affect mock files (this won't affect the actual data when running tests - very important!)
-        patcher_load = patch('Backend.inventory.load_data')
-        patcher_save = patch('Backend.inventory.save_data')
-        self.mock_load = patcher_load.start()
-        self.mock_save = patcher_save.start()
-        self.addCleanup(patcher_load.stop)
-        self.addCleanup(patcher_save.stop)
-
-        self.mock_load.return_value = [] # Brand new mock env
-        self.inv = InventoryManager()
-
-    def test_load_products_called_on_init(self): # Test load_products calls load_data and sets products dict
-        self.mock_load.assert_called_once_with(InventoryManager.DATA_FILENAME, Product.from_dict)
+    def setUp(self): # Inject a mock storage backend so only mock files are affected (this won't affect the actual data when running tests - very important!)
+        self.mock_backend = MagicMock()
+        self.mock_backend.iter.return_value = [] # Brand new mock env
+        self.inv = InventoryManager(self.mock_backend)
+
+    def test_load_products_called_on_init(self): # Test load_products loads from the backend and sets products dict
+        self.mock_backend.register.assert_called_once_with(InventoryManager.DATA_FILENAME, "item_ID")
+        self.mock_backend.iter.assert_called_once_with(InventoryManager.DATA_FILENAME, Product.from_dict)
         self.assertEqual(self.inv.products, {})
 
     def test_add_product_success(self): # Add a new product successfully and check save
@@ -45,15 +56,17 @@ class TestInventoryManager(unittest.TestCase):
         result = self.inv.add_product(product)
         self.assertTrue(result)
         self.assertIn(product.item_ID, self.inv.products)
-        self.mock_save.assert_called_once()
+        self.mock_backend.upsert.assert_called_once_with(InventoryManager.DATA_FILENAME, [product.to_dict()])
+        self.mock_backend.save.assert_not_called() # A single change is a keyed write, not a full rewrite
 
     def test_add_product_duplicate_fails(self): # Adding a product with existing item_ID to ensure this doesn't save or overwrite
         product = Product("item_ID6", "Existing", 15.0, 10)
         self.inv.products[product.item_ID] = product
         result = self.inv.add_product(product)
         self.assertFalse(result)
-        # save_products should NOT be called again after duplicate add attempt
-        self.mock_save.assert_not_called()
+        # Nothing should be saved after a duplicate add attempt
+        self.mock_backend.save.assert_not_called()
+        self.mock_backend.upsert.assert_not_called()
 
     def test_remove_product_success(self): # Remove an existing product by item_ID and check save
         product = Product("item_ID7", "To Remove", 5.0, 12)
@@ -61,7 +74,7 @@ class TestInventoryManager(unittest.TestCase):
         result = self.inv.remove_product(product.item_ID)
         self.assertTrue(result)
         self.assertNotIn(product.item_ID, self.inv.products)
-        self.mock_save.assert_called_once()
+        self.mock_backend.delete.assert_called_once_with(InventoryManager.DATA_FILENAME, ["item_ID7"])
 
     def test_update_stock_success(self): # Testing to update stock quantity
         product = Product("item_ID8", "Stock Update", 7.0, 10)
@@ -75,12 +88,35 @@ class TestInventoryManager(unittest.TestCase):
         self.assertTrue(result_dec)
         self.assertEqual(self.inv.products[product.item_ID].quantity, 12)
 
-        self.assertEqual(self.mock_save.call_count, 2)
+        self.assertEqual(self.mock_backend.upsert.call_count, 2)
 
     def test_update_stock_nonexistent_product(self): # Updating stock for a non-existent product returns False
         result = self.inv.update_stock("missing_item_ID", 5)
         self.assertFalse(result)
-        self.mock_save.assert_not_called()
+        self.mock_backend.upsert.assert_not_called()
+
+    def test_apply_stock_deltas_single_write(self): # Several stock changes are applied together and saved with one keyed write
+        a = Product("item_ID16", "A", 1.0, 10)
+        b = Product("item_ID17", "B", 1.0, 4)
+        self.inv.products[a.item_ID] = a
+        self.inv.products[b.item_ID] = b
+
+        self.assertTrue(self.inv.apply_stock_deltas({"item_ID16": -3, "item_ID17": 6}))
+        self.assertEqual(a.quantity, 7)
+        self.assertEqual(b.quantity, 10)
+        self.mock_backend.upsert.assert_called_once_with(InventoryManager.DATA_FILENAME, [a.to_dict(), b.to_dict()])
+
+    def test_apply_stock_deltas_all_or_nothing(self): # One bad line (missing item or not enough stock) leaves every product untouched
+        a = Product("item_ID18", "A", 1.0, 10)
+        b = Product("item_ID19", "B", 1.0, 2)
+        self.inv.products[a.item_ID] = a
+        self.inv.products[b.item_ID] = b
+
+        self.assertFalse(self.inv.apply_stock_deltas({"item_ID18": -3, "item_ID19": -5}))
+        self.assertFalse(self.inv.apply_stock_deltas({"item_ID18": -3, "missing": 1}))
+        self.assertEqual(a.quantity, 10)
+        self.assertEqual(b.quantity, 2)
+        self.mock_backend.upsert.assert_not_called()
 
     def test_get_product(self): # Retrieve a product by item_ID, returns None if missing
         product = Product("item_ID10", "Get Product", 8.0, 9)
@@ -104,5 +140,126 @@ class TestInventoryManager(unittest.TestCase):
         expected = [products[0], products[2]]
         self.assertCountEqual(low_stock, expected)
 
+    def test_low_stock_index_follows_stock_changes(self): # Products move in and out of the low stock index as stock changes
+        product = Product("item_ID24", "Indexed", 1.0, 12, low_stock_threshold=10)
+        self.inv.add_product(product)
+        self.assertEqual(self.inv.list_low_stock_products(), [])
+        self.inv.update_stock(product.item_ID, -5)
+        self.assertEqual(self.inv.list_low_stock_products(), [product])
+        self.inv.apply_stock_deltas({product.item_ID: 10})
+        self.assertEqual(self.inv.list_low_stock_products(), [])
+        self.inv.update_stock(product.item_ID, -20)
+        self.inv.remove_product(product.item_ID)
+        self.assertEqual(self.inv.list_low_stock_products(), [])
+
+    def test_find_by_price(self): # Inclusive price range, cheapest first
+        for i, price in enumerate([5.0, 1.0, 3.0, 3.0, 9.0]):
+            self.inv.add_product(Product(f"P{i}", f"Product {i}", price, 50))
+        self.assertEqual([p.item_ID for p in self.inv.find_by_price(2.0, 5.0)], ["P2", "P3", "P0"])
+        self.inv.remove_product("P2")
+        self.assertEqual([p.item_ID for p in self.inv.find_by_price(3.0, 3.0)], ["P3"])
+        self.assertEqual(self.inv.find_by_price(10.0, 20.0), [])
+
+    def test_find_by_name(self): # Exact and prefix matches ignore case
+        for item_ID, name in [("N1", "Widget"), ("N2", "widget large"), ("N3", "Gadget"), ("N4", "WIDGET")]:
+            self.inv.add_product(Product(item_ID, name, 1.0, 50))
+        self.assertCountEqual([p.item_ID for p in self.inv.find_by_name("widget")], ["N1", "N4"])
+        self.assertCountEqual([p.item_ID for p in self.inv.find_by_name("WID", prefix=True)], ["N1", "N2", "N4"])
+        self.assertEqual(self.inv.find_by_name("nothing", prefix=True), [])
+
+    def test_catalogue_bulk_load_matches_one_by_one(self): # Building the indexes in bulk gives the same answers as inserting one at a time
+        products = [Product(f"B{i}", f"Name {i % 7}", float(i % 11), i % 15) for i in range(100)]
+        bulk = ProductCatalogue(products)
+        single = ProductCatalogue()
+        for p in products:
+            single[p.item_ID] = p
+        self.assertEqual(bulk.low_stock, single.low_stock)
+        self.assertEqual(bulk.in_price_range(2.0, 4.0), single.in_price_range(2.0, 4.0))
+        self.assertEqual(bulk.with_name_prefix("name 3"), single.with_name_prefix("name 3"))
+        self.assertEqual(bulk.low_stock, {p.item_ID for p in products if p.is_low_stock()})
+
+    def test_concurrent_deductions_never_oversell(self): # Many threads racing for the same stock sell exactly what there is and no more
+        self.inv.add_product(Product("C1", "Contested", 1.0, 100))
+        self.inv.add_product(Product("C2", "Also contested", 1.0, 60))
+        successes = []
+        def worker():
+            for _ in range(50):
+                if self.inv.apply_stock_deltas({"C1": -1, "C2": -1}):
+                    successes.append(1)
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(successes), 60)
+        self.assertEqual(self.inv.get_product("C1").quantity, 40)
+        self.assertEqual(self.inv.get_product("C2").quantity, 0)
+
+    def test_add_products_single_save_and_skips_duplicates(self): # A batch is saved with one upsert, and IDs already taken (or repeated in the batch) are skipped
+        self.inv.add_product(Product("P1", "Existing", 1.0, 20))
+        self.mock_backend.upsert.reset_mock()
+        batch = [Product("P1", "Clash", 1.0, 1), Product("P2", "Bolt", 3.0, 1), Product("P3", "Nut", 2.0, 50), Product("P2", "Repeat", 1.0, 1)]
+        added = self.inv.add_products(batch)
+        self.assertEqual([p.name for p in added], ["Bolt", "Nut"])
+        self.mock_backend.upsert.assert_called_once_with(InventoryManager.DATA_FILENAME, [batch[1].to_dict(), batch[2].to_dict()])
+        self.assertEqual(self.inv.get_product("P1").name, "Existing")
+        self.assertEqual([p.item_ID for p in self.inv.find_by_price(0, 10)], ["P1", "P3", "P2"]) # Indexes cover the batch too
+        self.assertEqual([p.item_ID for p in self.inv.list_low_stock_products()], ["P2"])
+
+    def test_reserve_holds_stock_from_others(self): # Reserved units stay on hand but can't be taken by plain stock changes or other reservations
+        self.inv.add_product(Product("R1", "Reserved", 1.0, 10))
+        reservation = self.inv.reserve({"R1": 7})
+        self.assertIsNotNone(reservation)
+        product = self.inv.get_product("R1")
+        self.assertEqual((product.quantity, product.reserved, product.available), (10, 7, 3))
+        self.assertFalse(self.inv.apply_stock_deltas({"R1": -4}))
+        self.assertIsNone(self.inv.reserve({"R1": 4}))
+        self.assertTrue(self.inv.apply_stock_deltas({"R1": -3}))
+
+    def test_reserve_all_or_nothing(self):
+        self.inv.add_product(Product("R2", "Plenty", 1.0, 10))
+        self.assertIsNone(self.inv.reserve({"R2": 5, "missing": 1}))
+        self.assertIsNone(self.inv.reserve({"R2": 5, "R2x": 1}))
+        self.assertEqual(self.inv.get_product("R2").reserved, 0)
+
+    def test_commit_and_release(self): # Commit takes the stock with one save, release gives it back - each works once
+        self.inv.add_product(Product("R3", "Committed", 1.0, 10))
+        self.mock_backend.upsert.reset_mock()
+        first, second = self.inv.reserve({"R3": 4}), self.inv.reserve({"R3": 5})
+        self.mock_backend.upsert.assert_not_called() # Reserving doesn't touch storage
+        self.assertTrue(self.inv.commit(first))
+        self.assertFalse(self.inv.commit(first))
+        self.mock_backend.upsert.assert_called_once_with(InventoryManager.DATA_FILENAME, [self.inv.get_product("R3").to_dict()])
+        self.assertTrue(self.inv.release(second))
+        self.assertFalse(self.inv.commit(second))
+        product = self.inv.get_product("R3")
+        self.assertEqual((product.quantity, product.reserved), (6, 0))
+        self.assertIn("R3", self.inv.products.low_stock)
+
+    def test_reservations_expire(self): # Past its TTL a reservation's stock is released and it can no longer be committed
+        now = [100.0]
+        self.inv.clock = lambda: now[0]
+        self.inv.add_product(Product("R4", "Expiring", 1.0, 10))
+        short, long = self.inv.reserve({"R4": 3}, ttl=5), self.inv.reserve({"R4": 4}, ttl=60)
+        now[0] = 106.0
+        self.assertEqual(self.inv.expire_reservations(), 1)
+        self.assertEqual(self.inv.get_product("R4").reserved, 4)
+        self.assertFalse(self.inv.commit(short))
+        self.assertTrue(self.inv.has_reservation(long))
+        now[0] = 200.0
+        self.assertFalse(self.inv.commit(long)) # Expired on the way in
+        self.assertEqual(self.inv.get_product("R4").reserved, 0)
+        self.assertEqual(self.inv.get_product("R4").quantity, 10)
+
+    def test_expired_reservations_free_stock_for_updates(self): # A plain stock change isn't blocked by a hold that's already expired
+        now = [100.0]
+        self.inv.clock = lambda: now[0]
+        self.inv.add_product(Product("R5", "Held", 1.0, 1))
+        self.inv.reserve({"R5": 1}, ttl=5)
+        self.assertFalse(self.inv.update_stock("R5", -1))
+        now[0] = 106.0
+        self.assertTrue(self.inv.update_stock("R5", -1))
+        self.assertEqual(self.inv.get_product("R5").reserved, 0)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,4 +1,4 @@
-import sys
+import sys, threading, time
 import unittest
 from unittest.mock import MagicMock, patch
 from datetime import date
@@ -6,6 +6,10 @@ from datetime import date
 sys.modules['data_storage'] = MagicMock() # Mock data_storage module and mock inventory-manager so inventory import works
 mock_inventory_manager_class = MagicMock()
 sys.modules['inventory'] = MagicMock(InventoryManager=mock_inventory_manager_class)
+from Backend import sku
+sys.modules['sku'] = sku
+from Backend import demand
+sys.modules['demand'] = demand
 
 from Backend.order_processing import Customer, CustomerOrder, OrderProcessor
 
@@ -25,6 +29,12 @@ class TestCustomer(unittest.TestCase):
         self.assertIn("John Doe", s)
         self.assertIn("john@example.com", s)
 
+    def test_customer_from_row(self): # Imported rows need every field and a plausible email
+        c = Customer.from_row({"customer_id": " c9 ", "name": "Row Customer", "email": "row@example.com", "phone": "1"})
+        self.assertEqual(c.customer_id, "c9")
+        with self.assertRaises(ValueError):
+            Customer.from_row({"customer_id": "c9", "name": "Row Customer", "email": "row.example.com", "phone": "1"})
+
 class TestCustomerOrder(unittest.TestCase):
     def setUp(self):
         self.customer = Customer("cust1", "Jane Smith", "jane@example.com", "0987654321")
@@ -64,6 +74,11 @@ class TestOrderProcessor(unittest.TestCase):
         self.assertTrue(result)
         self.assertIn(new_customer.customer_id, self.processor.customers)
 
+    def test_add_customers_skips_taken_ids(self): # Batch add keeps existing customers and returns only the ones added
+        batch = [Customer("cust123", "Clash", "x@example.com", "1"), Customer("cust789", "Batch", "b@example.com", "2")]
+        self.assertEqual(self.processor.add_customers(batch), [batch[1]])
+        self.assertIs(self.processor.customers["cust123"], self.customer)
+
     def test_create_order_successful_stock_deduction(self): # Test creating an order when stock is sufficient
         items = {"item_ID1": 2, "item_ID2": 3}
         product1 = MagicMock(quantity=5, price=10.0)# Setup mock inventory products with sufficient stock and prices
@@ -73,17 +88,27 @@ class TestOrderProcessor(unittest.TestCase):
             return product1 if item_ID == "item_ID1" else product2 if item_ID == "item_ID2" else None
 
         self.mock_inventory_manager.get_product.side_effect = get_product_side_effect # Calls inventory_manager.get_product for each item_ID
-        self.mock_inventory_manager.update_stock.return_value = True # Calls update_stock to deduct quantities
+        self.mock_inventory_manager.apply_stock_deltas.return_value = True # Calls apply_stock_deltas to deduct quantities
 
         result = self.processor.create_order("order1", self.customer.customer_id, date.today(), items)
         self.assertTrue(result)
         self.assertIn("order1", self.processor.orders)
+        self.assertEqual(self.processor.orders["order1"].total_price, 80.0)
 
         expected_calls = [unittest.mock.call("item_ID1"), unittest.mock.call("item_ID2")] # Check calls to get_product
         self.mock_inventory_manager.get_product.assert_has_calls(expected_calls, any_order=True)
 
-        self.mock_inventory_manager.update_stock.assert_any_call("item_ID1", -2) # Check calls to update_stock with negative quantity
-        self.mock_inventory_manager.update_stock.assert_any_call("item_ID2", -3)
+        self.mock_inventory_manager.apply_stock_deltas.assert_called_once_with({"item_ID1": -2, "item_ID2": -3}) # Every line deducted in a single batch
+        self.mock_inventory_manager.update_stock.assert_not_called()
+
+    def test_create_order_fails_if_batch_rejected(self): # No order is recorded if the inventory refuses the stock change
+        product = MagicMock(quantity=5, price=10.0)
+        self.mock_inventory_manager.get_product.return_value = product
+        self.mock_inventory_manager.apply_stock_deltas.return_value = False
+
+        result = self.processor.create_order("order3", self.customer.customer_id, date.today(), {"item_ID1": 2})
+        self.assertFalse(result)
+        self.assertNotIn("order3", self.processor.orders)
 
     def test_create_order_insufficient_stock_fails(self): # Test creating order fails if any product has insufficient stock
         items = {"item_ID1": 2, "item_ID2": 3}
@@ -100,6 +125,7 @@ class TestOrderProcessor(unittest.TestCase):
         self.assertFalse(result)
         self.assertNotIn("order2", self.processor.orders)
         self.mock_inventory_manager.update_stock.assert_not_called()
+        self.mock_inventory_manager.apply_stock_deltas.assert_not_called()
 
     def test_get_order_and_list_orders(self): # Test retrieving a specific order and listing all orders
         order = CustomerOrder("order1", self.customer, date.today())
@@ -111,5 +137,100 @@ class TestOrderProcessor(unittest.TestCase):
         all_orders = self.processor.list_orders()
         self.assertIn(order, all_orders)
 
+    def test_reserve_then_confirm(self): # A reserved order holds stock, and only becomes a real order once confirmed
+        self.mock_inventory_manager.get_product.return_value = MagicMock(quantity=10, price=4.0)
+        self.mock_inventory_manager.reserve.return_value = "res1"
+        self.mock_inventory_manager.commit.return_value = True
+        self.assertTrue(self.processor.reserve_order("order7", self.customer.customer_id, date.today(), {"item_ID1": 2}))
+        self.assertNotIn("order7", self.processor.orders)
+        self.assertFalse(self.processor.create_order("order7", self.customer.customer_id, date.today(), {"item_ID1": 1})) # ID already in use
+        self.mock_inventory_manager.apply_stock_deltas.assert_not_called()
+        self.assertTrue(self.processor.confirm_order("order7"))
+        self.mock_inventory_manager.commit.assert_called_once_with("res1")
+        self.assertEqual(self.processor.get_order("order7").total_price, 8.0)
+        self.assertFalse(self.processor.confirm_order("order7"))
+
+    def test_reserve_then_cancel_or_expire(self): # Cancelling releases the stock, and an expired reservation can't be confirmed
+        self.mock_inventory_manager.get_product.return_value = MagicMock(quantity=10, price=4.0)
+        self.mock_inventory_manager.reserve.side_effect = ["res2", "res3", None]
+        self.mock_inventory_manager.commit.return_value = False
+        self.assertTrue(self.processor.reserve_order("order8", self.customer.customer_id, date.today(), {"item_ID1": 1}))
+        self.assertTrue(self.processor.cancel_order("order8"))
+        self.mock_inventory_manager.release.assert_called_once_with("res2")
+        self.assertTrue(self.processor.reserve_order("order9", self.customer.customer_id, date.today(), {"item_ID1": 1}))
+        self.assertFalse(self.processor.confirm_order("order9"))
+        self.assertNotIn("order9", self.processor.orders)
+        self.assertFalse(self.processor.reserve_order("order10", self.customer.customer_id, date.today(), {"item_ID1": 1})) # Not enough stock
+        self.assertEqual(self.processor.pending, {})
+
+    def test_concurrent_duplicate_order_id(self): # Only one of several threads creating the same order ID succeeds
+        self.mock_inventory_manager.get_product.return_value = MagicMock(quantity=1000, price=1.0)
+        def slow_apply(deltas): # Widen the window between the ID check and the order being stored
+            time.sleep(0.01)
+            return True
+        self.mock_inventory_manager.apply_stock_deltas.side_effect = slow_apply
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.processor.create_order("dup", self.customer.customer_id, date.today(), {"item_ID1": 1}))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(self.mock_inventory_manager.apply_stock_deltas.call_count, 1)
+
+class TestOrderPersistence(unittest.TestCase):
+    def setUp(self): # Saved records served by a mock backend, one customer with two orders and one whose customer was deleted
+        self.saved = {
+            OrderProcessor.CUSTOMERS_FILE: [Customer("c1", "Saved Customer", "s@example.com", "1").to_dict()],
+            OrderProcessor.ORDERS_FILE: [
+                {"order_id": "o2", "customer_id": "c1", "order_date": "2024-03-05", "items": {"i1": 1}, "total_price": 2.0},
+                {"order_id": "o1", "customer_id": "c1", "order_date": "2024-03-01", "items": {"i1": 2}, "total_price": 4.0},
+                {"order_id": "o3", "customer_id": "gone", "order_date": "2024-03-02", "items": {}, "total_price": 0.0},
+            ],
+        }
+        self.mock_backend = MagicMock()
+        self.mock_backend.iter.side_effect = lambda collection, from_dict, limit=None, where=None: [from_dict(r) for r in self.saved[collection] if where is None or where(r)]
+        self.mock_inventory_manager = MagicMock()
+        self.mock_inventory_manager.get_product.return_value = MagicMock(quantity=100, price=3.0)
+        self.mock_inventory_manager.apply_stock_deltas.return_value = True
+        self.processor = OrderProcessor(self.mock_inventory_manager, self.mock_backend)
+
+    def ids(self, orders):
+        return [o.order_id for o in orders]
+
+    def test_loaded_on_init(self):
+        self.assertIn("c1", self.processor.customers)
+        self.assertEqual(sorted(self.processor.orders), ["o1", "o2"])
+        self.assertIs(self.processor.get_order("o1").customer, self.processor.customers["c1"])
+
+    def test_new_records_saved_one_at_a_time(self):
+        customer = Customer("c2", "New Customer", "n@example.com", "2")
+        self.processor.add_customer(customer)
+        self.mock_backend.upsert.assert_called_once_with(OrderProcessor.CUSTOMERS_FILE, [customer.to_dict()])
+        self.assertTrue(self.processor.create_order("o4", "c2", date(2024, 3, 3), {"i1": 1}))
+        self.mock_backend.upsert.assert_called_with(OrderProcessor.ORDERS_FILE, [self.processor.get_order("o4").to_dict()])
+        self.mock_backend.save.assert_not_called()
+
+    def test_indexes(self): # By customer (in saved order) and by date range (inclusive), kept up to date as orders are added
+        self.processor.create_order("o5", "c1", date(2024, 3, 3), {"i1": 1})
+        self.assertEqual(self.ids(self.processor.orders_for_customer("c1")), ["o2", "o1", "o5"])
+        self.assertEqual(self.processor.orders_for_customer("nobody"), [])
+        self.assertEqual(self.ids(self.processor.orders_between(date(2024, 3, 1), date(2024, 3, 3))), ["o1", "o5"])
+        self.assertEqual(self.ids(self.processor.orders_between(date(2024, 3, 6), date(2024, 12, 31))), [])
+
+    def test_units_sold(self): # Loaded orders' lines are LineItems, added up per SKU over all orders or a date range
+        self.processor.create_order("o5", "c1", date(2024, 3, 3), {"i1": 1, "i2": 4})
+        self.assertEqual(self.processor.get_order("o1").items, {"i1": 2})
+        self.assertEqual(self.processor.units_sold(), {"i1": 4, "i2": 4})
+        self.assertEqual(self.processor.units_sold(date(2024, 3, 2), date(2024, 3, 4)), {"i1": 1, "i2": 4})
+        self.assertEqual(self.processor.units_sold(end=date(2024, 3, 1)), {"i1": 2})
+
+    def test_demand_fed_from_orders(self): # Saved orders are replayed into the demand engine on load, and new ones are recorded as they're made
+        engine = demand.DemandEngine(alpha=0.5, registry=sku.SkuRegistry())
+        processor = OrderProcessor(self.mock_inventory_manager, self.mock_backend, engine)
+        processor.create_order("o6", "c1", date(2024, 3, 6), {"i1": 4})
+        engine.advance(date(2024, 3, 7))
+        self.assertAlmostEqual(engine.daily_demand("i1"), 2.3125)  # 2 on the 1st, quiet 2nd-4th, then 1 on the 5th and 4 on the 6th
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+import threading
+import unittest
+from Backend.sku import SkuRegistry, LineItems, total_quantities
+
+class TestSkuRegistry(unittest.TestCase):
+    def test_codes_are_dense_and_stable(self): # Codes count up from 0 in the order SKUs are first seen, and asking again gives the same code
+        registry = SkuRegistry()
+        self.assertEqual([registry.code(s) for s in ("A", "B", "A", "C")], [0, 1, 0, 2])
+        self.assertEqual(registry.sku(1), "B")
+        self.assertEqual(len(registry), 3)
+        self.assertIsNone(registry.lookup("D"))
+        self.assertNotIn("D", registry)
+
+    def test_intern_shares_one_string(self): # Equal IDs built separately come back as the same object
+        registry = SkuRegistry()
+        first = registry.intern("".join(["SKU", "1"]))
+        self.assertIs(registry.intern("".join(["SK", "U1"])), first)
+
+    def test_concurrent_codes(self): # Many threads adding the same SKUs still give each SKU exactly one code
+        registry = SkuRegistry()
+        def work():
+            for i in range(500):
+                registry.code(f"SKU{i}")
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(registry), 500)
+        self.assertEqual(sorted(registry.code(f"SKU{i}") for i in range(500)), list(range(500)))
+
+class TestLineItems(unittest.TestCase):
+    def test_behaves_like_a_dict(self): # Reads, writes, deletes and equality all match the dict the lines replaced
+        registry = SkuRegistry()
+        lines = LineItems({"A": 2, "B": 3}, registry)
+        lines.add("A", 1)
+        lines["C"] = 4
+        del lines["B"]
+        self.assertEqual(lines, {"A": 3, "C": 4})
+        self.assertEqual(list(lines.items()), [("A", 3), ("C", 4)])
+        self.assertNotIn("B", lines)
+        self.assertNotIn("Z", lines)
+        self.assertEqual(lines.get("Z", 0), 0)
+        with self.assertRaises(KeyError):
+            lines["B"]
+        with self.assertRaises(KeyError):
+            del lines["Z"]
+
+    def test_to_dict_is_plain(self): # Saved lines are an ordinary dict so they serialise as before
+        lines = LineItems({"A": 2}, SkuRegistry())
+        self.assertIs(type(lines.to_dict()), dict)
+        self.assertEqual(lines.to_dict(), {"A": 2})
+
+    def test_total_quantities(self): # Lines from many orders add up per SKU
+        registry = SkuRegistry()
+        orders = [LineItems({"A": 1, "B": 2}, registry), LineItems({"B": 3}, registry), LineItems({"C": 5}, registry)]
+        self.assertEqual(total_quantities(orders, registry), {"A": 1, "B": 5, "C": 5})
+
+if __name__ == '__main__':
+    unittest.main()
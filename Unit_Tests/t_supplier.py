@@ -1,11 +1,14 @@
-import sys
+import sys, time
 import unittest
-from unittest.mock import patch, MagicMock
+from contextlib import contextmanager
+from unittest.mock import MagicMock
 from datetime import date
 
 sys.modules['data_storage'] = MagicMock() # Mock data_storage before importing supplier module
+from Backend import sku
+sys.modules['sku'] = sku
 
-from Backend.supplier import Supplier, PurchaseOrder, SupplierManager, OrderStatus
+from Backend.supplier import Supplier, PurchaseOrder, SupplierManager, OrderStatus, CatalogueEntry, SupplierCatalogue
 
 class TestSupplier(unittest.TestCase):
     def test_str_and_to_dict(self): # Testing serialisation and deserialisation to ensure no attributes are lost or changed
@@ -28,12 +31,38 @@ class TestSupplier(unittest.TestCase):
         self.assertEqual(s.supplier_id, "sup2")
         self.assertEqual(s.contact_name, "Bob")
 
+    def test_from_row(self): # Imported rows need every field and a plausible email
+        s = Supplier.from_row({"supplier_id": "sup9", "name": "Row Supplier", "contact_name": "Gil", "phone": "1", "email": "gil@example.com", "address": "1 Way"})
+        self.assertEqual(s.supplier_id, "sup9")
+        with self.assertRaises(ValueError):
+            Supplier.from_row({"supplier_id": "sup9", "name": "Row Supplier"})
+        with self.assertRaises(ValueError):
+            Supplier.from_row({"supplier_id": "sup9", "name": "Row Supplier", "contact_name": "Gil", "phone": "1", "email": "not an email", "address": "1 Way"})
+
     def test_add_order(self): # Test adding a purchase order to supplier's history
         supplier = Supplier("sup3", "Supplier", "Eve", "5555555555", "eve@example.com", "789 Blvd")
         po = MagicMock()
         supplier.add_order(po)
         self.assertIn(po, supplier.order_history)
 
+    def test_order_history_keyed_by_po_id(self): # Adding the same PO twice keeps one entry, and membership works by PO or po_id
+        supplier = Supplier("sup12", "History", "Lee", "1", "lee@example.com", "6 Way")
+        first = PurchaseOrder("po1", supplier, date(2024, 3, 1), date(2024, 3, 9))
+        supplier.add_order(first)
+        supplier.add_order(first)
+        self.assertEqual(len(supplier.order_history), 1)
+        self.assertIn("po1", supplier.order_history)
+        self.assertNotIn("po2", supplier.order_history)
+        self.assertIs(supplier.order_history[0], first)
+
+    def test_order_history_by_date(self): # Date order regardless of the order POs were added in, oldest or newest first
+        supplier = Supplier("sup13", "History", "Lee", "1", "lee@example.com", "6 Way")
+        for po_id, day in (("a", 5), ("b", 2), ("c", 9), ("d", 2)):
+            supplier.add_order(PurchaseOrder(po_id, supplier, date(2024, 1, day), date(2024, 2, 1)))
+        self.assertEqual([po.po_id for po in supplier.order_history], ["a", "b", "c", "d"])
+        self.assertEqual([po.po_id for po in supplier.order_history.by_date()], ["b", "d", "a", "c"])
+        self.assertEqual([po.po_id for po in supplier.order_history.by_date(newest_first=True)], ["c", "a", "d", "b"])
+
 class TestPurchaseOrder(unittest.TestCase):
     def setUp(self):
         self.supplier = Supplier("sup4", "Supplier4", "Dan", "2223334444", "dan@example.com", "101 Road")
@@ -61,20 +90,15 @@ class TestPurchaseOrder(unittest.TestCase):
 
 class TestSupplierManager(unittest.TestCase):
     def setUp(self):
-        patcher_load = patch('Backend.supplier.load_data')
-        patcher_save = patch('Backend.supplier.save_data')
-        self.mock_load = patcher_load.start()
-        self.mock_save = patcher_save.start()
-        self.addCleanup(patcher_load.stop)
-        self.addCleanup(patcher_save.stop)
+        self.mock_backend = MagicMock() # Mock storage backend so no real files are touched
 
         # Default mocks to return empty lists (no saved data)
-        self.mock_load.side_effect = [[], []]  # suppliers, purchase orders
+        self.mock_backend.iter.side_effect = [[], [], []]  # suppliers, purchase orders, catalogue
 
-        self.manager = SupplierManager()
+        self.manager = SupplierManager(self.mock_backend)
 
-    def test_load_called_on_init(self): # Verify load_data called twice on initialisation
-        self.assertEqual(self.mock_load.call_count, 2)
+    def test_load_called_on_init(self): # Verify the backend is loaded from three times on initialisation (suppliers, purchase orders, catalogue)
+        self.assertEqual(self.mock_backend.iter.call_count, 3)
         self.assertEqual(self.manager.suppliers, {})
         self.assertEqual(self.manager.purchase_orders, {})
 
@@ -83,14 +107,23 @@ class TestSupplierManager(unittest.TestCase):
         result = self.manager.add_supplier(supplier)
         self.assertTrue(result)
         self.assertIn(supplier.supplier_id, self.manager.suppliers)
-        self.mock_save.assert_called_once()
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.SUPPLIERS_FILE, [supplier.to_dict()])
 
     def test_add_supplier_duplicate_fails(self): # Testing to add supplier with existing ID returns False - no dupes
         supplier = Supplier("sup6", "Dup Supplier", "Dan", "1112223333", "dan@example.com", "34 Blvd")
         self.manager.suppliers[supplier.supplier_id] = supplier
         result = self.manager.add_supplier(supplier)
         self.assertFalse(result)
-        self.mock_save.assert_not_called()
+        self.mock_backend.upsert.assert_not_called()
+
+    def test_add_suppliers_single_save(self): # A batch is saved with one upsert, skipping IDs already taken
+        existing = Supplier("sup10", "Existing", "Hal", "1", "hal@example.com", "2 Way")
+        self.manager.suppliers[existing.supplier_id] = existing
+        batch = [Supplier("sup10", "Clash", "Ian", "1", "ian@example.com", "3 Way"), Supplier("sup11", "New", "Jo", "1", "jo@example.com", "4 Way")]
+        added = self.manager.add_suppliers(batch)
+        self.assertEqual(added, [batch[1]])
+        self.assertIs(self.manager.suppliers["sup10"], existing)
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.SUPPLIERS_FILE, [batch[1].to_dict()])
 
     def test_update_supplier_success(self): # Testing to update supplier attributes and save
         supplier = Supplier("sup7", "Old Name", "Eve", "9998887777", "eve@example.com", "56 Road")
@@ -99,7 +132,7 @@ class TestSupplierManager(unittest.TestCase):
         self.assertTrue(result)
         self.assertEqual(supplier.name, "New Name")
         self.assertEqual(supplier.phone, "0001112222")
-        self.mock_save.assert_called_once()
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.SUPPLIERS_FILE, [supplier.to_dict()])
 
     def test_delete_supplier_success(self): # Delete existing supplier
         supplier = Supplier("sup8", "DeleteMe", "Fay", "5555555555", "fay@example.com", "789 Lane")
@@ -107,12 +140,12 @@ class TestSupplierManager(unittest.TestCase):
         result = self.manager.delete_supplier(supplier.supplier_id)
         self.assertTrue(result)
         self.assertNotIn(supplier.supplier_id, self.manager.suppliers)
-        self.mock_save.assert_called_once()
+        self.mock_backend.delete.assert_called_once_with(SupplierManager.SUPPLIERS_FILE, ["sup8"])
 
     def test_delete_supplier_fail(self): # Deleting non-existent supplier returns False
         result = self.manager.delete_supplier("no_id")
         self.assertFalse(result)
-        self.mock_save.assert_not_called()
+        self.mock_backend.delete.assert_not_called()
 
     def test_create_purchase_order_success(self): # Create a new purchase order and verify it is linked to supplier
         supplier = Supplier("sup9", "PO Supplier", "Greg", "7777777777", "greg@example.com", "1010 Road")
@@ -122,7 +155,7 @@ class TestSupplierManager(unittest.TestCase):
         self.assertEqual(po.po_id, "po100")
         self.assertIn(po.po_id, self.manager.purchase_orders)
         self.assertIn(po, supplier.order_history)
-        self.assertEqual(self.mock_save.call_count, 2)  # purchase orders + suppliers saved
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.PURCHASE_ORDERS_FILE, [po.to_dict()])  # Only the new PO is written
 
     def test_get_supplier_and_purchase_order(self): # Retrieve supplier and purchase order by id
         supplier = Supplier("sup11", "Supplier11", "Ivy", "6666666666", "ivy@example.com", "1414 Way")
@@ -136,5 +169,371 @@ class TestSupplierManager(unittest.TestCase):
         self.assertIsNone(self.manager.get_supplier("no_id"))
         self.assertIsNone(self.manager.get_purchase_order("no_po"))
 
+class TestLazyPurchaseOrders(unittest.TestCase):
+    def setUp(self): # Saved records for one supplier - the mock backend serves them to iter and get like a real one would
+        self.supplier = Supplier("sup20", "Lazy Supplier", "Kim", "1", "kim@example.com", "5 Way")
+        self.records = {f"po{i}": PurchaseOrder(f"po{i}", self.supplier, date(2024, 1, 1), date(2024, 2, 1)).to_dict() for i in range(6)}
+        self.mock_backend = MagicMock()
+        self.mock_backend.iter.side_effect = self.fake_iter
+        self.mock_backend.get.side_effect = lambda collection, key: self.records.get(key)
+        self.mock_backend.KEYED_GET = True  # Lazy loading is only used where a PO can be fetched by key
+        self.manager = SupplierManager(self.mock_backend, cache_size=3)
+
+    def fake_iter(self, collection, from_dict, limit=None, where=None):
+        records = {SupplierManager.SUPPLIERS_FILE: [self.supplier.to_dict()], SupplierManager.PURCHASE_ORDERS_FILE: list(self.records.values())}.get(collection, [])
+        return [from_dict(r) for r in records if where is None or where(r)]
+
+    def test_startup_builds_no_purchase_orders(self): # Only IDs are read at startup, nothing is fetched until asked for
+        self.assertEqual(len(self.manager.purchase_orders), 6)
+        self.assertIn("po3", self.manager.purchase_orders)
+        self.assertFalse(self.manager.purchase_orders.is_cached("po3"))
+        self.assertEqual(len(self.manager.get_supplier("sup20").order_history), 6)
+        self.mock_backend.get.assert_not_called()
+
+    def test_built_on_first_access_then_cached(self):
+        po = self.manager.get_purchase_order("po2")
+        self.assertEqual(po.po_id, "po2")
+        self.assertIs(po.supplier, self.manager.get_supplier("sup20"))
+        self.assertIs(self.manager.get_purchase_order("po2"), po)
+        self.assertEqual(self.mock_backend.get.call_count, 1)
+        self.assertIsNone(self.manager.get_purchase_order("po99"))
+
+    def test_least_recently_used_evicted(self): # The cache stays at cache_size, dropping whatever was used longest ago
+        for po_id in ("po0", "po1", "po2", "po0", "po3"):
+            self.manager.get_purchase_order(po_id)
+        store = self.manager.purchase_orders
+        self.assertEqual([po_id for po_id in self.records if store.is_cached(po_id)], ["po0", "po2", "po3"])
+
+    def test_unsaved_changes_never_evicted(self): # A changed PO stays cached past the limit until it's flushed, so the change isn't lost by rebuilding it from storage
+        self.manager.flush_interval = 60
+        changed = self.manager.get_purchase_order("po0")
+        changed.update_status(OrderStatus.ORDERED)
+        self.manager.create_purchase_order("po50", "sup20", date(2024, 3, 1), date(2024, 3, 2))
+        for po_id in ("po1", "po2", "po3", "po4"):
+            self.manager.get_purchase_order(po_id)
+        self.assertIs(self.manager.get_purchase_order("po0"), changed)
+        self.assertTrue(self.manager.purchase_orders.is_cached("po50"))
+        self.manager.flush()
+        for po_id in ("po1", "po2", "po3"):
+            self.manager.get_purchase_order(po_id)
+        self.assertFalse(self.manager.purchase_orders.is_cached("po0"))
+
+    def test_evicted_po_still_held_is_handed_back(self): # A PO dropped from the cache while a caller still holds it comes back as that same object, never a second copy
+        held = self.manager.get_purchase_order("po0")
+        for po_id in ("po1", "po2", "po3"):
+            self.manager.get_purchase_order(po_id)
+        self.assertFalse(self.manager.purchase_orders.is_cached("po0"))
+        self.assertIs(self.manager.get_purchase_order("po0"), held)
+        self.assertEqual(self.mock_backend.get.call_count, 4)
+        for po_id in ("po1", "po2", "po3"):
+            self.manager.get_purchase_order(po_id)
+        self.assertIn(held, self.manager.list_purchase_orders())
+
+    def test_built_up_front_without_keyed_gets(self): # Where fetching one PO would scan the whole file, every PO is built at startup and none are evicted
+        self.mock_backend.KEYED_GET = False
+        manager = SupplierManager(self.mock_backend, cache_size=3)
+        self.assertTrue(all(manager.purchase_orders.is_cached(po_id) for po_id in self.records))
+        self.assertEqual(manager.get_purchase_order("po4").po_id, "po4")
+        self.assertEqual(sorted(po.po_id for po in manager.list_purchase_orders()), sorted(self.records))
+        self.mock_backend.get.assert_not_called()
+
+    def test_order_history_resolves_through_store(self):
+        history = self.manager.get_supplier("sup20").order_history
+        self.assertEqual([po.po_id for po in history], list(self.records))
+        self.assertIs(history[1], self.manager.get_purchase_order("po1"))
+
+    def test_list_reads_missing_in_one_pass(self): # Listing every PO streams storage once rather than fetching each by ID
+        self.manager.get_purchase_order("po0")
+        self.mock_backend.get.reset_mock()
+        self.assertEqual(sorted(po.po_id for po in self.manager.list_purchase_orders()), sorted(self.records))
+        self.mock_backend.get.assert_not_called()
+
+class TestPurchaseOrderIndexes(unittest.TestCase):
+    def setUp(self):
+        self.mock_backend = MagicMock()
+        self.mock_backend.iter.side_effect = [[], [], []]
+        self.manager = SupplierManager(self.mock_backend)
+        self.manager.add_supplier(Supplier("sup40", "Index Supplier", "Ned", "1", "ned@example.com", "8 Way"))
+        self.pos = {po_id: self.manager.create_purchase_order(po_id, "sup40", date(2024, 1, 1), date(2024, 1, day)) for po_id, day in (("a", 20), ("b", 5), ("c", 12), ("d", 12))}
+
+    def ids(self, orders):
+        return [po.po_id for po in orders]
+
+    def test_status_index_follows_update_status(self):
+        self.pos["a"].update_status(OrderStatus.ORDERED)
+        self.pos["b"].update_status(OrderStatus.DELIVERED)
+        self.assertEqual(self.ids(self.manager.purchase_orders_with_status(OrderStatus.ORDERED)), ["a"])
+        self.assertEqual(self.ids(self.manager.purchase_orders_with_status(OrderStatus.DELIVERED)), ["b"])
+        self.assertEqual(sorted(self.ids(self.manager.open_purchase_orders())), ["a", "c", "d"])
+
+    def test_deliveries_between(self): # Open POs only, soonest first, both ends inclusive
+        self.pos["d"].update_status(OrderStatus.CANCELLED)
+        self.assertEqual(self.ids(self.manager.deliveries_between(date(2024, 1, 5), date(2024, 1, 12))), ["b", "c"])
+        self.assertEqual(self.ids(self.manager.deliveries_between(date(2024, 1, 13), date(2024, 1, 19))), [])
+
+    def test_overdue(self): # Expected before today and still open
+        self.pos["b"].update_status(OrderStatus.DELIVERED)
+        self.assertEqual(self.ids(self.manager.overdue_purchase_orders(date(2024, 1, 15))), ["c", "d"])
+
+    def test_indexes_built_on_load_and_dropped_with_supplier(self):
+        saved = [po.to_dict() for po in self.pos.values()]
+        saved[1]["status"] = "DELIVERED"
+        backend = MagicMock()
+        backend.iter.side_effect = lambda collection, from_dict, limit=None, where=None: [from_dict(r) for r in {SupplierManager.SUPPLIERS_FILE: [self.manager.get_supplier("sup40").to_dict()], SupplierManager.PURCHASE_ORDERS_FILE: saved}.get(collection, [])]
+        backend.get.side_effect = lambda collection, key: next(r for r in saved if r["po_id"] == key)
+        loaded = SupplierManager(backend)
+        self.assertEqual(self.ids(loaded.deliveries_between(date(2024, 1, 1), date(2024, 1, 31))), ["c", "d", "a"])
+        self.assertEqual(self.ids(loaded.purchase_orders_with_status(OrderStatus.DELIVERED)), ["b"])
+        loaded.delete_supplier("sup40")
+        self.assertEqual(loaded.open_purchase_orders(), [])
+        self.assertEqual(loaded.deliveries_between(date(2024, 1, 1), date(2024, 1, 31)), [])
+
+class TestReceiveDelivery(unittest.TestCase):
+    def setUp(self): # Mock inventory holding two products, and a mock financial manager
+        self.mock_backend = MagicMock()
+        self.mock_backend.iter.side_effect = [[], [], []]
+        self.manager = SupplierManager(self.mock_backend)
+        self.manager.add_supplier(Supplier("sup50", "Delivery Supplier", "Ola", "1", "ola@example.com", "9 Way"))
+        self.products = {"item1": MagicMock(price=2.0), "item2": MagicMock(price=5.0)}
+        self.inventory = MagicMock()
+        self.inventory.get_product.side_effect = self.products.get
+        self.inventory.apply_stock_deltas.return_value = True
+        self.finance = MagicMock()
+
+    def make_po(self, po_id, items, status=OrderStatus.ORDERED):
+        po = self.manager.create_purchase_order(po_id, "sup50", date(2024, 1, 1), date(2024, 1, 9))
+        for item_ID, quantity in items.items():
+            po.add_item(item_ID, quantity)
+        po.update_status(status)
+        self.mock_backend.upsert.reset_mock()
+        return po
+
+    def test_receive_delivery(self): # All lines added in one batch, PO saved as DELIVERED, cost posted once
+        po = self.make_po("po1", {"item1": 3, "item2": 2})
+        self.assertEqual(self.manager.receive_delivery("po1", self.inventory, self.finance), 16.0)
+        self.inventory.apply_stock_deltas.assert_called_once_with({"item1": 3, "item2": 2})
+        self.assertEqual(po.status, OrderStatus.DELIVERED)
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.PURCHASE_ORDERS_FILE, [po.to_dict()])
+        self.finance.record_purchase.assert_called_once_with(16.0, "PO po1 from Delivery Supplier")
+        self.assertIsNone(self.manager.receive_delivery("po1", self.inventory, self.finance)) # Can't be received twice
+
+    def test_delivered_status_saved_before_returning(self): # Even with a flush interval, DELIVERED is written along with the stock rather than waiting on the timer
+        self.manager.flush_interval = 60
+        po = self.make_po("po8", {"item1": 1})
+        self.manager.flush()
+        self.mock_backend.upsert.reset_mock()
+        self.manager.receive_delivery("po8", self.inventory, self.finance)
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.PURCHASE_ORDERS_FILE, [po.to_dict()])
+        self.assertEqual(self.mock_backend.upsert.call_args[0][1][0]["status"], "DELIVERED")
+        self.assertIsNone(self.manager._flush_timer)
+
+    def test_unknown_item_changes_nothing(self):
+        po = self.make_po("po2", {"item1": 3, "ghost": 1})
+        self.assertIsNone(self.manager.receive_delivery("po2", self.inventory, self.finance))
+        self.inventory.apply_stock_deltas.assert_not_called()
+        self.finance.record_purchase.assert_not_called()
+        self.assertEqual(po.status, OrderStatus.ORDERED)
+        self.assertIsNone(self.manager.receive_delivery("no_po", self.inventory, self.finance))
+
+    def test_failure_rolls_back(self): # If posting the purchase fails, the status and stock are put back
+        po = self.make_po("po3", {"item1": 4})
+        self.finance.record_purchase.side_effect = IOError("disk full")
+        with self.assertRaises(IOError):
+            self.manager.receive_delivery("po3", self.inventory, self.finance)
+        self.assertEqual(po.status, OrderStatus.ORDERED)
+        self.assertEqual(self.inventory.apply_stock_deltas.call_args_list[-1][0][0], {"item1": -4})
+        self.assertEqual(self.mock_backend.upsert.call_args[0][1][0]["status"], "ORDERED")
+
+    def test_failed_saves_still_take_stock_back(self): # If saving DELIVERED fails and so does saving the old status, the stock added is still taken back
+        po = self.make_po("po11", {"item1": 2})
+        self.mock_backend.upsert.side_effect = OSError("disk full")
+        with self.assertRaises(OSError):
+            self.manager.receive_delivery("po11", self.inventory, self.finance)
+        self.assertEqual(self.mock_backend.upsert.call_count, 2)
+        self.assertEqual(self.inventory.apply_stock_deltas.call_args_list[-1][0][0], {"item1": -2})
+        self.assertEqual(po.status, OrderStatus.ORDERED)
+        self.finance.record_purchase.assert_not_called()
+
+    def test_receive_deliveries_in_bulk(self): # Valid POs share one stock write, one PO save and one purchase append - invalid ones are skipped
+        first = self.make_po("po4", {"item1": 1, "item2": 1})
+        second = self.make_po("po5", {"item1": 2})
+        self.make_po("po6", {"ghost": 1})
+        self.make_po("po7", {"item1": 1}, OrderStatus.CANCELLED)
+        results = self.manager.receive_deliveries(["po4", "po5", "po6", "po7", "nope"], self.inventory, self.finance)
+        self.assertEqual(results, {"po4": 7.0, "po5": 4.0, "po6": None, "po7": None, "nope": None})
+        self.inventory.apply_stock_deltas.assert_called_once_with({"item1": 3, "item2": 1})
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.PURCHASE_ORDERS_FILE, [first.to_dict(), second.to_dict()])
+        self.finance.record_purchases.assert_called_once_with([(7.0, "PO po4 from Delivery Supplier"), (4.0, "PO po5 from Delivery Supplier")])
+        self.assertEqual([po.po_id for po in self.manager.open_purchase_orders()], ["po6"])
+
+    def test_bulk_fallback_runs_outside_the_locks(self): # When the combined stock write fails, each PO is received on its own only after the batch's locks are let go
+        self.make_po("po9", {"item1": 1})
+        self.make_po("po10", {"item2": 1})
+        depth, expired_at = [0], []
+        @contextmanager
+        def locked(item_IDs):
+            depth[0] += 1
+            try:
+                yield
+            finally:
+                depth[0] -= 1
+        self.inventory.locked.side_effect = locked
+        self.inventory.expire_reservations.side_effect = lambda: expired_at.append(depth[0])
+        self.inventory.apply_stock_deltas.side_effect = [False, True, True]
+        results = self.manager.receive_deliveries(["po9", "po10"], self.inventory, self.finance)
+        self.assertEqual(results, {"po9": 2.0, "po10": 5.0})
+        self.assertEqual(expired_at, [0, 0, 0])
+
+class TestIncrementalSaves(unittest.TestCase):
+    def setUp(self):
+        self.mock_backend = MagicMock()
+        self.mock_backend.iter.side_effect = [[], [], []]
+        self.supplier = Supplier("sup30", "Flush Supplier", "Max", "1", "max@example.com", "7 Way")
+
+    def test_changes_saved_straight_away_by_default(self): # Adding items and changing status each write just that PO
+        manager = SupplierManager(self.mock_backend)
+        manager.add_supplier(self.supplier)
+        self.mock_backend.upsert.reset_mock()
+        po = manager.create_purchase_order("po1", "sup30", date(2024, 1, 1), date(2024, 1, 9))
+        po.add_item("item1", 4)
+        po.update_status(OrderStatus.ORDERED)
+        self.assertEqual(self.mock_backend.upsert.call_count, 3)
+        self.mock_backend.upsert.assert_called_with(SupplierManager.PURCHASE_ORDERS_FILE, [po.to_dict()])
+        self.assertEqual(self.mock_backend.upsert.call_args[0][1][0]["items"], {"item1": 4})
+        self.assertEqual(manager.flush(), 0)
+        self.mock_backend.save.assert_not_called()
+
+    def test_changes_coalesced_until_flush(self): # With an interval, a burst of changes to several POs is one write of just those POs
+        manager = SupplierManager(self.mock_backend, flush_interval=60)
+        manager.add_supplier(self.supplier)
+        self.mock_backend.upsert.reset_mock()
+        first = manager.create_purchase_order("po1", "sup30", date(2024, 1, 1), date(2024, 1, 9))
+        second = manager.create_purchase_order("po2", "sup30", date(2024, 1, 2), date(2024, 1, 9))
+        for po in (first, second):
+            po.add_item("item1", 2)
+            po.update_status(OrderStatus.ORDERED)
+        self.mock_backend.upsert.assert_not_called()
+        self.assertEqual(manager.flush(), 2)
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.PURCHASE_ORDERS_FILE, [first.to_dict(), second.to_dict()])
+        self.assertIsNone(manager._flush_timer)
+
+    def test_failed_flush_keeps_changes(self): # If the write fails the POs are still waiting, and the next flush saves them
+        manager = SupplierManager(self.mock_backend, flush_interval=60)
+        manager.add_supplier(self.supplier)
+        po = manager.create_purchase_order("po1", "sup30", date(2024, 1, 1), date(2024, 1, 9))
+        self.mock_backend.upsert.side_effect = OSError("disk full")
+        with self.assertRaises(OSError):
+            manager.flush()
+        self.assertTrue(manager.purchase_orders.is_cached("po1"))
+        self.mock_backend.upsert.side_effect = None
+        self.mock_backend.upsert.reset_mock()
+        self.assertEqual(manager.flush(), 1)
+        self.mock_backend.upsert.assert_called_once_with(SupplierManager.PURCHASE_ORDERS_FILE, [po.to_dict()])
+
+    def test_timer_flushes(self): # Left alone, the flush timer saves the changes itself
+        manager = SupplierManager(self.mock_backend, flush_interval=0.01)
+        manager.add_supplier(self.supplier)
+        manager.create_purchase_order("po1", "sup30", date(2024, 1, 1), date(2024, 1, 9))
+        for _ in range(200):
+            if self.mock_backend.upsert.call_count == 2:
+                break
+            time.sleep(0.01)
+        self.mock_backend.upsert.assert_called_with(SupplierManager.PURCHASE_ORDERS_FILE, [manager.get_purchase_order("po1").to_dict()])
+
+class TestDraftPurchaseOrders(unittest.TestCase):
+    def setUp(self):
+        self.mock_backend = MagicMock()
+        self.mock_backend.iter.side_effect = [[], [], []]
+        self.manager = SupplierManager(self.mock_backend)
+        for supplier_id in ("sup60", "sup61"):
+            self.manager.add_supplier(Supplier(supplier_id, "Draft Supplier", "Ola", "1", "ola@example.com", "9 Way"))
+        self.mock_backend.upsert.reset_mock()
+
+    def test_one_po_per_supplier_saved_together(self): # Unknown suppliers are skipped, IDs don't clash, and every new PO goes out in one save
+        self.manager.create_purchase_order("AUTO-20240301-sup60", "sup60", date(2024, 3, 1), date(2024, 3, 2))
+        self.mock_backend.upsert.reset_mock()
+        pos = self.manager.create_draft_purchase_orders({"sup60": {"i1": 5, "i2": 1}, "sup61": {"i3": 2}, "nobody": {"i4": 1}}, date(2024, 3, 1), 6.5)
+        self.assertEqual([po.po_id for po in pos], ["AUTO-20240301-sup60-2", "AUTO-20240301-sup61"])
+        self.assertEqual(pos[0].items, {"i1": 5, "i2": 1})
+        self.assertEqual(pos[0].expected_delivery, date(2024, 3, 8))
+        self.assertTrue(all(po.status == OrderStatus.PENDING for po in pos))
+        self.mock_backend.upsert.assert_called_once()
+        self.assertEqual(len(self.mock_backend.upsert.call_args[0][1]), 2)
+
+    def test_on_order(self): # Units on open POs, summed across POs - delivered ones don't count
+        self.manager.create_draft_purchase_orders({"sup60": {"i1": 5}, "sup61": {"i1": 2, "i2": 3}}, date(2024, 3, 1), 7)
+        self.manager.create_purchase_order("po9", "sup60", date(2024, 3, 1), date(2024, 3, 2)).add_item("i2", 10)
+        self.manager.get_purchase_order("po9").update_status(OrderStatus.DELIVERED)
+        self.assertEqual(self.manager.on_order(), {"i1": 7, "i2": 3})
+
+class TestSupplierCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.catalogue = SupplierCatalogue([CatalogueEntry("s1", "i1", 2.0, 10), CatalogueEntry("s2", "i1", 3.0, 2), CatalogueEntry("s1", "i2", 1.0, 5)])
+
+    def test_indexed_both_ways(self):
+        self.assertEqual([e.supplier_id for e in self.catalogue.suppliers_for("i1")], ["s1", "s2"])
+        self.assertEqual([e.item_ID for e in self.catalogue.items_from("s1")], ["i1", "i2"])
+        self.assertEqual(self.catalogue.suppliers_for("none"), [])
+        self.assertEqual(len(self.catalogue), 3)
+
+    def test_cheapest_and_fastest_kept_up_to_date(self): # A better entry takes over, a worse replacement or removal of the best hands back to the next one
+        self.assertEqual((self.catalogue.cheapest_supplier("i1"), self.catalogue.fastest("i1").supplier_id), ("s1", "s2"))
+        self.catalogue.add(CatalogueEntry("s3", "i1", 1.5, 1))
+        self.assertEqual((self.catalogue.cheapest_supplier("i1"), self.catalogue.fastest("i1").supplier_id), ("s3", "s3"))
+        self.catalogue.add(CatalogueEntry("s3", "i1", 9.0, 20))
+        self.assertEqual((self.catalogue.cheapest_supplier("i1"), self.catalogue.fastest("i1").supplier_id), ("s1", "s2"))
+        self.catalogue.remove("s1", "i1")
+        self.assertEqual((self.catalogue.cheapest_supplier("i1"), self.catalogue.cheapest_lead_time("i1")), ("s2", 2))
+        self.catalogue.remove_supplier("s2")
+        self.catalogue.remove_supplier("s3")
+        self.assertIsNone(self.catalogue.cheapest("i1"))
+        self.assertIsNone(self.catalogue.fastest("i1"))
+        self.assertIsNone(self.catalogue.remove("s1", "i1"))
+
+    def test_unit_costs(self): # Only the items the supplier lists
+        self.assertEqual(self.catalogue.unit_costs("s1", ["i1", "i2", "i3"]), {"i1": 2.0, "i2": 1.0})
+        self.assertEqual(self.catalogue.unit_costs("nobody", ["i1"]), {})
+
+    def test_entry_round_trip_and_validation(self):
+        entry = CatalogueEntry("s1", "i1", 2.5, 3)
+        self.assertEqual(entry.to_dict()["entry_id"], "s1/i1")
+        self.assertEqual(CatalogueEntry.from_dict(entry.to_dict()).to_dict(), entry.to_dict())
+        with self.assertRaises(ValueError):
+            CatalogueEntry("s1", "i1", -1, 3)
+
+class TestCatalogueCosting(unittest.TestCase):
+    def setUp(self):
+        self.mock_backend = MagicMock()
+        self.mock_backend.iter.side_effect = [[], [], []]
+        self.manager = SupplierManager(self.mock_backend)
+        self.manager.add_supplier(Supplier("sup70", "Costed Supplier", "Ola", "1", "ola@example.com", "9 Way"))
+        self.inventory = MagicMock()
+        self.inventory.get_product.side_effect = {"item1": MagicMock(price=10.0), "item2": MagicMock(price=5.0)}.get
+        self.inventory.apply_stock_deltas.return_value = True
+
+    def test_entries_saved_and_dropped_with_supplier(self):
+        self.assertFalse(self.manager.add_catalogue_entry(CatalogueEntry("nobody", "item1", 1.0, 1)))
+        entry = CatalogueEntry("sup70", "item1", 4.0, 3)
+        self.assertTrue(self.manager.add_catalogue_entry(entry))
+        self.mock_backend.upsert.assert_called_with(SupplierManager.CATALOGUE_FILE, [entry.to_dict()])
+        self.manager.delete_supplier("sup70")
+        self.mock_backend.delete.assert_called_with(SupplierManager.CATALOGUE_FILE, ["sup70/item1"])
+        self.assertIsNone(self.manager.catalogue.cheapest("item1"))
+
+    def test_delivery_costed_from_catalogue(self): # Listed items at the supplier's cost, others at the product price
+        self.manager.add_catalogue_entry(CatalogueEntry("sup70", "item1", 4.0, 3))
+        po = self.manager.create_purchase_order("po1", "sup70", date(2024, 1, 1), date(2024, 1, 9))
+        po.add_item("item1", 3)
+        po.add_item("item2", 2)
+        self.assertEqual(self.manager.purchase_order_cost(po), None)  # item2 can't be costed without inventory
+        finance = MagicMock()
+        self.assertEqual(self.manager.receive_delivery("po1", self.inventory, finance), 22.0)
+        finance.record_purchase.assert_called_once_with(22.0, "PO po1 from Costed Supplier")
+
+    def test_draft_lead_time_from_catalogue(self): # A draft PO is expected after its slowest listed line
+        self.manager.add_catalogue_entries([CatalogueEntry("sup70", "item1", 4.0, 3), CatalogueEntry("sup70", "item2", 1.0, 9.5)])
+        po, = self.manager.create_draft_purchase_orders({"sup70": {"item1": 1, "item2": 1, "item3": 1}}, date(2024, 1, 1), 2)
+        self.assertEqual(po.expected_delivery, date(2024, 1, 11))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file